@@ -11,18 +11,28 @@ Puis ouvrez http://localhost:5000 dans votre navigateur.
 
 import os
 import sys
-import cv2
+import json
 import threading
 import time
 import logging
-from flask import Flask, render_template, jsonify, request, send_from_directory, Response
 
 # Configuration
 from config import (
-    BASE_DIR, STATIC_DIR, TEMPLATES_DIR, FACES_DIR,
-    PLAYERS_LEFT, PLAYERS_RIGHT, DEFAULT_OPTIONS, FLASK_CONFIG
+    BASE_DIR, STATIC_DIR, TEMPLATES_DIR, FACES_DIR, FACE_CACHE_DIR, ONNX_CACHE_DIR,
+    PLAYERS, PLAYERS_LEFT, PLAYERS_RIGHT, DEFAULT_OPTIONS, FLASK_CONFIG, SERVER_CONFIG,
+    CAMERA_CONFIG, PIPELINE_CONFIG, ANALYSER_PROFILES, QUALITY_CONFIG, WARMUP_CONFIG,
+    STARTUP_CONFIG, EXECUTION_THREADS, EXECUTION_BACKEND, EXECUTION_PROCESSES, VIDEO_STREAMING,
+    ONNX_SESSION_CONFIG, QUANTIZATION_CONFIG, SESSIONS_CONFIG, BATCHING_CONFIG, INFERENCE_WORKERS_CONFIG
 )
 
+# Profil de démarrage : installé avant les dépendances lourdes (cv2, flask)
+from core.startup_profile import STARTUP_PROFILE
+if STARTUP_CONFIG["PROFILE_IMPORTS"]:
+    STARTUP_PROFILE.profile_imports()
+
+import cv2
+from flask import Flask, render_template, jsonify, request, send_from_directory, Response
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -38,16 +48,28 @@ app = Flask(
 )
 app.config['SECRET_KEY'] = FLASK_CONFIG['SECRET_KEY']
 
+# WebSocket optionnel (flask-sock) : sans lui, seul le flux MJPEG est servi
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+    logger.info("flask-sock non installé : flux WebSocket désactivé (MJPEG uniquement)")
+
 # ============================================================
 # État de l'application
 # ============================================================
 
+# Partagé par toutes les bornes ; l'état propre à chacune (joueur, visage
+# source, options, pipeline, diffusion) est dans sa session (core.sessions)
 app_state = {
-    "selected_player": None,
-    "is_running": False,
-    "options": DEFAULT_OPTIONS.copy(),
-    "source_face": None,
-    "camera": None,
+    "sessions": None,
+    "scheduler": None,
+    "face_cache": None,
+    "quality": None,
+    "encoder": None,
+    "warmup": None,
+    "workers": None,
     "camera_lock": threading.Lock()
 }
 
@@ -56,7 +78,10 @@ app_state = {
 # ============================================================
 
 def check_gpu_availability():
-    """Vérifie la disponibilité du GPU"""
+    """
+    Vérifie la disponibilité du GPU via ONNX Runtime, qui exécute
+    l'inférence (sans importer torch, plusieurs secondes à froid)
+    """
     gpu_info = {
         "cuda_available": False,
         "cudnn_available": False,
@@ -64,16 +89,6 @@ def check_gpu_availability():
         "onnx_providers": []
     }
     
-    # Vérifier PyTorch CUDA
-    try:
-        import torch
-        gpu_info["cuda_available"] = torch.cuda.is_available()
-        if gpu_info["cuda_available"]:
-            gpu_info["gpu_name"] = torch.cuda.get_device_name(0)
-            gpu_info["cudnn_available"] = torch.backends.cudnn.is_available()
-    except Exception:
-        pass
-    
     # Vérifier ONNX Runtime providers
     try:
         import onnxruntime as ort
@@ -81,6 +96,24 @@ def check_gpu_availability():
     except Exception:
         pass
     
+    # Le provider CUDA d'ONNX Runtime s'appuie sur cuDNN ; nom du GPU via nvidia-smi
+    if 'CUDAExecutionProvider' in gpu_info["onnx_providers"]:
+        gpu_info["cuda_available"] = True
+        try:
+            import ctypes.util
+            gpu_info["cudnn_available"] = ctypes.util.find_library('cudnn') is not None
+        except Exception:
+            pass
+        try:
+            import subprocess
+            result = subprocess.run(
+                ['nvidia-smi', '--query-gpu=name', '--format=csv,noheader'],
+                capture_output=True, text=True, timeout=5
+            )
+            gpu_info["gpu_name"] = result.stdout.strip().splitlines()[0] if result.stdout.strip() else None
+        except Exception:
+            pass
+    
     return gpu_info
 
 def init_ai_modules():
@@ -115,6 +148,22 @@ def init_ai_modules():
             core.globals.execution_providers = ['CPUExecutionProvider']
             logger.info("Mode CPU activé")
         
+        # Profils d'analyse (modules chargés pour les frames live / la galerie)
+        core.globals.analyser_profiles = ANALYSER_PROFILES
+        
+        # Options des sessions ONNX Runtime et cache des graphes optimisés
+        core.globals.execution_threads = EXECUTION_THREADS
+        # Backend du traitement vidéo hors ligne
+        core.globals.execution_backend = EXECUTION_BACKEND
+        core.globals.execution_processes = EXECUTION_PROCESSES
+        core.globals.video_streaming = VIDEO_STREAMING
+        core.globals.session_config = ONNX_SESSION_CONFIG
+        core.globals.onnx_cache_dir = ONNX_CACHE_DIR
+        # Variantes INT8 validées (sans GPU)
+        core.globals.quantization_config = QUANTIZATION_CONFIG
+        # Regroupement de la détection et du swap entre les bornes
+        core.globals.batching_config = BATCHING_CONFIG
+        
         logger.info("Modules IA initialisés avec succès")
         return True
     except Exception as e:
@@ -125,37 +174,283 @@ def init_ai_modules():
 # Gestion de la caméra et du face swap
 # ============================================================
 
-def get_camera():
-    """Obtient ou crée la capture vidéo"""
+def get_sessions():
+    """Obtient ou crée le gestionnaire des sessions déclarées (une par borne)"""
+    from core.sessions import SessionManager
+
     with app_state["camera_lock"]:
-        if app_state["camera"] is None or not app_state["camera"].isOpened():
-            app_state["camera"] = cv2.VideoCapture(0)
-            if app_state["camera"].isOpened():
-                app_state["camera"].set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                app_state["camera"].set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                app_state["camera"].set(cv2.CAP_PROP_FPS, 30)
-                logger.info("Caméra initialisée")
-        return app_state["camera"]
-
-def release_camera():
-    """Libère la caméra"""
+        if app_state["sessions"] is None:
+            app_state["sessions"] = SessionManager(
+                SESSIONS_CONFIG["INPUTS"], DEFAULT_OPTIONS, SESSIONS_CONFIG["DEFAULT"]
+            )
+        return app_state["sessions"]
+
+def get_session(session_id=None):
+    """Session `session_id` (session par défaut si vide), None si non déclarée"""
+    return get_sessions().get(session_id)
+
+def unknown_session(session_id):
+    return {"success": False, "error": f"Session inconnue: {session_id}"}, 404
+
+def get_scheduler():
+    """Obtient ou crée l'ordonnanceur qui partage l'inférence entre les sessions"""
+    from core.scheduler import FairScheduler
+
     with app_state["camera_lock"]:
-        if app_state["camera"] is not None:
-            app_state["camera"].release()
-            app_state["camera"] = None
-            logger.info("Caméra libérée")
+        if app_state["scheduler"] is None:
+            slots = SESSIONS_CONFIG["INFERENCE_SLOTS"]
+            # Avec le micro-batching, plusieurs bornes doivent être en cours
+            # d'inférence en même temps pour que leurs requêtes se regroupent
+            if BATCHING_CONFIG["ENABLED"]:
+                slots = max(slots, BATCHING_CONFIG["MAX_BATCH"])
+            # Avec les workers d'inférence, un créneau par worker
+            if INFERENCE_WORKERS_CONFIG["ENABLED"]:
+                slots = max(slots, INFERENCE_WORKERS_CONFIG["WORKERS"])
+            app_state["scheduler"] = FairScheduler(slots)
+        return app_state["scheduler"]
+
+def get_broadcaster(session):
+    """Obtient ou crée le hub de diffusion partagé par les clients de la session"""
+    from core.broadcaster import FrameBroadcaster
+
+    with session.lock:
+        if session.broadcaster is None:
+            session.broadcaster = FrameBroadcaster()
+        return session.broadcaster
+
+def get_pipeline(session):
+    """Obtient ou crée le pipeline capture → inférence → encodage de la session"""
+    from core.pipeline import FramePipeline
+    from core.video_capture import VideoCapturer
+
+    broadcaster = get_broadcaster(session)
+    scheduler = get_scheduler()
+    pool = get_worker_pool()
+    if pool is not None:
+        # Le worker rend la partie multipart : l'étage d'encodage la transmet telle quelle
+        process = lambda frame: process_remote_frame(session, pool, frame)
+        encode = lambda chunk: chunk
+    else:
+        process = lambda frame: process_live_frame(session, frame)
+        encode = encode_frame
+
+    with session.lock:
+        pipeline = session.pipeline
+        if pipeline is None or not pipeline.is_running:
+            try:
+                capturer = VideoCapturer(session.video_input)
+            except Exception as e:
+                logger.error(f"Caméra indisponible ({session.session_id}): {e}")
+                return None
+            scheduler.register(session.session_id, SESSIONS_CONFIG["WEIGHTS"].get(session.session_id, 1.0))
+            pipeline = FramePipeline(
+                capturer,
+                process=process,
+                encode=encode,
+                queue_size=PIPELINE_CONFIG["QUEUE_SIZE"],
+                sink=broadcaster.publish,
+                encode_workers=PIPELINE_CONFIG["ENCODE_WORKERS"]
+            )
+            if not pipeline.start(CAMERA_CONFIG["WIDTH"], CAMERA_CONFIG["HEIGHT"], CAMERA_CONFIG["FPS"]):
+                return None
+            session.pipeline = pipeline
+            logger.info(f"Caméra initialisée ({session.session_id}: {session.video_input})")
+            
+            controller = get_quality_controller()
+            if controller is not None:
+                apply_quality_settings(controller.settings)
+            
+            # Nouveau flux : le tracker repart d'une détection complète
+            session.reset_tracker()
+        return pipeline
+
+def get_worker_pool():
+    """Obtient ou démarre les workers d'inférence (None s'ils sont désactivés)"""
+    if not INFERENCE_WORKERS_CONFIG["ENABLED"]:
+        return None
+    import atexit
+    import core.globals
+    from core.inference_workers import InferenceWorkerPool
+
+    with app_state["camera_lock"]:
+        if app_state["workers"] is None:
+            workers = INFERENCE_WORKERS_CONFIG["WORKERS"]
+            # Réglages repris par chaque worker (voir core.inference_workers.configure_worker)
+            settings = {
+                "execution_providers": core.globals.execution_providers,
+                "intra_op_threads": max(1, core.globals.execution_threads // workers),
+                "session_config": core.globals.session_config,
+                "onnx_cache_dir": core.globals.onnx_cache_dir,
+                "quantization_config": core.globals.quantization_config,
+                "analyser_profiles": core.globals.analyser_profiles,
+                "detect_interval": core.globals.detect_interval,
+                "jpeg_backend": PIPELINE_CONFIG["JPEG_BACKEND"],
+                "frame_size": (CAMERA_CONFIG["WIDTH"], CAMERA_CONFIG["HEIGHT"]),
+                "det_sizes": warmup_det_sizes(),
+                "warm_enhancer": WARMUP_CONFIG["ENABLED"] and WARMUP_CONFIG["ENHANCER"],
+                "log_level": logging.getLogger().getEffectiveLevel(),
+            }
+            pool = InferenceWorkerPool(
+                workers,
+                INFERENCE_WORKERS_CONFIG["RING_SLOTS"],
+                (INFERENCE_WORKERS_CONFIG["MAX_WIDTH"], INFERENCE_WORKERS_CONFIG["MAX_HEIGHT"]),
+                settings,
+                request_timeout=INFERENCE_WORKERS_CONFIG["REQUEST_TIMEOUT"],
+                restart_delay=INFERENCE_WORKERS_CONFIG["RESTART_DELAY"],
+            )
+            pool.start()
+            atexit.register(pool.close)
+            app_state["workers"] = pool
+            logger.info(f"Workers d'inférence : {workers} processus")
+        return app_state["workers"]
+
+def get_jpeg_encoder():
+    """Obtient ou crée l'encodeur JPEG partagé par les threads d'encodage"""
+    from core.jpeg_encoder import JpegEncoder
+
+    with app_state["camera_lock"]:
+        if app_state["encoder"] is None:
+            app_state["encoder"] = JpegEncoder(PIPELINE_CONFIG["JPEG_BACKEND"])
+            logger.info(f"Encodeur JPEG : {app_state['encoder'].backend}")
+        return app_state["encoder"]
+
+def get_quality_controller():
+    """Obtient ou crée le contrôleur de qualité adaptative (None si désactivé)"""
+    from core.quality_controller import QualityController
+
+    if not QUALITY_CONFIG["ENABLED"]:
+        return None
+    with app_state["camera_lock"]:
+        if app_state["quality"] is None:
+            app_state["quality"] = QualityController(
+                QUALITY_CONFIG["LEVELS"],
+                target_fps=QUALITY_CONFIG["TARGET_FPS"],
+                downgrade_ratio=QUALITY_CONFIG["DOWNGRADE_RATIO"],
+                upgrade_ratio=QUALITY_CONFIG["UPGRADE_RATIO"],
+                downgrade_frames=QUALITY_CONFIG["DOWNGRADE_FRAMES"],
+                upgrade_frames=QUALITY_CONFIG["UPGRADE_FRAMES"],
+                cooldown_frames=QUALITY_CONFIG["COOLDOWN_FRAMES"]
+            )
+        return app_state["quality"]
+
+def apply_quality_settings(settings):
+    """
+    Applique les réglages de détection d'un niveau de qualité. Le niveau est
+    commun aux sessions : elles partagent le même processeur et les mêmes
+    modèles (taille de détection de l'analyseur partagé).
+    """
+    import core.globals
+    from core.face_analyser import set_detection_size
+    
+    set_detection_size(settings["det_size"])
+    core.globals.detect_interval = settings["detect_interval"]
+    for session in get_sessions().sessions():
+        session.set_detect_interval(settings["detect_interval"])
+
+def release_camera(session):
+    """Arrête le pipeline de la session et libère sa caméra"""
+    with session.lock:
+        if session.pipeline is not None:
+            session.pipeline.stop()
+            session.pipeline = None
+            logger.info(f"Caméra libérée ({session.session_id})")
+
+def get_face_cache():
+    """Obtient ou crée le cache des visages sources"""
+    from core.face_cache import FaceGalleryCache
+    from core.face_analyser import FACE_ANALYSER_MODEL
+
+    with app_state["camera_lock"]:
+        if app_state["face_cache"] is None:
+            app_state["face_cache"] = FaceGalleryCache(FACE_CACHE_DIR, FACE_ANALYSER_MODEL)
+        return app_state["face_cache"]
+
+def get_face_path(player_id: str) -> str:
+    """Chemin de l'image d'un joueur"""
+    return os.path.join(FACES_DIR, f"{player_id}.png")
+
+def warm_face_cache():
+    """Analyse tous les visages de la galerie en arrière-plan"""
+    try:
+        face_paths = [get_face_path(p["id"]) for p in PLAYERS]
+        return get_face_cache().warm([p for p in face_paths if os.path.exists(p)])
+    except Exception as e:
+        logger.error(f"Erreur lors du préchargement des visages: {e}")
+        return None
+
+def warmup_det_sizes():
+    """Tailles de détection des niveaux de qualité adaptative à préchauffer"""
+    if QUALITY_CONFIG["ENABLED"] and WARMUP_CONFIG["QUALITY_SIZES"]:
+        return [level["det_size"] for level in QUALITY_CONFIG["LEVELS"]]
+    return []
+
+def start_warmup():
+    """
+    Lance le préchauffage des modèles en arrière-plan : chargement puis
+    inférence à vide à la résolution de capture, pour que l'optimisation
+    des graphes ONNX Runtime et la croissance des allocateurs aient lieu
+    avant le premier client. L'avancement est exposé par /api/ready.
+    """
+    from core.warmup import ModelWarmup, warm_analyser, warm_face_enhancer, warm_face_swapper
+
+    frame_size = (CAMERA_CONFIG["WIDTH"], CAMERA_CONFIG["HEIGHT"])
+    det_sizes = warmup_det_sizes()
+
+    def warm_gallery():
+        thread = warm_face_cache()
+        if thread is None:
+            return False
+        thread.join()
+
+    steps = [
+        ("analyser_source", lambda: warm_analyser('source', frame_size)),
+        ("face_gallery", warm_gallery),
+    ]
+    if INFERENCE_WORKERS_CONFIG["ENABLED"]:
+        # Les modèles du flux live sont chargés et préchauffés par chaque worker
+        steps.append((
+            "inference_workers",
+            lambda: get_worker_pool().wait_ready(INFERENCE_WORKERS_CONFIG["START_TIMEOUT"])
+        ))
+    else:
+        steps += [
+            ("analyser_target", lambda: warm_analyser('target', frame_size, det_sizes)),
+            ("face_swapper", warm_face_swapper),
+        ]
+        if WARMUP_CONFIG["ENHANCER"]:
+            steps.append(("face_enhancer", warm_face_enhancer))
+
+    def on_finished():
+        STARTUP_PROFILE.mark("préchauffage")
+        if STARTUP_CONFIG["LOG_REPORT"]:
+            STARTUP_PROFILE.log_report()
+
+    app_state["warmup"] = ModelWarmup(steps, on_finished=on_finished)
+    app_state["warmup"].start()
+    return app_state["warmup"]
+
+def start_model_loading():
+    """Préchauffage complet, ou seulement la galerie s'il est désactivé"""
+    if WARMUP_CONFIG["ENABLED"]:
+        return start_warmup()
+    warm_face_cache()
+    return None
+
+def get_readiness():
+    """Avancement du préchauffage (prêt d'emblée s'il est désactivé)"""
+    if app_state["warmup"] is None:
+        return {"ready": True, "progress": 1.0, "current": None, "elapsed": None, "steps": []}
+    return app_state["warmup"].get_status()
 
 def load_source_face(player_id: str):
-    """Charge le visage source depuis l'image du joueur"""
+    """Charge le visage source depuis le cache de la galerie"""
     try:
-        from core.face_analyser import extract_face_from_image
-        
-        face_path = os.path.join(FACES_DIR, f"{player_id}.png")
+        face_path = get_face_path(player_id)
         if not os.path.exists(face_path):
             logger.error(f"Image non trouvée: {face_path}")
             return None
         
-        source_face = extract_face_from_image(face_path)
+        source_face = get_face_cache().get(face_path)
         if source_face is None:
             logger.error(f"Aucun visage détecté dans: {face_path}")
             return None
@@ -166,78 +461,184 @@ def load_source_face(player_id: str):
         logger.error(f"Erreur lors du chargement du visage: {e}")
         return None
 
-def process_frame_with_swap(frame, source_face):
-    """Applique le face swap sur une frame"""
+def process_frame_with_swap(frame, source_face, session, enhance=True):
+    """Applique le face swap sur une frame (puis l'enhancer si `enhance`), avec les options de la session"""
     if frame is None or source_face is None:
         return frame
     
     try:
-        from core.processors.frame.face_swapper import process_frame
-        import core.globals
-        
-        # Appliquer le face swap
-        processed = process_frame(source_face, frame)
+        from core.processors.frame.core import run_frame_processors
+        import core.processors.frame.face_enhancer as face_enhancer
+        import core.processors.frame.face_swapper as face_swapper
         
-        # Appliquer l'enhancer si activé
-        if app_state["options"].get("face_enhancer", False):
-            try:
-                from core.processors.frame.face_enhancer import process_frame_v2, is_available
-                if is_available():
-                    processed = process_frame_v2(processed)
-            except Exception as e:
-                pass  # Face enhancer non disponible, continuer sans
+        # Chaîne de processeurs sur un contexte partagé : une seule détection
+        frame_processors = [face_swapper]
+        if enhance and session.options.get("face_enhancer", False) and face_enhancer.is_available():
+            frame_processors.append(face_enhancer)
         
-        return processed
+        return run_frame_processors(
+            source_face, frame, frame_processors, detect=session.detect, options=session.options
+        ).frame
     except Exception as e:
         logger.error(f"Erreur lors du traitement: {e}")
         return frame
 
-def generate_frames():
-    """Générateur de frames pour le streaming vidéo"""
-    camera = get_camera()
+def process_live_frame(session, frame):
+    """
+    Étage d'inférence d'une session : miroir, face swap et affichage du FPS.
+    Le swap attend le tour de la session auprès de l'ordonnanceur, qui
+    répartit équitablement le temps d'inférence entre les bornes.
+    """
+    pipeline = session.pipeline
+    controller = app_state["quality"]
+    enhance = True
+    if controller is not None and pipeline is not None:
+        # Le plus lent des deux étages fixe le débit du pipeline
+        frame_seconds = max(pipeline.stats["inference"].last_time, pipeline.stats["encode"].last_time)
+        if controller.observe(frame_seconds):
+            apply_quality_settings(controller.settings)
+            logger.info(f"Qualité adaptative : niveau {controller.level} {controller.settings}")
+        scale = controller.settings["scale"]
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        enhance = controller.should_enhance()
+    
+    # Flip horizontal pour effet miroir
+    frame = cv2.flip(frame, 1)
+    
+    # Appliquer le face swap si un visage source est chargé
+    source_face = session.source_face
+    if source_face is not None:
+        with get_scheduler().slot(session.session_id):
+            frame = process_frame_with_swap(frame, source_face, session, enhance)
+    
+    if session.options.get("show_fps", False) and pipeline is not None:
+        fps = pipeline.stats["inference"].fps
+        cv2.putText(frame, f"FPS: {fps}", (10, 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return frame
+
+def process_remote_frame(session, pool, frame):
+    """
+    Étage d'inférence d'une session servie par un worker : la frame part
+    dans l'anneau partagé avec les options et le niveau de qualité, le
+    worker fait miroir, swap, FPS et encodage, et rend la partie multipart
+    (None si le worker est indisponible : la frame est abandonnée).
+    """
+    if not pool.fits(frame):
+        return encode_frame(process_live_frame(session, frame))
+
+    pipeline = session.pipeline
+    controller = app_state["quality"]
+    meta = {"options": dict(session.options), "jpeg_quality": PIPELINE_CONFIG["JPEG_QUALITY"]}
+    if controller is not None and pipeline is not None:
+        # L'étage d'inférence inclut ici l'encodage
+        if controller.observe(pipeline.stats["inference"].last_time):
+            logger.info(f"Qualité adaptative : niveau {controller.level} {controller.settings}")
+        settings = controller.settings
+        meta.update(
+            scale=settings["scale"],
+            enhance=controller.should_enhance(),
+            jpeg_quality=settings["jpeg_quality"],
+            det_size=settings["det_size"],
+            detect_interval=settings["detect_interval"],
+        )
+    if session.options.get("show_fps", False) and pipeline is not None:
+        meta["fps"] = pipeline.stats["inference"].fps
+
+    with get_scheduler().slot(session.session_id):
+        return pool.process(session.session_id, frame, meta, session.source_face)
+
+def encode_frame(frame):
+    """Étage d'encodage : frame BGR -> partie multipart JPEG (partagée par tous les clients)"""
+    from core.metrics import STAGE_SECONDS
     
-    if camera is None or not camera.isOpened():
+    controller = app_state["quality"]
+    quality = controller.settings["jpeg_quality"] if controller is not None else PIPELINE_CONFIG["JPEG_QUALITY"]
+    encoder = app_state["encoder"] or get_jpeg_encoder()
+    with STAGE_SECONDS.labels("encode").time():
+        return encoder.encode_chunk(frame, quality)
+
+def generate_frames(session):
+    """Générateur de frames pour le streaming vidéo (un abonné du hub de la session par client)"""
+    pipeline = get_pipeline(session)
+    
+    if pipeline is None:
         logger.error("Impossible d'ouvrir la caméra")
         return
     
-    fps_time = time.time()
-    frame_count = 0
-    fps = 0
+    broadcaster = get_broadcaster(session)
+    subscriber = broadcaster.subscribe()
+    logger.info(f"Client vidéo connecté ({session.session_id}, {broadcaster.client_count} actifs)")
     
-    while app_state["is_running"]:
-        success, frame = camera.read()
-        if not success:
-            logger.warning("Impossible de lire la frame")
-            break
-        
-        # Flip horizontal pour effet miroir
-        frame = cv2.flip(frame, 1)
-        
-        # Appliquer le face swap si un visage source est chargé
-        if app_state["source_face"] is not None:
-            frame = process_frame_with_swap(frame, app_state["source_face"])
-        
-        # Calcul et affichage du FPS
-        frame_count += 1
-        if time.time() - fps_time >= 1.0:
-            fps = frame_count
-            frame_count = 0
-            fps_time = time.time()
-        
-        if app_state["options"].get("show_fps", False):
-            cv2.putText(frame, f"FPS: {fps}", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Encoder en JPEG
-        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-        if not ret:
-            continue
-        
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    try:
+        while session.is_running and pipeline.is_running:
+            packet = subscriber.get(timeout=1.0)
+            if packet is None:
+                continue
+            
+            # Partie multipart construite une fois par l'étage d'encodage
+            yield packet.data
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        logger.info(f"Client vidéo déconnecté ({session.session_id}, {broadcaster.client_count} actifs)")
+        release_camera_if_idle(session)
+
+def stream_websocket(ws, session):
+    """
+    Flux WebSocket avec contrôle de débit par le client : une frame est
+    envoyée, puis plus rien tant qu'elle n'est pas acquittée. Entre-temps
+    l'abonné ne garde que la frame la plus récente, qui part à l'acquittement.
+    """
+    from core.jpeg_encoder import websocket_message
+    
+    pipeline = get_pipeline(session)
+    if pipeline is None:
+        logger.error("Impossible d'ouvrir la caméra")
+        return
     
-    release_camera()
+    broadcaster = get_broadcaster(session)
+    subscriber = broadcaster.subscribe()
+    logger.info(f"Client WebSocket connecté ({session.session_id}, {broadcaster.client_count} actifs)")
+    
+    awaiting = None
+    sent_at = 0.0
+    try:
+        while session.is_running and pipeline.is_running:
+            if awaiting is None:
+                packet = subscriber.get(timeout=1.0)
+                if packet is None:
+                    continue
+                ws.send(websocket_message(packet.index, packet.captured_at, packet.data))
+                awaiting = packet.index & 0xFFFFFFFF
+                sent_at = time.monotonic()
+                continue
+            
+            message = ws.receive(timeout=0.5)
+            if message is not None:
+                ack = parse_ack(message)
+                if ack is not None and ack >= awaiting:
+                    awaiting = None
+            elif time.monotonic() - sent_at > PIPELINE_CONFIG["WS_ACK_TIMEOUT"]:
+                # Acquittement perdu : on repart sur la frame la plus récente
+                awaiting = None
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        logger.info(f"Client WebSocket déconnecté ({session.session_id}, {broadcaster.client_count} actifs)")
+        release_camera_if_idle(session)
+
+def parse_ack(message):
+    """Numéro de séquence d'un acquittement client {"ack": seq}, ou None"""
+    try:
+        ack = json.loads(message).get("ack")
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return ack if isinstance(ack, int) else None
+
+def release_camera_if_idle(session):
+    """Libère la caméra de la session quand plus personne ne la regarde"""
+    if session.broadcaster is None or session.broadcaster.client_count == 0:
+        release_camera(session)
 
 # ============================================================
 # Routes principales
@@ -269,142 +670,248 @@ def serve_css(filename):
 
 @app.route('/video_feed')
 def video_feed():
-    """Endpoint de streaming vidéo"""
-    if not app_state["is_running"]:
+    """Endpoint de streaming vidéo (?session=<borne>)"""
+    session = get_session(request.args.get('session'))
+    if session is None:
+        return "Session inconnue", 404
+    if not session.is_running:
         return "Streaming non démarré", 503
     
     return Response(
-        generate_frames(),
+        generate_frames(session),
         mimetype='multipart/x-mixed-replace; boundary=frame'
     )
 
+if sock is not None:
+    @sock.route('/ws/video')
+    def video_socket(ws):
+        """Flux vidéo WebSocket (frames JPEG binaires acquittées par le client)"""
+        session = get_session(request.args.get('session'))
+        if session is None or not session.is_running:
+            return
+        stream_websocket(ws, session)
+
 # ============================================================
 # API Endpoints
 # ============================================================
 
-@app.route('/api/select_face', methods=['POST'])
-def api_select_face():
-    """Sélectionner un visage pour le deepfake"""
-    data = request.get_json()
-    player_id = data.get('player')
-    
+# Les fonctions select_face, start_deepfake, stop_deepfake, update_option et
+# get_status portent la logique des endpoints ; elles retournent
+# (payload, code HTTP) et sont partagées avec le mode ASGI (asgi.py).
+# `session_id` désigne la borne (?session=...), la session par défaut si vide.
+
+# Mapping des noms d'options frontend -> backend
+OPTION_NAMES = {
+    "mouthMask": "mouth_mask",
+    "faceEnhancer": "face_enhancer",
+    "showFps": "show_fps",
+    "manyFaces": "many_faces",
+    "faceTracking": "face_tracking"
+}
+
+def select_face(player_id, session_id=None):
+    """Sélectionner un visage pour le deepfake (analyse bloquante si pas en cache)"""
+    session = get_session(session_id)
+    if session is None:
+        return unknown_session(session_id)
     if not player_id:
-        return jsonify({"success": False, "error": "Player ID requis"}), 400
+        return {"success": False, "error": "Player ID requis"}, 400
     
-    app_state["selected_player"] = player_id
+    session.selected_player = player_id
     
     # Charger le visage source
     source_face = load_source_face(player_id)
     if source_face is not None:
-        app_state["source_face"] = source_face
-        return jsonify({
+        session.source_face = source_face
+        return {
             "success": True,
             "player": player_id,
             "message": f"Visage {player_id} chargé et prêt"
-        })
+        }, 200
     else:
-        return jsonify({
+        return {
             "success": False,
             "error": f"Impossible de charger le visage {player_id}"
-        }), 400
+        }, 400
 
-@app.route('/api/start', methods=['POST'])
-def api_start():
+def start_deepfake(options=None, session_id=None):
     """Démarrer le deepfake"""
-    if not app_state["selected_player"]:
-        return jsonify({"success": False, "error": "Aucun visage sélectionné"}), 400
+    session = get_session(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    if not session.selected_player:
+        return {"success": False, "error": "Aucun visage sélectionné"}, 400
     
-    if app_state["source_face"] is None:
+    if session.source_face is None:
         # Tenter de recharger le visage
-        source_face = load_source_face(app_state["selected_player"])
+        source_face = load_source_face(session.selected_player)
         if source_face is None:
-            return jsonify({"success": False, "error": "Impossible de charger le visage source"}), 400
-        app_state["source_face"] = source_face
+            return {"success": False, "error": "Impossible de charger le visage source"}, 400
+        session.source_face = source_face
     
-    # Mettre à jour les options
-    data = request.get_json() or {}
-    if data.get('options'):
-        app_state["options"].update(data['options'])
-    
-    # Mettre à jour les globals
-    import core.globals
-    core.globals.many_faces = app_state["options"].get("many_faces", False)
-    core.globals.mouth_mask = app_state["options"].get("mouth_mask", False)
-    core.globals.show_fps = app_state["options"].get("show_fps", False)
+    # Mettre à jour les options (propres à la session : rien dans core.globals)
+    if options:
+        session.options.update((OPTION_NAMES.get(key, key), value) for key, value in options.items())
     
-    app_state["is_running"] = True
+    session.is_running = True
     
-    logger.info(f"DeepFake démarré avec visage: {app_state['selected_player']}")
+    logger.info(f"DeepFake démarré ({session.session_id}) avec visage: {session.selected_player}")
     
-    return jsonify({
+    return {
         "success": True,
         "message": "DeepFake démarré",
-        "state": {
-            "selected_player": app_state["selected_player"],
-            "is_running": app_state["is_running"],
-            "options": app_state["options"]
-        }
-    })
+        "state": session.get_state()
+    }, 200
 
-@app.route('/api/stop', methods=['POST'])
-def api_stop():
+def stop_deepfake(session_id=None):
     """Arrêter le deepfake"""
-    app_state["is_running"] = False
-    release_camera()
+    session = get_session(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    session.is_running = False
+    release_camera(session)
     
-    logger.info("DeepFake arrêté")
+    logger.info(f"DeepFake arrêté ({session.session_id})")
     
-    return jsonify({
+    return {
         "success": True,
         "message": "DeepFake arrêté"
-    })
+    }, 200
 
-@app.route('/api/option', methods=['POST'])
-def api_option():
-    """Mettre à jour une option"""
-    data = request.get_json()
-    option = data.get('option')
-    value = data.get('value')
-    
-    # Mapping des noms d'options frontend -> backend
-    option_map = {
-        "mouthMask": "mouth_mask",
-        "faceEnhancer": "face_enhancer", 
-        "showFps": "show_fps",
-        "manyFaces": "many_faces"
-    }
+def update_option(option, value, session_id=None):
+    """Mettre à jour une option de la session"""
+    session = get_session(session_id)
+    if session is None:
+        return unknown_session(session_id)
     
-    backend_option = option_map.get(option, option)
+    backend_option = OPTION_NAMES.get(option, option)
     
-    if backend_option not in app_state["options"]:
-        return jsonify({"success": False, "error": f"Option inconnue: {option}"}), 400
+    if backend_option not in session.options:
+        return {"success": False, "error": f"Option inconnue: {option}"}, 400
     
-    app_state["options"][backend_option] = value
+    session.options[backend_option] = value
     
-    # Mettre à jour les globals si nécessaire
-    import core.globals
-    if backend_option == "many_faces":
-        core.globals.many_faces = value
-    elif backend_option == "mouth_mask":
-        core.globals.mouth_mask = value
+    logger.info(f"Option mise à jour ({session.session_id}): {backend_option} = {value}")
     
-    logger.info(f"Option mise à jour: {backend_option} = {value}")
-    
-    return jsonify({
+    return {
         "success": True,
         "option": backend_option,
         "value": value
-    })
+    }, 200
+
+def get_analyser_stats():
+    """Temps par profil et par module d'analyse, si l'analyseur est chargé"""
+    if 'core.face_analyser' not in sys.modules:
+        return None
+    from core.face_analyser import get_analyser_timings
+    return get_analyser_timings()
+
+def get_batching_stats():
+    """Taille de lot atteinte par modèle, si le micro-batching a servi"""
+    if 'core.batching' not in sys.modules:
+        return None
+    from core.batching import get_batching_stats as batching_stats
+    return batching_stats()
+
+def get_status(session_id=None):
+    """Statut de la session, puis des ressources partagées par toutes les bornes"""
+    session = get_session(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    return {
+        "session": session.session_id,
+        "selected_player": session.selected_player,
+        "is_running": session.is_running,
+        "options": session.options,
+        "face_loaded": session.source_face is not None,
+        "pipeline": session.pipeline.get_stats() if session.pipeline else None,
+        "stream": session.broadcaster.get_stats() if session.broadcaster else None,
+        "sessions": get_sessions().get_stats(),
+        "scheduler": app_state["scheduler"].get_stats() if app_state["scheduler"] else None,
+        "batching": get_batching_stats(),
+        "workers": app_state["workers"].get_stats() if app_state["workers"] else None,
+        "face_cache": app_state["face_cache"].get_stats() if app_state["face_cache"] else None,
+        "analyser": get_analyser_stats(),
+        "quality": app_state["quality"].get_stats() if app_state["quality"] else None,
+        "encoder": app_state["encoder"].get_stats() if app_state["encoder"] else None,
+        "websocket": sock is not None,
+        "startup": STARTUP_PROFILE.get_report()
+    }, 200
+
+def request_session_id(data=None):
+    """Session de la requête : ?session=..., sinon champ "session" du corps JSON"""
+    return request.args.get('session') or (data or {}).get('session')
+
+@app.route('/api/select_face', methods=['POST'])
+def api_select_face():
+    """Sélectionner un visage pour le deepfake"""
+    data = request.get_json(silent=True) or {}
+    payload, status = select_face(data.get('player'), request_session_id(data))
+    return jsonify(payload), status
+
+@app.route('/api/start', methods=['POST'])
+def api_start():
+    """Démarrer le deepfake"""
+    data = request.get_json(silent=True) or {}
+    payload, status = start_deepfake(data.get('options'), request_session_id(data))
+    return jsonify(payload), status
+
+@app.route('/api/stop', methods=['POST'])
+def api_stop():
+    """Arrêter le deepfake"""
+    data = request.get_json(silent=True) or {}
+    payload, status = stop_deepfake(request_session_id(data))
+    return jsonify(payload), status
+
+@app.route('/api/option', methods=['POST'])
+def api_option():
+    """Mettre à jour une option"""
+    data = request.get_json(silent=True) or {}
+    payload, status = update_option(data.get('option'), data.get('value'), request_session_id(data))
+    return jsonify(payload), status
 
 @app.route('/api/status')
 def api_status():
     """Obtenir le statut actuel"""
-    return jsonify({
-        "selected_player": app_state["selected_player"],
-        "is_running": app_state["is_running"],
-        "options": app_state["options"],
-        "face_loaded": app_state["source_face"] is not None
-    })
+    payload, status = get_status(request_session_id())
+    return jsonify(payload), status
+
+@app.route('/api/sessions')
+def api_sessions():
+    """Bornes déclarées, état de chacune et partage du temps d'inférence"""
+    scheduler = app_state["scheduler"]
+    return jsonify(dict(
+        get_sessions().get_stats(),
+        scheduler=scheduler.get_stats() if scheduler else None,
+        batching=get_batching_stats(),
+        workers=app_state["workers"].get_stats() if app_state["workers"] else None
+    ))
+
+@app.route('/api/ready')
+def api_ready():
+    """Avancement du chargement des modèles (interrogé par l'interface)"""
+    return jsonify(get_readiness())
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Métriques au format texte Prometheus"""
+    from core.metrics import QUEUE_DEPTH, SESSION_FPS, STREAM_CLIENTS, render
+    
+    # Profondeur des files et clients (toutes sessions), FPS par session relevés au moment du scrape
+    depths = {}
+    clients = 0
+    for session in get_sessions().sessions():
+        pipeline = session.pipeline
+        SESSION_FPS.labels(session.session_id).set(pipeline.stats["inference"].fps if pipeline else 0)
+        if session.broadcaster is not None:
+            clients += session.broadcaster.client_count
+        if pipeline:
+            for queue, depth in pipeline.get_stats()["queue_depth"].items():
+                depths[queue] = depths.get(queue, 0) + depth
+    for queue, depth in depths.items():
+        QUEUE_DEPTH.labels(queue).set(depth)
+    STREAM_CLIENTS.set(clients)
+    return Response(render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/players')
 def api_players():
@@ -449,9 +956,22 @@ def main():
     ╚══════════════════════════════════════════════════════════════╝
     """)
     
+    STARTUP_PROFILE.mark("imports")
+    
+    if SERVER_CONFIG["MODE"] == "asgi":
+        # asgi.py importe ce fichier comme module `app` : l'état partagé est le sien
+        from asgi import main as asgi_main
+        asgi_main()
+        return
+    
     # Initialiser les modules IA
     init_ai_modules()
+    STARTUP_PROFILE.mark("modules IA")
+    
+    # Charger et préchauffer les modèles (et la galerie) en arrière-plan
+    start_model_loading()
     
+    STARTUP_PROFILE.mark("serveur")
     app.run(
         host=FLASK_CONFIG['HOST'],
         port=FLASK_CONFIG['PORT'],
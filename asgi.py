@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+DeepFake MIA - Mode ASGI
+Service asynchrone des endpoints de contrôle et des flux vidéo
+
+Usage:
+    python asgi.py
+    (ou SERVER_CONFIG["MODE"] = "asgi" dans config.py, puis python app.py)
+
+Les flux (/video_feed, /ws/video) sont servis par des générateurs async :
+chaque client attend sur la boucle d'événements, sans thread dédié. Les
+appels bloquants (analyse du visage source, ouverture / libération de la
+caméra) passent par un exécuteur borné (SERVER_CONFIG["INFERENCE_WORKERS"]),
+si bien que l'API reste réactive quand l'inférence sature. Les autres routes
+(page, fichiers statiques, /api/metrics...) sont déléguées à l'application
+Flask.
+
+Dépendances : starlette, uvicorn, a2wsgi.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+import app as webapp
+from config import FLASK_CONFIG, PIPELINE_CONFIG, SERVER_CONFIG
+from core.startup_profile import STARTUP_PROFILE
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=SERVER_CONFIG["INFERENCE_WORKERS"], thread_name_prefix="asgi-blocking"
+)
+
+
+async def run_blocking(func, *args):
+    """Exécute un appel bloquant hors de la boucle d'événements"""
+    return await asyncio.get_running_loop().run_in_executor(INFERENCE_EXECUTOR, func, *args)
+
+
+async def read_json(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+def session_id_of(request, data=None):
+    """Session de la requête : ?session=..., sinon champ "session" du corps JSON"""
+    return request.query_params.get('session') or (data or {}).get('session')
+
+
+# ============================================================
+# API
+# ============================================================
+
+async def api_select_face(request):
+    """Sélectionner un visage pour le deepfake"""
+    data = await read_json(request)
+    payload, status = await run_blocking(webapp.select_face, data.get('player'), session_id_of(request, data))
+    return JSONResponse(payload, status_code=status)
+
+
+async def api_start(request):
+    """Démarrer le deepfake"""
+    data = await read_json(request)
+    payload, status = await run_blocking(webapp.start_deepfake, data.get('options'), session_id_of(request, data))
+    return JSONResponse(payload, status_code=status)
+
+
+async def api_stop(request):
+    """Arrêter le deepfake (l'arrêt du pipeline attend la fin des threads)"""
+    data = await read_json(request)
+    payload, status = await run_blocking(webapp.stop_deepfake, session_id_of(request, data))
+    return JSONResponse(payload, status_code=status)
+
+
+async def api_option(request):
+    """Mettre à jour une option"""
+    data = await read_json(request)
+    payload, status = webapp.update_option(data.get('option'), data.get('value'), session_id_of(request, data))
+    return JSONResponse(payload, status_code=status)
+
+
+async def api_status(request):
+    """Obtenir le statut actuel"""
+    payload, status = webapp.get_status(session_id_of(request))
+    if status == 200:
+        payload = dict(payload, websocket=True)
+    return JSONResponse(payload, status_code=status)
+
+
+# ============================================================
+# Flux vidéo
+# ============================================================
+
+async def subscribe(session):
+    """Ouvre le pipeline de la session si besoin et inscrit un client asynchrone"""
+    from core.broadcaster import AsyncFrameSubscriber
+
+    pipeline = await run_blocking(webapp.get_pipeline, session)
+    if pipeline is None:
+        logger.error("Impossible d'ouvrir la caméra")
+        return None, None, None
+    broadcaster = webapp.get_broadcaster(session)
+    subscriber = broadcaster.subscribe(AsyncFrameSubscriber(asyncio.get_running_loop()))
+    return pipeline, broadcaster, subscriber
+
+
+def unsubscribe(session, broadcaster, subscriber):
+    broadcaster.unsubscribe(subscriber)
+    logger.info(f"Client vidéo déconnecté ({session.session_id}, {broadcaster.client_count} actifs)")
+    # Libération de la caméra hors de la boucle (elle attend les threads du pipeline)
+    INFERENCE_EXECUTOR.submit(webapp.release_camera_if_idle, session)
+
+
+async def video_feed(request):
+    """Flux MJPEG servi par un générateur async (?session=<borne>)"""
+    session = webapp.get_session(session_id_of(request))
+    if session is None:
+        return PlainTextResponse("Session inconnue", status_code=404)
+    if not session.is_running:
+        return PlainTextResponse("Streaming non démarré", status_code=503)
+
+    pipeline, broadcaster, subscriber = await subscribe(session)
+    if pipeline is None:
+        return PlainTextResponse("Caméra indisponible", status_code=503)
+    logger.info(f"Client vidéo connecté ({session.session_id}, {broadcaster.client_count} actifs)")
+
+    async def frames():
+        try:
+            while session.is_running and pipeline.is_running:
+                packet = await subscriber.get(timeout=1.0)
+                if packet is not None:
+                    yield packet.data
+        finally:
+            unsubscribe(session, broadcaster, subscriber)
+
+    return StreamingResponse(frames(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+
+async def video_socket(websocket):
+    """Flux WebSocket acquitté (même protocole que la route flask-sock)"""
+    from core.jpeg_encoder import websocket_message
+
+    await websocket.accept()
+    session = webapp.get_session(websocket.query_params.get('session'))
+    if session is None or not session.is_running:
+        await websocket.close()
+        return
+
+    pipeline, broadcaster, subscriber = await subscribe(session)
+    if pipeline is None:
+        await websocket.close()
+        return
+    logger.info(f"Client WebSocket connecté ({session.session_id}, {broadcaster.client_count} actifs)")
+
+    awaiting = None
+    sent_at = 0.0
+    try:
+        while session.is_running and pipeline.is_running:
+            if awaiting is None:
+                packet = await subscriber.get(timeout=1.0)
+                if packet is None:
+                    continue
+                await websocket.send_bytes(websocket_message(packet.index, packet.captured_at, packet.data))
+                awaiting = packet.index & 0xFFFFFFFF
+                sent_at = time.monotonic()
+                continue
+
+            try:
+                message = await asyncio.wait_for(websocket.receive_text(), 0.5)
+            except asyncio.TimeoutError:
+                if time.monotonic() - sent_at > PIPELINE_CONFIG["WS_ACK_TIMEOUT"]:
+                    # Acquittement perdu : on repart sur la frame la plus récente
+                    awaiting = None
+                continue
+            ack = webapp.parse_ack(message)
+            if ack is not None and ack >= awaiting:
+                awaiting = None
+    except WebSocketDisconnect:
+        pass
+    finally:
+        unsubscribe(session, broadcaster, subscriber)
+
+
+# ============================================================
+# Application
+# ============================================================
+
+@asynccontextmanager
+async def lifespan(application):
+    STARTUP_PROFILE.mark("serveur")
+    yield
+    INFERENCE_EXECUTOR.shutdown(wait=False)
+
+
+application = Starlette(
+    routes=[
+        Route('/api/select_face', api_select_face, methods=['POST']),
+        Route('/api/start', api_start, methods=['POST']),
+        Route('/api/stop', api_stop, methods=['POST']),
+        Route('/api/option', api_option, methods=['POST']),
+        Route('/api/status', api_status),
+        Route('/video_feed', video_feed),
+        WebSocketRoute('/ws/video', video_socket),
+        # Page, fichiers statiques, /api/metrics, /api/players, /api/ready, /api/sessions
+        Mount('/', WSGIMiddleware(webapp.app)),
+    ],
+    lifespan=lifespan,
+)
+
+
+def serve():
+    """Lance uvicorn sur l'hôte / port de FLASK_CONFIG"""
+    import uvicorn
+
+    uvicorn.run(application, host=FLASK_CONFIG['HOST'], port=FLASK_CONFIG['PORT'], log_level="info")
+
+
+def main():
+    """Modules IA, préchauffage en arrière-plan, puis uvicorn"""
+    webapp.init_ai_modules()
+    STARTUP_PROFILE.mark("modules IA")
+    webapp.start_model_loading()
+    serve()
+
+
+if __name__ == '__main__':
+    STARTUP_PROFILE.mark("imports")
+    main()
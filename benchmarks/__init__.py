@@ -0,0 +1,4 @@
+"""
+DeepFake MIA - Benchmarks
+Mesures hors ligne des étages de traitement (CPU, frames synthétiques)
+"""
@@ -0,0 +1,198 @@
+"""
+Benchmark du micro-batching entre sessions (bornes).
+
+Chaque flux est un thread qui enchaîne détection puis swap sur sa propre
+frame, comme le thread d'inférence d'une session. Pour 1, 2, 4... flux, le
+débit total et la latence par frame sont mesurés sans regroupement (un
+appel ONNX par flux) puis avec (core.batching : un appel par lot), ainsi
+que la taille de lot atteinte.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_batching --output batching.json
+    python -m benchmarks.bench_batching --streams 1,2,4,8 --max-wait-ms 5
+
+La détection batchée demande un détecteur à batch dynamique : sans
+détecteur de ce type, un substitut au format SCRFD est généré (det_10g du
+pack buffalo_l a un batch fixe de 1). Le swapper de substitution, comme
+inswapper_128 réexporté, accepte un batch dynamique. Avec un seul visage
+par frame et sans regroupement, le swap passe par INSwapper.get et sa
+propre composition : 2 visages par défaut pour comparer le même code.
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+import core.globals
+from benchmarks.common import environment, make_scene, make_source_face, parse_ints, write_report
+
+STAGES = ['detection', 'swap']
+
+
+def setup_models(work_dir: str, det_size: int) -> Dict[str, str]:
+    """Détecteur SCRFD à batch dynamique et swapper de substitution"""
+    import onnxruntime
+    import core.face_analyser as face_analyser
+    import core.processors.frame.face_swapper as face_swapper
+    from insightface.app import FaceAnalysis
+    from insightface.model_zoo.inswapper import INSwapper
+    from insightface.model_zoo.retinaface import RetinaFace
+    from benchmarks.stand_in_models import build_retina_detector, build_swapper
+
+    core.globals.execution_providers = ['CPUExecutionProvider']
+    detector_path = build_retina_detector(f"{work_dir}/stand_in_retina_detector.onnx")
+    det_model = RetinaFace(
+        model_file=detector_path,
+        session=onnxruntime.InferenceSession(detector_path, providers=['CPUExecutionProvider'])
+    )
+    det_model.prepare(0, input_size=(det_size, det_size), det_thresh=0.5)
+    analyser = FaceAnalysis.__new__(FaceAnalysis)
+    analyser.models = {'detection': det_model}
+    analyser.det_model = det_model
+    face_analyser.FACE_ANALYSERS['target'] = analyser
+    face_swapper.FACE_SWAPPER = INSwapper(build_swapper(f"{work_dir}/stand_in_swapper.onnx"))
+    return {"detector": "stand-in (SCRFD, batch dynamique)", "swapper": "stand-in"}
+
+
+def configure(batching: bool, max_batch: int, max_wait_ms: float) -> None:
+    """Active ou non le regroupement ; les micro-batchers sont recréés avec les réglages"""
+    import core.batching
+
+    for batcher in list(core.batching.BATCHERS.values()):
+        batcher.close()
+    core.batching.BATCHERS.clear()
+    core.globals.batching_config = {"ENABLED": batching, "MAX_BATCH": max_batch, "MAX_WAIT_MS": max_wait_ms}
+
+
+def run_streams(streams: int, frames: int, warmup: int, resolution: tuple, faces: int) -> Dict[str, Any]:
+    """`streams` threads de `frames` frames chacun ; latences par étage et débit total"""
+    from core.face_analyser import analyse_faces
+    from core.processors.frame.face_swapper import swap_faces
+
+    source_face = make_source_face()
+    scenes = [make_scene(resolution[0], resolution[1], faces) for _ in range(streams)]
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    lock = threading.Lock()
+    barrier = threading.Barrier(streams + 1)
+
+    def stream(frame: np.ndarray, target_faces: List[Any]) -> None:
+        for _ in range(warmup):
+            analyse_faces(frame)
+            swap_faces(source_face, target_faces, frame, False)
+        barrier.wait()
+        local: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        for _ in range(frames):
+            start = time.perf_counter()
+            analyse_faces(frame)
+            detected = time.perf_counter()
+            # Visages de la scène synthétique : le détecteur de substitution n'en trouve pas de vrais
+            swap_faces(source_face, target_faces, frame, False)
+            local['detection'].append(detected - start)
+            local['swap'].append(time.perf_counter() - detected)
+        with lock:
+            for stage in STAGES:
+                timings[stage].extend(local[stage])
+
+    threads = [threading.Thread(target=stream, args=scene) for scene in scenes]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result: Dict[str, Any] = {"fps": round(streams * frames / elapsed, 2)}
+    for stage in STAGES:
+        samples = np.array(timings[stage]) * 1000
+        result[f"{stage}_p50_ms"] = round(float(np.percentile(samples, 50)), 3)
+        result[f"{stage}_p95_ms"] = round(float(np.percentile(samples, 95)), 3)
+    return result
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import core.batching
+
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    with tempfile.TemporaryDirectory() as work_dir:
+        models = setup_models(work_dir, args.det_size)
+        results = []
+        for streams in parse_ints(args.streams):
+            for variant in ('per_stream', 'batched'):
+                configure(variant == 'batched', args.max_batch, args.max_wait_ms)
+                result = run_streams(streams, args.frames, args.warmup, (width, height), args.faces)
+                batching = core.batching.get_batching_stats()
+                result.update({
+                    "streams": streams,
+                    "variant": variant,
+                    "detection_batch": batching.get('detection', {}).get('avg_batch_size', 1.0),
+                    "swap_batch": batching.get('face_swapper', {}).get('avg_batch_size', 1.0),
+                })
+                results.append(result)
+                print(
+                    f"  {streams} flux {variant}: {result['fps']:.1f} fps, lots "
+                    f"{result['detection_batch']:.2f} / {result['swap_batch']:.2f}",
+                    file=sys.stderr
+                )
+        configure(False, args.max_batch, args.max_wait_ms)
+
+    return {
+        "benchmark": "batching",
+        "environment": environment(),
+        "models": models,
+        "stages": STAGES,
+        "settings": {
+            "resolution": f"{width}x{height}",
+            "faces": args.faces,
+            "det_size": args.det_size,
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "max_batch": args.max_batch,
+            "max_wait_ms": args.max_wait_ms,
+        },
+        "results": results,
+    }
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    """Résumé lisible sur stderr"""
+    header = (
+        f"{'streams':>8}{'variant':>12}{'fps':>9}{'det p50':>10}{'det p95':>10}"
+        f"{'swap p50':>10}{'swap p95':>10}{'det lot':>9}{'swap lot':>10}"
+    )
+    print(header, file=sys.stderr)
+    print('-' * len(header), file=sys.stderr)
+    for r in results:
+        print(
+            f"{r['streams']:>8}{r['variant']:>12}{r['fps']:>9.1f}{r['detection_p50_ms']:>10.2f}"
+            f"{r['detection_p95_ms']:>10.2f}{r['swap_p50_ms']:>10.2f}{r['swap_p95_ms']:>10.2f}"
+            f"{r['detection_batch']:>9.2f}{r['swap_batch']:>10.2f}",
+            file=sys.stderr
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark du micro-batching entre sessions")
+    parser.add_argument('--streams', default='1,2,4')
+    parser.add_argument('--frames', type=int, default=50, help="Frames par flux")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--faces', type=int, default=2, help="Visages swappés par frame")
+    parser.add_argument('--det-size', type=int, default=640)
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=8)
+    parser.add_argument('--output', default='-', help="Fichier JSON ('-' pour stdout)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_summary(report["results"])
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark de la composition masquée du face swapper.
+
+Compare les anciennes implémentations (mélanges en float32/float64 avec
+intermédiaires pleine taille, transfert de couleur en LAB flottant) au
+noyau en virgule fixe de face_swapper.blend_roi : latences, pic et nombre
+d'allocations par appel, et écart maximal entre les deux sorties.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_blend --output blend.json
+    python -m benchmarks.bench_blend --resolutions 640x480 --faces 1,4
+"""
+
+import argparse
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+import core.globals
+from benchmarks.common import (
+    count_allocations, environment, make_scene, measure, parse_ints,
+    parse_resolutions, write_report
+)
+from core.processors.frame.face_swapper import (
+    apply_color_transfer, apply_mouth_area, create_face_mask, create_lower_mouth_mask, crop_mask, paste_back
+)
+
+STAGES = ['paste_back', 'apply_mouth_area', 'apply_color_transfer']
+SWAP_SIZE = 128
+
+
+def baseline_paste_back(frame: np.ndarray, bgr_fake: np.ndarray, crop_shape: tuple, matrix: np.ndarray) -> None:
+    """Ancien paste_back : masque float32 et mélange float32"""
+    crop_h, crop_w = crop_shape
+    inverse = cv2.invertAffineTransform(matrix)
+    corners = np.array([[[0, 0]], [[crop_w, 0]], [[0, crop_h]], [[crop_w, crop_h]]], dtype=np.float32)
+    corners = cv2.transform(corners, inverse).reshape(-1, 2)
+    (min_x, min_y), (max_x, max_y) = corners.min(axis=0), corners.max(axis=0)
+
+    mask_size = int(np.sqrt(max(max_x - min_x, 1) * max(max_y - min_y, 1)))
+    margin = max(mask_size // 10, 10) + 2 * max(mask_size // 20, 5) + 2
+    x1 = max(0, int(min_x) - margin)
+    y1 = max(0, int(min_y) - margin)
+    x2 = min(frame.shape[1], int(np.ceil(max_x)) + margin)
+    y2 = min(frame.shape[0], int(np.ceil(max_y)) + margin)
+    if x2 <= x1 or y2 <= y1:
+        return
+
+    inverse[:, 2] -= (x1, y1)
+    roi_size = (x2 - x1, y2 - y1)
+    fake_roi = cv2.warpAffine(bgr_fake, inverse, roi_size, borderValue=0.0)
+    img_mask = cv2.warpAffine(
+        np.full((crop_h, crop_w), 255, dtype=np.float32), inverse, roi_size, borderValue=0.0
+    )
+    img_mask[img_mask > 20] = 255
+
+    mask_h_inds, mask_w_inds = np.where(img_mask == 255)
+    if mask_h_inds.size == 0:
+        return
+    mask_h = np.max(mask_h_inds) - np.min(mask_h_inds)
+    mask_w = np.max(mask_w_inds) - np.min(mask_w_inds)
+    mask_size = int(np.sqrt(mask_h * mask_w))
+    k = max(mask_size // 10, 10)
+    img_mask = cv2.erode(img_mask, np.ones((k, k), np.uint8), iterations=1)
+    k = max(mask_size // 20, 5)
+    img_mask = cv2.GaussianBlur(img_mask, (2 * k + 1, 2 * k + 1), 0)
+    img_mask = (img_mask / 255)[:, :, np.newaxis]
+
+    roi = frame[y1:y2, x1:x2]
+    roi[:] = (img_mask * fake_roi + (1 - img_mask) * roi.astype(np.float32)).astype(np.uint8)
+
+
+def baseline_color_transfer(source: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Ancien transfert de couleur : LAB converti en float32 à chaque appel"""
+    source = cv2.cvtColor(source, cv2.COLOR_BGR2LAB).astype("float32")
+    target = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype("float32")
+
+    source_mean, source_std = cv2.meanStdDev(source)
+    target_mean, target_std = cv2.meanStdDev(target)
+
+    source_mean = source_mean.reshape(1, 1, 3)
+    source_std = source_std.reshape(1, 1, 3)
+    target_mean = target_mean.reshape(1, 1, 3)
+    target_std = target_std.reshape(1, 1, 3)
+
+    source = (source - source_mean) * (target_std / source_std) + target_mean
+
+    return cv2.cvtColor(np.clip(source, 0, 255).astype("uint8"), cv2.COLOR_LAB2BGR)
+
+
+def baseline_mouth_area(
+    frame: np.ndarray, mouth_cutout: np.ndarray, mouth_box: tuple, face_mask: tuple, mouth_polygon: np.ndarray
+) -> np.ndarray:
+    """Ancien apply_mouth_area : masques float64, np.repeat et deux mélanges"""
+    min_x, min_y, max_x, max_y = mouth_box
+    box_width = max_x - min_x
+    box_height = max_y - min_y
+
+    resized_mouth_cutout = cv2.resize(mouth_cutout, (box_width, box_height))
+    roi = frame[min_y:max_y, min_x:max_x]
+    if roi.shape != resized_mouth_cutout.shape:
+        resized_mouth_cutout = cv2.resize(resized_mouth_cutout, (roi.shape[1], roi.shape[0]))
+
+    color_corrected_mouth = baseline_color_transfer(resized_mouth_cutout, roi)
+
+    polygon_mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(polygon_mask, [mouth_polygon - [min_x, min_y]], 255)
+
+    feather_amount = min(
+        30,
+        box_width // core.globals.mask_feather_ratio,
+        box_height // core.globals.mask_feather_ratio,
+    )
+    feathered_mask = cv2.GaussianBlur(polygon_mask.astype(float), (0, 0), feather_amount)
+    feathered_mask = feathered_mask / feathered_mask.max()
+
+    face_mask_roi = crop_mask(face_mask, (min_x, min_y, min_x + roi.shape[1], min_y + roi.shape[0]))
+    combined_mask = feathered_mask * (face_mask_roi / 255.0)
+
+    combined_mask = combined_mask[:, :, np.newaxis]
+    blended = (color_corrected_mouth * combined_mask + roi * (1 - combined_mask)).astype(np.uint8)
+
+    face_mask_3channel = np.repeat(face_mask_roi[:, :, np.newaxis], 3, axis=2) / 255.0
+    final_blend = blended * face_mask_3channel + roi * (1 - face_mask_3channel)
+
+    frame[min_y:max_y, min_x:max_x] = final_blend.astype(np.uint8)
+    return frame
+
+
+def build_inputs(frame: np.ndarray, faces: List[Any]) -> Dict[str, List[Tuple]]:
+    """Entrées de chaque étage, copiées hors des buffers de travail du module"""
+    from insightface.utils import face_align
+
+    pastes, mouths, patches = [], [], []
+    for face in faces:
+        crop, matrix = face_align.norm_crop2(frame, face.kps, SWAP_SIZE)
+        fake = cv2.add(crop, (25, 10, -15, 0))
+        pastes.append((fake, crop.shape[:2], matrix))
+
+        mask, box = create_face_mask(face, frame)
+        face_mask = (mask.copy(), box)
+        _, mouth_cutout, mouth_box, polygon = create_lower_mouth_mask(face, frame)
+        mouths.append((mouth_cutout, mouth_box, face_mask, polygon))
+
+        min_x, min_y, max_x, max_y = mouth_box
+        patches.append((cv2.add(mouth_cutout, (20, -10, 5, 0)), frame[min_y:max_y, min_x:max_x].copy()))
+    return {"paste_back": pastes, "apply_mouth_area": mouths, "apply_color_transfer": patches}
+
+
+def build_stages(frame: np.ndarray, inputs: Dict[str, List[Tuple]]) -> Dict[str, Dict[str, Callable[[], Any]]]:
+    """Pour chaque étage : (ancien, nouveau), chacun rendant sa sortie"""
+    def composite(paste: Callable, mouth: bool) -> Callable[[], Any]:
+        def run() -> Any:
+            target = frame.copy()
+            if mouth:
+                for args in inputs["apply_mouth_area"]:
+                    paste(target, *args)
+            else:
+                for args in inputs["paste_back"]:
+                    paste(target, *args)
+            return target
+        return run
+
+    def transfer(func: Callable) -> Callable[[], Any]:
+        return lambda: [func(source, roi).copy() for source, roi in inputs["apply_color_transfer"]]
+
+    return {
+        "paste_back": {
+            "baseline": composite(baseline_paste_back, False),
+            "fixed_point": composite(paste_back, False),
+        },
+        "apply_mouth_area": {
+            "baseline": composite(baseline_mouth_area, True),
+            "fixed_point": composite(apply_mouth_area, True),
+        },
+        "apply_color_transfer": {
+            "baseline": transfer(baseline_color_transfer),
+            "fixed_point": transfer(apply_color_transfer),
+        },
+    }
+
+
+def max_difference(baseline: Any, result: Any) -> int:
+    if isinstance(baseline, list):
+        return max((max_difference(b, r) for b, r in zip(baseline, result)), default=0)
+    return int(cv2.absdiff(baseline, result).max())
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    core.globals.mask_feather_ratio = args.feather_ratio
+    results = []
+    for width, height in parse_resolutions(args.resolutions):
+        for face_count in parse_ints(args.faces):
+            frame, faces = make_scene(width, height, face_count)
+            stages = build_stages(frame, build_inputs(frame, faces))
+            resolution = f"{width}x{height}"
+            for stage in STAGES:
+                variants = stages[stage]
+                difference = max_difference(variants["baseline"](), variants["fixed_point"]())
+                for variant, func in variants.items():
+                    result = measure(func, args.iterations, args.warmup)
+                    # La copie de la frame (ou des patchs) est commune aux deux variantes
+                    result.update({
+                        "stage": stage,
+                        "variant": variant,
+                        "resolution": resolution,
+                        "faces": face_count,
+                        "alloc_count": count_allocations(func),
+                        "max_abs_diff": difference,
+                    })
+                    results.append(result)
+                    print(
+                        f"  {stage} {variant} {resolution} x{face_count}: p50 {result['p50_ms']:.3f} ms, "
+                        f"{result['alloc_count']} allocations",
+                        file=sys.stderr
+                    )
+
+    return {
+        "benchmark": "blend",
+        "environment": environment(),
+        "stages": STAGES,
+        "settings": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "mask_feather_ratio": args.feather_ratio,
+            "alloc_min_bytes": 1024,
+        },
+        "results": results,
+    }
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    """Résumé lisible sur stderr"""
+    header = (
+        f"{'stage':<22}{'variant':>12}{'resolution':>11}{'faces':>6}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'allocs':>8}{'alloc KiB':>11}{'diff':>6}"
+    )
+    print(header, file=sys.stderr)
+    print('-' * len(header), file=sys.stderr)
+    for r in results:
+        print(
+            f"{r['stage']:<22}{r['variant']:>12}{r['resolution']:>11}{r['faces']:>6}"
+            f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['alloc_count']:>8}"
+            f"{r['alloc_peak_kib']:>11.1f}{r['max_abs_diff']:>6}",
+            file=sys.stderr
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la composition masquée du face swapper")
+    parser.add_argument('--resolutions', default='640x480,1280x720')
+    parser.add_argument('--faces', default='1,4')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--feather-ratio', type=int, default=8, help="core.globals.mask_feather_ratio")
+    parser.add_argument('--output', default='-', help="Fichier JSON ('-' pour stdout)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_summary(report["results"])
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark de l'encodage JPEG du flux live.
+
+Compare l'ancien chemin (cv2.imencode + tobytes() + concaténation de la
+partie multipart) à core.jpeg_encoder (OpenCV, et libjpeg-turbo si
+PyTurboJPEG est installé), puis mesure le débit avec 1..N threads.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_encode --output encode.json
+    python -m benchmarks.bench_encode --resolutions 640x480 --workers 1,2,4
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import cv2
+
+from benchmarks.common import environment, make_scene, measure, parse_ints, parse_resolutions, print_table, write_report
+from core.jpeg_encoder import TURBOJPEG_AVAILABLE, JpegEncoder
+
+JPEG_QUALITY = 80
+
+
+def baseline_chunk(frame: Any, quality: int = JPEG_QUALITY) -> bytes:
+    """Chemin d'origine : encodage, copie en bytes, puis concaténation par client"""
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+
+
+def build_encoders() -> Dict[str, Callable[[Any], Any]]:
+    # Une instance par backend, créée hors mesure
+    opencv = JpegEncoder('opencv')
+    encoders = {
+        'baseline': baseline_chunk,
+        'opencv': lambda frame: opencv.encode_chunk(frame, JPEG_QUALITY),
+    }
+    if TURBOJPEG_AVAILABLE:
+        turbo = JpegEncoder('turbojpeg')
+        if turbo.backend == 'turbojpeg':
+            encoders['turbojpeg'] = lambda frame: turbo.encode_chunk(frame, JPEG_QUALITY)
+    return encoders
+
+
+def throughput(encode: Callable[[Any], Any], frames: List[Any], workers: int) -> float:
+    """Frames encodées par seconde avec `workers` threads"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(encode, frames[:workers]))  # warmup
+        start = time.perf_counter()
+        list(executor.map(encode, frames))
+        elapsed = time.perf_counter() - start
+    return len(frames) / elapsed
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    encoders = build_encoders()
+    results = []
+    throughputs = []
+    for width, height in parse_resolutions(args.resolutions):
+        frame, _ = make_scene(width, height, 1)
+        resolution = f"{width}x{height}"
+        for name, encode in encoders.items():
+            result = measure(lambda: encode(frame), args.iterations, args.warmup)
+            result.update({"stage": name, "resolution": resolution, "faces": 1, "kib": round(len(encode(frame)) / 1024, 1)})
+            results.append(result)
+            print(f"  {name} {resolution}: p50 {result['p50_ms']:.3f} ms", file=sys.stderr)
+
+            frames = [frame.copy() for _ in range(args.frames)]
+            for workers in parse_ints(args.workers):
+                fps = throughput(encode, frames, workers)
+                throughputs.append({"encoder": name, "resolution": resolution, "workers": workers, "fps": round(fps, 1)})
+                print(f"  {name} {resolution} x{workers} threads: {fps:.1f} fps", file=sys.stderr)
+
+    return {
+        "benchmark": "encode",
+        "environment": environment(),
+        "encoders": list(encoders),
+        "settings": {"iterations": args.iterations, "warmup": args.warmup, "frames": args.frames, "jpeg_quality": JPEG_QUALITY},
+        "results": results,
+        "throughput": throughputs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de l'encodage JPEG du flux live")
+    parser.add_argument('--resolutions', default='640x480,1280x720')
+    parser.add_argument('--workers', default='1,2,4', help="Nombres de threads d'encodage")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--frames', type=int, default=200, help="Frames par mesure de débit")
+    parser.add_argument('--output', default='-', help="Fichier JSON ('-' pour stdout)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_table(report["results"])
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Micro-benchmarks des étages de traitement d'une frame.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_stages --output bench.json
+    python -m benchmarks.bench_stages --models stand-in --resolutions 640x480 --faces 1,4
+
+Sans les poids réels (models/, ~/.insightface/models/buffalo_l, GFPGAN),
+des modèles ONNX de substitution sont générés : les latences des étages
+numpy / OpenCV restent représentatives, celles des modèles ne le sont pas.
+Le champ "models" du rapport indique ce qui a été utilisé.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List
+
+import cv2
+
+import core.globals
+from benchmarks.common import (
+    environment, make_scene, make_source_face, measure, parse_ints,
+    parse_resolutions, print_table, write_report
+)
+
+STAGES = [
+    'get_one_face',
+    'swap_face',
+    'create_face_mask',
+    'create_lower_mouth_mask',
+    'apply_mouth_area',
+    'apply_color_transfer',
+    'enhance_face',
+    'enhance_faces',
+    'jpeg_encode',
+]
+JPEG_QUALITY = 80
+
+
+def setup_models(mode: str, work_dir: str) -> Dict[str, Any]:
+    """Charge les vrais modèles si présents (mode auto/real), sinon les substituts"""
+    import core.face_analyser as face_analyser
+    import core.processors.frame.face_swapper as face_swapper
+    import core.processors.frame.face_enhancer as face_enhancer
+    from insightface.model_zoo.inswapper import INSwapper
+    from benchmarks.stand_in_models import StandInAnalyser, StandInEnhancer, build_all, open_session
+
+    core.globals.execution_providers = ['CPUExecutionProvider']
+    stand_in = build_all(work_dir)
+    used = {}
+
+    buffalo_dir = os.path.expanduser(os.path.join('~', '.insightface', 'models', face_analyser.FACE_ANALYSER_MODEL))
+    if mode != 'stand-in' and os.path.isdir(buffalo_dir):
+        face_analyser.get_face_analyser('target')
+        used['analyser'] = face_analyser.FACE_ANALYSER_MODEL
+    else:
+        face_analyser.FACE_ANALYSERS['target'] = StandInAnalyser(stand_in['detector'])
+        used['analyser'] = 'stand-in'
+
+    swapper_path = os.path.join(face_swapper.models_dir, 'inswapper_128_fp16.onnx')
+    if mode != 'stand-in' and os.path.exists(swapper_path) and face_swapper.get_face_swapper() is not None:
+        used['swapper'] = os.path.basename(swapper_path)
+    else:
+        face_swapper.FACE_SWAPPER = INSwapper(stand_in['swapper'])
+        used['swapper'] = 'stand-in'
+
+    if mode != 'stand-in' and face_enhancer.get_face_enhancer() is not None:
+        used['enhancer'] = 'GFPGANv1.4'
+        if face_enhancer.get_onnx_enhancer() is not None:
+            used['enhancer'] += ' (recadrages : ONNX)'
+    else:
+        face_enhancer.FACE_ENHANCER = StandInEnhancer(stand_in['detector'], stand_in['enhancer'])
+        face_enhancer.ONNX_ENHANCER = open_session(stand_in['enhancer'])
+        face_enhancer.GFPGAN_AVAILABLE = True
+        face_enhancer.FACE_ENHANCER_FAILED = False
+        used['enhancer'] = 'stand-in'
+
+    if mode == 'real' and 'stand-in' in used.values():
+        missing = [name for name, model in used.items() if model == 'stand-in']
+        raise SystemExit(f"Modèles réels introuvables: {', '.join(missing)}")
+    return used
+
+
+def build_stages(frame: Any, faces: List[Any]) -> Dict[str, Callable[[], Any]]:
+    """Un appelable par étage ; les étages par visage traitent tous les visages de la frame"""
+    from core.face_analyser import get_one_face
+    from core.processors.frame.face_swapper import (
+        swap_face, create_face_mask, create_lower_mouth_mask, apply_mouth_area, apply_color_transfer
+    )
+    from core.processors.frame.face_enhancer import enhance_face, enhance_faces
+
+    source_face = make_source_face()
+    target = frame.copy()
+
+    # Entrées pré-calculées (copiées : les masques vivent dans des buffers réutilisés)
+    mouth_inputs = []
+    for face in faces:
+        face_mask = create_face_mask(face, frame)
+        if face_mask is not None:
+            face_mask = (face_mask[0].copy(), face_mask[1])
+        _, mouth_cutout, mouth_box, polygon = create_lower_mouth_mask(face, frame)
+        mouth_inputs.append((mouth_cutout, mouth_box, face_mask, polygon))
+    patches = [
+        (cutout, frame[box[1]:box[3], box[0]:box[2]].copy())
+        for cutout, box, _, _ in mouth_inputs if cutout is not None
+    ]
+
+    return {
+        'get_one_face': lambda: get_one_face(frame),
+        'swap_face': lambda: [swap_face(source_face, face, frame) for face in faces],
+        'create_face_mask': lambda: [create_face_mask(face, frame) for face in faces],
+        'create_lower_mouth_mask': lambda: [create_lower_mouth_mask(face, frame) for face in faces],
+        'apply_mouth_area': lambda: [apply_mouth_area(target, *inputs) for inputs in mouth_inputs],
+        'apply_color_transfer': lambda: [apply_color_transfer(source, roi) for source, roi in patches],
+        'enhance_face': lambda: enhance_face(frame),
+        'enhance_faces': lambda: enhance_faces(frame, faces),
+        'jpeg_encode': lambda: cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import core.face_analyser as face_analyser
+    import core.processors.frame.face_enhancer as face_enhancer
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        models = setup_models(args.models, work_dir)
+        results = []
+        for width, height in parse_resolutions(args.resolutions):
+            for face_count in parse_ints(args.faces):
+                frame, faces = make_scene(width, height, face_count)
+                analyser = face_analyser.FACE_ANALYSERS.get('target')
+                if hasattr(analyser, 'faces'):
+                    analyser.faces = faces
+                if hasattr(face_enhancer.FACE_ENHANCER, 'faces'):
+                    face_enhancer.FACE_ENHANCER.faces = faces
+
+                stages = build_stages(frame, faces)
+                for stage in args.stages.split(','):
+                    result = measure(stages[stage], args.iterations, args.warmup)
+                    result.update({"stage": stage, "resolution": f"{width}x{height}", "faces": face_count})
+                    results.append(result)
+                    print(f"  {stage} {width}x{height} x{face_count}: p50 {result['p50_ms']:.3f} ms", file=sys.stderr)
+
+    return {
+        "benchmark": "stages",
+        "environment": environment(),
+        "models": models,
+        "settings": {"iterations": args.iterations, "warmup": args.warmup, "jpeg_quality": JPEG_QUALITY},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks des étages de traitement d'une frame")
+    parser.add_argument('--resolutions', default='640x480,1280x720,1920x1080')
+    parser.add_argument('--faces', default='1,2,4', help="Nombres de visages par frame")
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--models', choices=['auto', 'real', 'stand-in'], default='auto')
+    parser.add_argument('--output', default='-', help="Fichier JSON ('-' pour stdout)")
+    args = parser.parse_args()
+
+    unknown = set(args.stages.split(',')) - set(STAGES)
+    if unknown:
+        parser.error(f"Étages inconnus: {', '.join(sorted(unknown))}")
+
+    report = run(args)
+    print_table(report["results"])
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
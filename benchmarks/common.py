@@ -0,0 +1,191 @@
+"""
+Outils communs aux benchmarks : scènes synthétiques, mesure de latence
+et d'allocations, export JSON
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from core.typing import Face
+
+
+def parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    """"640x480,1280x720" -> [(640, 480), (1280, 720)]"""
+    resolutions = []
+    for item in value.split(','):
+        width, height = item.lower().split('x')
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(',')]
+
+
+def make_landmarks(cx: float, cy: float, size: float) -> np.ndarray:
+    """106 landmarks plausibles (contour, sourcils, bouche) pour un visage centré en (cx, cy)"""
+    rng = np.random.default_rng(int(cx * 31 + cy))
+    points = np.empty((106, 2), dtype=np.float32)
+    points[:] = (cx, cy) + (rng.random((106, 2)) - 0.5) * size * 0.4
+
+    # Contour 0..32 : d'une oreille à l'autre en passant par le menton
+    angles = np.linspace(0, np.pi, 33)
+    points[0:33, 0] = cx + np.cos(angles) * size * 0.45
+    points[0:33, 1] = cy + np.sin(angles) * size * 0.55
+
+    # Sourcils
+    for start, side in ((43, -1), (97, 1)):
+        xs = np.linspace(0.05, 0.35, 8) * side * size + cx
+        points[start:start + 8, 0] = xs
+        points[start:start + 8, 1] = cy - size * 0.3
+
+    # Bouche 52..71
+    angles = np.linspace(0, 2 * np.pi, 20, endpoint=False)
+    points[52:72, 0] = cx + np.cos(angles) * size * 0.15
+    points[52:72, 1] = cy + size * 0.28 + np.sin(angles) * size * 0.06
+    return points
+
+
+def make_face(cx: float, cy: float, size: float) -> Face:
+    """Visage synthétique avec les champs utilisés par le swap et les masques"""
+    kps = np.array([
+        [cx - size * 0.18, cy - size * 0.12],
+        [cx + size * 0.18, cy - size * 0.12],
+        [cx, cy + size * 0.05],
+        [cx - size * 0.14, cy + size * 0.25],
+        [cx + size * 0.14, cy + size * 0.25],
+    ], dtype=np.float32)
+    bbox = np.array([cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2], dtype=np.float32)
+    return Face(bbox=bbox, kps=kps, det_score=0.9, landmark_2d_106=make_landmarks(cx, cy, size))
+
+
+def make_source_face() -> Face:
+    embedding = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    return Face(embedding=embedding)
+
+
+def make_scene(width: int, height: int, face_count: int) -> Tuple[np.ndarray, List[Face]]:
+    """Frame texturée et visages répartis sur une ligne, taille ~ 1/3 de la hauteur"""
+    rng = np.random.default_rng(width * height + face_count)
+    frame = cv2.GaussianBlur((rng.random((height, width, 3)) * 255).astype(np.uint8), (7, 7), 2)
+    size = min(height / 3, width / (face_count + 1))
+    faces = []
+    for i in range(face_count):
+        cx = width * (i + 1) / (face_count + 1)
+        cy = height / 2
+        faces.append(make_face(cx, cy, size))
+        cv2.ellipse(frame, (int(cx), int(cy)), (int(size * 0.45), int(size * 0.55)), 0, 0, 360, (120, 150, 190), -1)
+    return frame, faces
+
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    """Latences p50/p95/p99 (ms) puis pic mémoire alloué pendant un appel (KiB)"""
+    for _ in range(warmup):
+        func()
+
+    timings = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+
+    # Allocations mesurées à part : tracemalloc fausserait les latences
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(timings.mean()), 4),
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+        "alloc_peak_kib": round((peak - baseline) / 1024, 1),
+    }
+
+
+def count_allocations(func: Callable[[], Any], min_bytes: int = 1024) -> int:
+    """
+    Nombre d'allocations d'au moins `min_bytes` pendant un appel : le pic
+    tracemalloc est relevé à chaque opcode Python exécuté. Un appel C (ufunc,
+    fonction OpenCV) compte pour une allocation au plus, même s'il en fait
+    plusieurs en interne.
+    """
+    count = 0
+    last = 0
+
+    def sample() -> None:
+        nonlocal count, last
+        current, peak = tracemalloc.get_traced_memory()
+        if peak - last >= min_bytes:
+            count += 1
+        tracemalloc.reset_peak()
+        last, _ = tracemalloc.get_traced_memory()
+
+    def trace(frame: Any, event: str, arg: Any) -> Any:
+        frame.f_trace_opcodes = True
+        sample()
+        return trace
+
+    tracemalloc.start()
+    last, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    sys.settrace(trace)
+    try:
+        func()
+    finally:
+        sys.settrace(None)
+        sample()
+        tracemalloc.stop()
+    return count
+
+
+def environment() -> Dict[str, Any]:
+    info = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+    try:
+        import onnxruntime
+        info["onnxruntime"] = onnxruntime.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def write_report(report: Dict[str, Any], output: str) -> None:
+    """Écrit le rapport JSON (stdout si output vaut '-')"""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output == '-':
+        print(text)
+    else:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    """Résumé lisible sur stderr"""
+    header = f"{'stage':<26}{'resolution':>11}{'faces':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'alloc KiB':>11}"
+    print(header, file=sys.stderr)
+    print('-' * len(header), file=sys.stderr)
+    for r in results:
+        print(
+            f"{r['stage']:<26}{r['resolution']:>11}{r['faces']:>6}"
+            f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['alloc_peak_kib']:>11.1f}",
+            file=sys.stderr
+        )
@@ -0,0 +1,196 @@
+"""
+Modèles de substitution pour les benchmarks sans poids réels :
+petits graphes ONNX avec les mêmes entrées / sorties que les vrais modèles
+"""
+
+import os
+from typing import Any, List
+
+import cv2
+import numpy as np
+import onnx
+import onnxruntime
+from onnx import TensorProto, helper, numpy_helper
+
+from core.typing import Face
+
+OPSET = 13
+
+
+def _conv(name: str, inputs: str, output: str, in_ch: int, out_ch: int, stride: int, rng: Any) -> tuple:
+    weight = numpy_helper.from_array(
+        (rng.standard_normal((out_ch, in_ch, 3, 3)) * 0.1).astype(np.float32), f"{name}_w"
+    )
+    node = helper.make_node(
+        'Conv', [inputs, f"{name}_w"], [output], kernel_shape=[3, 3], pads=[1, 1, 1, 1], strides=[stride, stride]
+    )
+    return node, weight
+
+
+def _save(graph: Any, path: str) -> str:
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', OPSET)])
+    model.ir_version = 7
+    onnx.save(model, path)
+    return path
+
+
+def build_detector(path: str) -> str:
+    """Détecteur : [1,3,H,W] -> carte de scores [1,6,H/8,W/8]"""
+    rng = np.random.default_rng(1)
+    nodes, weights = [], []
+    for i, (src, dst, cin, cout) in enumerate((('input', 'c1', 3, 16), ('r1', 'c2', 16, 32), ('r2', 'c3', 32, 6))):
+        node, weight = _conv(f"conv{i}", src, dst, cin, cout, 2, rng)
+        nodes.append(node)
+        weights.append(weight)
+        if i < 2:
+            nodes.append(helper.make_node('Relu', [dst], [f"r{i + 1}"]))
+    graph = helper.make_graph(
+        nodes, 'stand_in_detector',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [1, 3, 'H', 'W'])],
+        [helper.make_tensor_value_info('c3', TensorProto.FLOAT, [1, 6, 'h', 'w'])],
+        weights
+    )
+    return _save(graph, path)
+
+
+def build_retina_detector(path: str) -> str:
+    """
+    Détecteur au format SCRFD (det_10g) à batch dynamique : [N,3,H,W] ->
+    scores / distances des boîtes / points clés pour les pas 8, 16 et 32,
+    deux ancres par position ([N, h*w*2, 1|4|10])
+    """
+    rng = np.random.default_rng(4)
+    nodes, weights, outputs = [], [], {}
+    source, channels = 'input', 3
+    for i, stride in enumerate((2, 2, 2, 2, 2)):
+        node, weight = _conv(f"trunk{i}", source, f"t{i}", channels, 16, stride, rng)
+        nodes += [node, helper.make_node('Relu', [f"t{i}"], [f"f{i}"])]
+        weights.append(weight)
+        source, channels = f"f{i}", 16
+    for level, stride in zip((2, 3, 4), (8, 16, 32)):
+        for head, width, activation in (('score', 1, 'Sigmoid'), ('bbox', 4, 'Softplus'), ('kps', 10, None)):
+            name = f"{head}_{stride}"
+            node, weight = _conv(name, f"f{level}", f"{name}_c", 16, 2 * width, 1, rng)
+            shape = numpy_helper.from_array(np.array([0, -1, width], dtype=np.int64), f"{name}_shape")
+            nodes += [
+                node,
+                helper.make_node('Transpose', [f"{name}_c"], [f"{name}_t"], perm=[0, 2, 3, 1]),
+                helper.make_node('Reshape', [f"{name}_t", f"{name}_shape"], [f"{name}_r" if activation else name]),
+            ]
+            if head == 'score':
+                # Scores centrés bas : quelques dizaines de candidats au-dessus du seuil, pas des milliers
+                nodes.append(helper.make_node('Add', [f"{name}_r", 'score_bias'], [f"{name}_b"]))
+                nodes.append(helper.make_node(activation, [f"{name}_b"], [name]))
+            elif activation:
+                nodes.append(helper.make_node(activation, [f"{name}_r"], [name]))
+            weights += [weight, shape]
+            outputs[name] = helper.make_tensor_value_info(name, TensorProto.FLOAT, ['N', 'A', width])
+    weights.append(numpy_helper.from_array(np.array([-3.0], dtype=np.float32), 'score_bias'))
+    order = [f"{head}_{stride}" for head in ('score', 'bbox', 'kps') for stride in (8, 16, 32)]
+    graph = helper.make_graph(
+        nodes, 'stand_in_retina_detector',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['N', 3, 'H', 'W'])],
+        [outputs[name] for name in order],
+        weights
+    )
+    return _save(graph, path)
+
+
+def build_swapper(path: str) -> str:
+    """Swapper au format inswapper_128 : target [N,3,128,128] + source [N,512], emap en dernier initializer"""
+    rng = np.random.default_rng(2)
+    node, weight = _conv('conv', 'target', 'c1', 3, 3, 1, rng)
+    emap = numpy_helper.from_array(np.eye(512, dtype=np.float32), 'emap')
+    nodes = [
+        node,
+        helper.make_node('MatMul', ['source', 'emap'], ['latent']),
+        helper.make_node('ReduceMean', ['latent'], ['latent_mean'], axes=[1], keepdims=1),
+        helper.make_node('Unsqueeze', ['latent_mean', 'axes'], ['latent_4d']),
+        helper.make_node('Add', ['c1', 'latent_4d'], ['sum']),
+        helper.make_node('Sigmoid', ['sum'], ['output']),
+    ]
+    axes = numpy_helper.from_array(np.array([2, 3], dtype=np.int64), 'axes')
+    graph = helper.make_graph(
+        nodes, 'stand_in_swapper',
+        [
+            helper.make_tensor_value_info('target', TensorProto.FLOAT, ['N', 3, 128, 128]),
+            helper.make_tensor_value_info('source', TensorProto.FLOAT, ['N', 512]),
+        ],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['N', 3, 128, 128])],
+        [weight, axes, emap]
+    )
+    return _save(graph, path)
+
+
+def build_enhancer(path: str) -> str:
+    """Restauration : [N,3,512,512] -> [N,3,512,512]"""
+    rng = np.random.default_rng(3)
+    conv1, w1 = _conv('conv1', 'input', 'c1', 3, 8, 1, rng)
+    conv2, w2 = _conv('conv2', 'r1', 'output', 8, 3, 1, rng)
+    graph = helper.make_graph(
+        [conv1, helper.make_node('Relu', ['c1'], ['r1']), conv2], 'stand_in_enhancer',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['N', 3, 512, 512])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['N', 3, 512, 512])],
+        [w1, w2]
+    )
+    return _save(graph, path)
+
+
+def open_session(path: str) -> onnxruntime.InferenceSession:
+    return onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+
+class StandInAnalyser:
+    """Remplace FaceAnalysis : vraie inférence ONNX, visages de la scène synthétique"""
+
+    def __init__(self, model_path: str, det_size: tuple = (640, 640)):
+        self.session = open_session(model_path)
+        self.det_size = det_size
+        self.faces: List[Face] = []
+        # FaceAnalysis.det_model : seule la session (batch fixe) est consultée
+        self.det_model = self
+
+    def get(self, img: np.ndarray, max_num: int = 0) -> List[Face]:
+        blob = cv2.dnn.blobFromImage(img, 1.0 / 128, self.det_size, (127.5, 127.5, 127.5), swapRB=True)
+        self.session.run(None, {'input': blob})
+        return [Face(d=dict(face)) for face in self.faces]
+
+
+class StandInEnhancer:
+    """Remplace GFPGANer : détection de substitution puis restauration 512x512 par visage"""
+
+    def __init__(self, detector_path: str, model_path: str):
+        self.detector = StandInAnalyser(detector_path)
+        self.session = open_session(model_path)
+
+    @property
+    def faces(self) -> List[Face]:
+        return self.detector.faces
+
+    @faces.setter
+    def faces(self, faces: List[Face]) -> None:
+        self.detector.faces = faces
+
+    def enhance(self, img: np.ndarray, has_aligned: bool = False, only_center_face: bool = False, paste_back: bool = True) -> tuple:
+        restored_img = img.copy()
+        for face in self.detector.get(img):
+            x1, y1, x2, y2 = np.clip(face.bbox.astype(int), 0, [img.shape[1], img.shape[0]] * 2)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            crop = cv2.resize(img[y1:y2, x1:x2], (512, 512))
+            blob = cv2.dnn.blobFromImage(crop, 1.0 / 255, (512, 512), swapRB=True)
+            output = self.session.run(None, {'input': blob})[0][0]
+            restored = np.clip(output.transpose(1, 2, 0) * 255, 0, 255).astype(np.uint8)[:, :, ::-1]
+            restored_img[y1:y2, x1:x2] = cv2.resize(restored, (x2 - x1, y2 - y1))
+        return [], [], restored_img
+
+
+def build_all(directory: str) -> dict:
+    """Construit les modèles de substitution dans `directory`"""
+    os.makedirs(directory, exist_ok=True)
+    return {
+        "detector": build_detector(os.path.join(directory, 'stand_in_detector.onnx')),
+        "retina_detector": build_retina_detector(os.path.join(directory, 'stand_in_retina_detector.onnx')),
+        "swapper": build_swapper(os.path.join(directory, 'stand_in_swapper.onnx')),
+        "enhancer": build_enhancer(os.path.join(directory, 'stand_in_enhancer.onnx')),
+    }
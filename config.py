@@ -14,6 +14,11 @@ MODELS_DIR = os.path.join(BASE_DIR, 'models')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 FACES_DIR = os.path.join(STATIC_DIR, 'faces')
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+FACE_CACHE_DIR = os.path.join(CACHE_DIR, 'faces')
+ONNX_CACHE_DIR = os.path.join(CACHE_DIR, 'onnx')
+QUANTIZED_MODELS_DIR = os.path.join(MODELS_DIR, 'quantized')
+VALIDATION_DIR = os.path.join(BASE_DIR, 'validation')
 
 # Modèles IA
 INSWAPPER_MODEL = os.path.join(MODELS_DIR, 'inswapper_128_fp16.onnx')
@@ -51,6 +56,7 @@ DEFAULT_OPTIONS = {
     "face_enhancer": False,
     "show_fps": False,
     "many_faces": False,
+    "face_tracking": False,
 }
 
 # ============================================================
@@ -64,6 +70,135 @@ FLASK_CONFIG = {
     "PORT": 5000,
 }
 
+SERVER_CONFIG = {
+    "MODE": "threaded",       # "threaded" (serveur Flask) ou "asgi" (uvicorn, voir asgi.py)
+    "INFERENCE_WORKERS": 2,   # Mode ASGI : threads pour les appels bloquants (analyse, caméra)
+}
+
+# ============================================================
+# Caméra / Streaming
+# ============================================================
+
+CAMERA_CONFIG = {
+    "INDEX": 0,
+    "WIDTH": 640,
+    "HEIGHT": 480,
+    "FPS": 30,
+}
+
+PIPELINE_CONFIG = {
+    "QUEUE_SIZE": 1,      # Frames max entre deux étages (la plus récente gagne)
+    "JPEG_QUALITY": 80,
+    "JPEG_BACKEND": "auto",  # "auto", "turbojpeg" (PyTurboJPEG) ou "opencv"
+    "ENCODE_WORKERS": 2,     # Threads d'encodage JPEG
+    "WS_ACK_TIMEOUT": 2.0,   # Secondes sans acquittement avant de renvoyer la frame la plus récente
+}
+
+# ============================================================
+# Sessions (plusieurs bornes sur un même serveur)
+# ============================================================
+
+SESSIONS_CONFIG = {
+    "DEFAULT": "default",     # Session des requêtes sans ?session=
+    # Bornes déclarées : id -> entrée vidéo (index de caméra, fichier ou URL de flux)
+    "INPUTS": {
+        "default": CAMERA_CONFIG["INDEX"],
+    },
+    "INFERENCE_SLOTS": 1,     # Inférences simultanées, toutes bornes confondues (1 sur CPU)
+    "WEIGHTS": {},            # Part relative du temps d'inférence par borne (défaut 1)
+}
+
+# Micro-batching : détection et swap de toutes les bornes regroupés en un
+# appel ONNX par fenêtre (utile à partir de deux bornes, surtout sur GPU).
+# Un lot part dès qu'il contient une requête de chaque borne active, au plus
+# tard MAX_WAIT_MS après la première. Le batch de détection demande un
+# détecteur exporté avec une dimension de batch dynamique (det_10g du pack
+# buffalo_l a un batch fixe de 1 : les détections du lot sont alors faites
+# une par une, sans gain).
+BATCHING_CONFIG = {
+    "ENABLED": False,
+    "MAX_BATCH": 8,           # Requêtes max par appel ONNX
+    "MAX_WAIT_MS": 8,         # Attente max après la première requête d'un lot
+}
+
+# ============================================================
+# Workers d'inférence (processus séparés)
+# ============================================================
+
+# Tout le travail d'une frame live (détection, swap, masques, enhancer,
+# encodage JPEG) dans des processus séparés : le processus web ne fait que
+# la capture et la diffusion, et le travail numpy / OpenCV occupe tous les
+# cœurs. Les frames passent par un anneau en mémoire partagée. Chaque
+# worker charge ses propres modèles (mémoire et VRAM multipliées).
+INFERENCE_WORKERS_CONFIG = {
+    "ENABLED": False,
+    "WORKERS": 2,             # Processus d'inférence (une borne reste sur le même worker)
+    "RING_SLOTS": 8,          # Emplacements de frame en mémoire partagée
+    "MAX_WIDTH": 1920,        # Frame max d'un emplacement (plus grande : traitée dans le processus web)
+    "MAX_HEIGHT": 1080,
+    "REQUEST_TIMEOUT": 5.0,   # Secondes sans réponse avant de tuer et relancer le worker
+    "RESTART_DELAY": 1.0,     # Secondes avant la relance d'un worker arrêté
+    "START_TIMEOUT": 300,     # Attente max du préchauffage des workers (/api/ready)
+}
+
+# ============================================================
+# Qualité adaptative (flux live)
+# ============================================================
+
+QUALITY_CONFIG = {
+    "ENABLED": False,         # Désactivé : JPEG, det_size, échelle et enhancer fixes
+    "TARGET_FPS": 20,
+    "DOWNGRADE_RATIO": 1.1,   # Au-dessus de budget × ratio : on dégrade
+    "UPGRADE_RATIO": 0.7,     # En dessous de budget × ratio : on améliore
+    "DOWNGRADE_FRAMES": 10,
+    "UPGRADE_FRAMES": 60,
+    "COOLDOWN_FRAMES": 30,
+    # Du meilleur au plus léger ; det_size multiple de 32,
+    # enhancer_every = 1 frame sur N passe par l'enhancer (0 = jamais)
+    "LEVELS": [
+        {"det_size": 640, "detect_interval": 3, "scale": 1.0, "jpeg_quality": 85, "enhancer_every": 1},
+        {"det_size": 640, "detect_interval": 5, "scale": 1.0, "jpeg_quality": 80, "enhancer_every": 2},
+        {"det_size": 480, "detect_interval": 5, "scale": 1.0, "jpeg_quality": 75, "enhancer_every": 4},
+        {"det_size": 320, "detect_interval": 8, "scale": 0.75, "jpeg_quality": 70, "enhancer_every": 0},
+        {"det_size": 256, "detect_interval": 10, "scale": 0.5, "jpeg_quality": 60, "enhancer_every": 0},
+    ],
+}
+
+# ============================================================
+# Mode CPU INT8 (python -m core.quantization build)
+# ============================================================
+
+QUANTIZATION_CONFIG = {
+    "ENABLED": False,                 # Charger les variantes INT8 validées (sans GPU uniquement)
+    "MODELS": ["detection", "face_swapper"],
+    "DIR": QUANTIZED_MODELS_DIR,      # Modèles INT8 et rapports de validation
+    "CALIBRATION_DIR": FACES_DIR,     # Images de calibration (galerie par défaut)
+    "VALIDATION_DIR": VALIDATION_DIR, # Jeu d'images local de validation, distinct de la calibration
+    "CALIBRATION_SAMPLES": 64,        # Entrées max par modèle
+    "CALIBRATION_METHOD": "minmax",   # "minmax", "entropy" ou "percentile"
+    "PER_CHANNEL": True,
+    "REDUCE_RANGE": False,            # True sur les CPU x86 sans VNNI en cas de saturation
+    # Seuils d'activation (comparaison aux modèles de référence)
+    "MIN_DETECTION_RECALL": 0.97,     # Visages de référence retrouvés (IoU >= 0.5)
+    "MIN_IDENTITY_SIMILARITY": 0.90,  # Cosinus ArcFace entre visages échangés INT8 et référence
+    "MIN_VALIDATION_FACES": 20,
+}
+
+# ============================================================
+# Préchauffage des modèles (démarrage)
+# ============================================================
+
+WARMUP_CONFIG = {
+    "ENABLED": True,          # Charge et exécute chaque modèle à vide en arrière-plan
+    "ENHANCER": True,         # Inclure GFPGAN (s'il est installé) même si l'option est désactivée
+    "QUALITY_SIZES": True,    # Détection à vide pour chaque det_size de QUALITY_CONFIG["LEVELS"]
+}
+
+STARTUP_CONFIG = {
+    "PROFILE_IMPORTS": False,  # Temps d'import par paquet (voir aussi python -m core.startup_profile)
+    "LOG_REPORT": True,        # Journalise le profil de démarrage à la fin du préchauffage
+}
+
 # ============================================================
 # Exécution
 # ============================================================
@@ -71,3 +206,46 @@ FLASK_CONFIG = {
 EXECUTION_PROVIDERS = ['CUDAExecutionProvider', 'CPUExecutionProvider']
 EXECUTION_THREADS = 8
 MAX_MEMORY = 8  # GB
+# Traitement vidéo hors ligne : "thread" (un processus) ou "process" (EXECUTION_PROCESSES
+# workers, chacun avec ses sessions ONNX et EXECUTION_THREADS / workers threads intra-op)
+EXECUTION_BACKEND = "thread"
+EXECUTION_PROCESSES = 2
+# Frames décodées et réencodées par pipes ffmpeg (sans PNG temporaires) ; repli
+# automatique sur l'extraction en PNG si le flux échoue
+VIDEO_STREAMING = True
+
+# Sessions ONNX Runtime (toutes les sessions passent par core/onnx_session.py)
+ONNX_SESSION_CONFIG = {
+    "INTRA_OP_THREADS": 0,            # 0 = EXECUTION_THREADS (au plus un par cœur logique)
+    "INTER_OP_THREADS": 1,            # Utile en mode "parallel" seulement
+    "GRAPH_OPTIMIZATION": "all",      # "disable", "basic", "extended" ou "all"
+    "EXECUTION_MODE": "sequential",   # "parallel" : branches indépendantes du graphe en parallèle
+    "ALLOW_SPINNING": True,           # False : threads ORT sans attente active (plusieurs sessions par cœur)
+    "CPU_MEM_ARENA": True,
+    "MEM_PATTERN": True,
+    "GPU_ARENA_EXTEND_STRATEGY": "kNextPowerOfTwo",  # ou "kSameAsRequested" (moins de mémoire réservée)
+    "GPU_MEM_LIMIT_GB": 0,            # 0 = pas de limite
+    "CACHE_OPTIMIZED": True,          # Graphes optimisés sérialisés dans ONNX_CACHE_DIR
+    # Surcharges par modèle (mêmes clés), ex. {"face_swapper": {"INTRA_OP_THREADS": 4}}
+    "MODELS": {
+        "detection": {},
+        "landmark_2d_106": {},
+        "recognition": {},
+        "face_swapper": {},
+        "face_enhancer": {},
+    },
+}
+
+# Profils d'analyse insightface (buffalo_l)
+# - target : frames live, seuls détection, kps et landmarks 106 (masques bouche/visage)
+# - source : visages de la galerie, avec l'embedding de reconnaissance pour le swap
+ANALYSER_PROFILES = {
+    "target": {
+        "allowed_modules": ["detection", "landmark_2d_106"],
+        "det_size": (640, 640),
+    },
+    "source": {
+        "allowed_modules": ["detection", "landmark_2d_106", "recognition"],
+        "det_size": (640, 640),
+    },
+}
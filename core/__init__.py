@@ -1,11 +1,22 @@
 """
 DeepFake MIA - Core Module
 Logique métier pour le face swap en temps réel
+
+Les sous-modules lourds (insightface via face_analyser, OpenCV via
+video_capture) ne sont importés qu'au premier accès à leurs symboles :
+`import core.globals` reste instantané et le serveur web démarre avant
+le chargement des dépendances d'inférence.
 """
 
+from importlib import import_module
+
 from . import globals
-from .face_analyser import get_one_face, get_many_faces
-from .video_capture import VideoCapturer
+
+_LAZY_ATTRIBUTES = {
+    'get_one_face': 'face_analyser',
+    'get_many_faces': 'face_analyser',
+    'VideoCapturer': 'video_capture',
+}
 
 __all__ = [
     'globals',
@@ -13,3 +24,9 @@ __all__ = [
     'get_many_faces',
     'VideoCapturer'
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,179 @@
+"""
+DeepFake MIA - Micro-batching de l'inférence
+Regroupe les requêtes de détection et de swap des différentes sessions
+(bornes) arrivées dans une courte fenêtre en un seul appel ONNX batché
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import core.globals
+from core.metrics import BATCH_SIZE, BATCH_WAIT_SECONDS
+
+BATCHERS: Dict[str, "MicroBatcher"] = {}
+THREAD_LOCK = threading.Lock()
+
+
+class _Request:
+    __slots__ = ("item", "key", "submitted_at", "done", "result", "error")
+
+    def __init__(self, item: Any, key: Any):
+        self.item = item
+        self.key = key
+        self.submitted_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    File de requêtes servie par un thread. La première requête ouvre un
+    lot, qui part dès qu'il contient `max_batch` requêtes, une requête de
+    chaque flux actif (flux ayant soumis depuis moins de `active_window` s),
+    ou `max_wait` secondes après son ouverture : un flux seul ne paie aucune
+    attente. `run_batch(items)` retourne un résultat par requête, dans
+    l'ordre ; son exception est relevée chez chaque appelant du lot.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int = 8,
+        max_wait: float = 0.008,
+        active_window: float = 1.0,
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.active_window = active_window
+        self._condition = threading.Condition()
+        self._pending: List[_Request] = []
+        self._last_seen: Dict[Any, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+        self._waited = 0.0
+        self._busy = 0.0
+
+    def submit(self, item: Any, key: Any = None) -> Any:
+        """Ajoute `item` au prochain lot et attend son résultat (`key` : flux, défaut le thread appelant)"""
+        request = _Request(item, key if key is not None else threading.get_ident())
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"Micro-batcher {self.name} arrêté")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._last_seen[request.key] = request.submitted_at
+            self._condition.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def close(self) -> None:
+        """Sert les requêtes en attente puis arrête le thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _active_streams(self, now: float) -> int:
+        for key in [k for k, seen in self._last_seen.items() if now - seen > self.active_window]:
+            del self._last_seen[key]
+        return max(1, len(self._last_seen))
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0].submitted_at + self.max_wait
+            while not self._closed:
+                now = time.perf_counter()
+                target = min(self.max_batch, self._active_streams(now))
+                if len(self._pending) >= target or now >= deadline:
+                    break
+                self._condition.wait(deadline - now)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._execute(batch)
+
+    def _execute(self, batch: List[_Request]) -> None:
+        start = time.perf_counter()
+        try:
+            results = self.run_batch([request.item for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            elapsed = time.perf_counter() - start
+            waited = sum(start - request.submitted_at for request in batch)
+            with self._condition:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest = max(self._largest, len(batch))
+                self._waited += waited
+                self._busy += elapsed
+            BATCH_SIZE.labels(self.name).observe(len(batch))
+            for request in batch:
+                BATCH_WAIT_SECONDS.labels(self.name).observe(start - request.submitted_at)
+                request.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            batches, items = self._batches, self._items
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "batches": batches,
+                "requests": items,
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "largest_batch": self._largest,
+                "avg_wait_ms": round(self._waited / items * 1000, 2) if items else 0.0,
+                "avg_batch_ms": round(self._busy / batches * 1000, 2) if batches else 0.0,
+                "pending": len(self._pending),
+                "active_streams": len(self._last_seen),
+            }
+
+
+def get_batcher(name: str, run_batch: Callable[[List[Any]], List[Any]]) -> Optional[MicroBatcher]:
+    """Micro-batcher `name` (créé au premier appel), None si le regroupement est désactivé"""
+    config = core.globals.batching_config
+    if not config.get("ENABLED"):
+        return None
+    with THREAD_LOCK:
+        if name not in BATCHERS:
+            BATCHERS[name] = MicroBatcher(
+                name,
+                run_batch,
+                max_batch=config.get("MAX_BATCH", 8),
+                max_wait=config.get("MAX_WAIT_MS", 8) / 1000,
+            )
+        return BATCHERS[name]
+
+
+def get_batching_stats() -> Dict[str, Dict[str, Any]]:
+    """Taille de lot atteinte, attente et durée des appels, par modèle"""
+    with THREAD_LOCK:
+        batchers = dict(BATCHERS)
+    return {name: batcher.get_stats() for name, batcher in batchers.items()}
@@ -0,0 +1,150 @@
+"""
+DeepFake MIA - Diffusion des frames
+Un seul producteur publie, chaque client lit la frame la plus récente
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.metrics import DROPPED_FRAMES
+
+
+class FrameSubscriber:
+    """Client du flux : une seule place, la frame la plus récente écrase la précédente"""
+
+    def __init__(self, client_id: int):
+        self.client_id = client_id
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._packet = None
+        self._condition = threading.Condition()
+
+    def push(self, packet: Any) -> None:
+        """Dépose une frame sans jamais bloquer le producteur"""
+        with self._condition:
+            if self._packet is not None:
+                self.dropped += 1
+                DROPPED_FRAMES.labels("client").inc()
+            self._packet = packet
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Attend la prochaine frame, retourne None au timeout ou à la fermeture"""
+        with self._condition:
+            if self._packet is None and not self.closed:
+                self._condition.wait(timeout)
+            packet, self._packet = self._packet, None
+            if packet is not None:
+                self.sent += 1
+            return packet
+
+    def close(self) -> None:
+        with self._condition:
+            self.closed = True
+            self._packet = None
+            self._condition.notify_all()
+
+
+class AsyncFrameSubscriber:
+    """
+    Variante asyncio de FrameSubscriber (mode ASGI) : le producteur réveille
+    la boucle d'événements, aucun thread n'attend pour le client.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client_id: int = 0):
+        self.client_id = client_id
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._packet = None
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def push(self, packet: Any) -> None:
+        """Dépose une frame depuis un thread quelconque, sans bloquer"""
+        with self._lock:
+            if self._packet is not None:
+                self.dropped += 1
+                DROPPED_FRAMES.labels("client").inc()
+            self._packet = packet
+        self._wake()
+
+    async def get(self, timeout: Optional[float] = None) -> Any:
+        """Attend la prochaine frame, retourne None au timeout ou à la fermeture"""
+        if not self.closed:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._event.clear()
+        with self._lock:
+            packet, self._packet = self._packet, None
+        if packet is not None:
+            self.sent += 1
+        return packet
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._packet = None
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Boucle déjà fermée : le client est parti
+            pass
+
+
+class FrameBroadcaster:
+    """Hub de diffusion : N clients coûtent une inférence et N écritures socket"""
+
+    def __init__(self):
+        self._subscribers: List[FrameSubscriber] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.published = 0
+
+    def subscribe(self, subscriber: Optional[Any] = None) -> Any:
+        """Inscrit un client (FrameSubscriber par défaut, ou un AsyncFrameSubscriber)"""
+        with self._lock:
+            self._next_id += 1
+            if subscriber is None:
+                subscriber = FrameSubscriber(self._next_id)
+            else:
+                subscriber.client_id = self._next_id
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Any) -> None:
+        subscriber.close()
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, packet: Any) -> None:
+        """Diffuse une frame encodée à tous les clients connectés"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            subscriber.push(packet)
+
+    @property
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "published": self.published,
+                "clients": [
+                    {"id": s.client_id, "sent": s.sent, "dropped": s.dropped}
+                    for s in self._subscribers
+                ],
+            }
@@ -1,33 +1,299 @@
+import glob
 import os
-from typing import Any
-import insightface
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
 import cv2
 import numpy as np
 import core.globals
-from core.typing import Frame
+from core.typing import Face, Frame
+from core.face_tracker import FaceTracker
+from core.onnx_session import create_session
+from core.metrics import FACES_PER_FRAME, MODEL_LOAD_SECONDS, STAGE_SECONDS
 
-FACE_ANALYSER = None
+FACE_ANALYSERS: Dict[str, Any] = {}
+FACE_ANALYSER_MODEL = 'buffalo_l'
+FACE_TRACKER = None
+THREAD_LOCK = threading.Lock()
+# Modules du pack buffalo_l par fichier : ceux hors profil ne sont pas ouverts
+MODEL_TASKS = {
+    'det_10g': 'detection',
+    '2d106det': 'landmark_2d_106',
+    '1k3d68': 'landmark_3d_68',
+    'genderage': 'genderage',
+    'w600k_r50': 'recognition',
+}
+ANALYSER_TIMINGS: Dict[str, Dict[str, List[float]]] = {}
+TIMINGS_LOCK = threading.Lock()
 
 
-def get_face_analyser() -> Any:
-    global FACE_ANALYSER
+def get_face_analyser(profile: str = 'target') -> Any:
+    """Analyseur du profil demandé ('target' : frames live, 'source' : visages de la galerie)"""
+    with THREAD_LOCK:
+        if profile not in FACE_ANALYSERS:
+            start = time.perf_counter()
+            settings = core.globals.analyser_profiles[profile]
+            # INT8 réservé aux frames live : les visages source (galerie, cache
+            # disque) restent analysés par le détecteur de référence
+            analyser = create_analyser(settings['allowed_modules'], quantize=profile == 'target')
+            analyser.prepare(ctx_id=0, det_size=tuple(settings['det_size']))
+            _instrument_analyser(analyser, profile)
+            FACE_ANALYSERS[profile] = analyser
+            MODEL_LOAD_SECONDS.labels(f"analyser_{profile}").set(time.perf_counter() - start)
+    return FACE_ANALYSERS[profile]
 
-    if FACE_ANALYSER is None:
-        FACE_ANALYSER = insightface.app.FaceAnalysis(
-            name='buffalo_l', 
-            providers=core.globals.execution_providers
+
+def load_model(model_path: str, taskname: Optional[str] = None, quantize: bool = True) -> Any:
+    """
+    Modèle insightface sur une session de la fabrique (options de
+    config.py, graphe optimisé en cache) ; même routage que
+    model_zoo.get_model. Le fichier d'origine reste lu par le modèle pour
+    ses constantes (moyenne / écart-type d'entrée).
+    """
+    from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+    from insightface.model_zoo.attribute import Attribute
+    from insightface.model_zoo.landmark import Landmark
+    from insightface.model_zoo.retinaface import RetinaFace
+
+    session = create_session(model_path, taskname, quantize)
+    input_shape = session.get_inputs()[0].shape
+    if len(session.get_outputs()) >= 5:
+        model_class = RetinaFace
+    elif input_shape[2] == 192 and input_shape[3] == 192:
+        model_class = Landmark
+    elif input_shape[2] == 96 and input_shape[3] == 96:
+        model_class = Attribute
+    elif input_shape[2] == input_shape[3] and input_shape[2] >= 112 and input_shape[2] % 16 == 0:
+        model_class = ArcFaceONNX
+    else:
+        return None
+    return model_class(model_file=model_path, session=session)
+
+
+def create_analyser(allowed_modules: List[str], quantize: bool = True) -> Any:
+    """
+    FaceAnalysis limité aux modules demandés. Le constructeur d'insightface
+    ouvre une session par fichier du pack avec les options par défaut (les
+    sess_options ne sont pas transmises) puis jette celles hors profil :
+    les modèles sont chargés ici, et seuls ceux du profil.
+    """
+    from insightface.app import FaceAnalysis
+    from insightface.utils import ensure_available
+
+    model_dir = ensure_available('models', FACE_ANALYSER_MODEL, root='~/.insightface')
+    models: Dict[str, Any] = {}
+    for model_path in sorted(glob.glob(os.path.join(model_dir, '*.onnx'))):
+        taskname = MODEL_TASKS.get(os.path.splitext(os.path.basename(model_path))[0])
+        if taskname is not None and taskname not in allowed_modules:
+            continue
+        model = load_model(model_path, taskname, quantize)
+        if model is None or model.taskname not in allowed_modules or model.taskname in models:
+            continue
+        models[model.taskname] = model
+    if 'detection' not in models:
+        raise RuntimeError(f"Aucun modèle de détection dans {model_dir}")
+
+    analyser = FaceAnalysis.__new__(FaceAnalysis)
+    analyser.model_dir = model_dir
+    analyser.models = models
+    analyser.det_model = models['detection']
+    return analyser
+
+
+def set_detection_size(size: int, profile: str = 'target') -> bool:
+    """Change la taille d'entrée du détecteur sans recharger le modèle"""
+    with THREAD_LOCK:
+        settings = dict(core.globals.analyser_profiles[profile], det_size=(size, size))
+        core.globals.analyser_profiles = dict(core.globals.analyser_profiles, **{profile: settings})
+
+        analyser = FACE_ANALYSERS.get(profile)
+        if analyser is None or 'detection' not in analyser.models:
+            return False
+        det_model = analyser.models['detection']
+        # Seuls les détecteurs à entrée dynamique acceptent une autre taille
+        if not isinstance(det_model.session.get_inputs()[0].shape[2], str):
+            return False
+        det_model.input_size = (size, size)
+        return True
+
+
+def _instrument_analyser(analyser: Any, profile: str) -> None:
+    """Mesure le temps passé dans chaque module du profil"""
+    for taskname, model in analyser.models.items():
+        method = 'detect' if taskname == 'detection' else 'get'
+        setattr(model, method, _timed(profile, taskname, getattr(model, method)))
+
+
+def _timed(profile: str, taskname: str, func: Any) -> Any:
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with TIMINGS_LOCK:
+                timing = ANALYSER_TIMINGS.setdefault(profile, {}).setdefault(taskname, [0, 0.0])
+                timing[0] += 1
+                timing[1] += elapsed
+    return wrapper
+
+
+def get_analyser_timings() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Temps moyen et cumulé par profil et par module"""
+    with TIMINGS_LOCK:
+        return {
+            profile: {
+                taskname: {
+                    "calls": calls,
+                    "avg_ms": round(total / calls * 1000, 2) if calls else 0.0,
+                    "total_ms": round(total * 1000, 1),
+                }
+                for taskname, (calls, total) in modules.items()
+            }
+            for profile, modules in ANALYSER_TIMINGS.items()
+        }
+
+
+def supports_batch_detection(det_model: Any) -> bool:
+    """
+    Vrai si le détecteur est exporté avec une dimension de batch dynamique
+    (sorties [N, ancres, C]) ; det_10g sort des tenseurs [ancres, C] sans
+    batch.
+    """
+    session = det_model.session
+    return not isinstance(session.get_inputs()[0].shape[0], int) and len(session.get_outputs()[0].shape) == 3
+
+
+def letterbox(frame: Frame, input_size: tuple) -> tuple:
+    """Frame réduite en gardant ses proportions et complétée de noir, comme RetinaFace.detect"""
+    width, height = input_size
+    if frame.shape[0] / frame.shape[1] > height / width:
+        new_height = height
+        new_width = int(new_height * frame.shape[1] / frame.shape[0])
+    else:
+        new_width = width
+        new_height = int(new_width * frame.shape[0] / frame.shape[1])
+    det_image = np.zeros((height, width, 3), dtype=np.uint8)
+    det_image[:new_height, :new_width] = cv2.resize(frame, (new_width, new_height))
+    return det_image, new_height / frame.shape[0]
+
+
+def _anchor_centers(det_model: Any, height: int, width: int, stride: int) -> np.ndarray:
+    key = (height, width, stride)
+    anchor_centers = det_model.center_cache.get(key)
+    if anchor_centers is None:
+        anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+        anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+        if det_model._num_anchors > 1:
+            anchor_centers = np.stack([anchor_centers] * det_model._num_anchors, axis=1).reshape((-1, 2))
+        if len(det_model.center_cache) < 100:
+            det_model.center_cache[key] = anchor_centers
+    return anchor_centers
+
+
+def decode_detections(det_model: Any, outputs: List[np.ndarray], input_size: tuple, det_scale: float) -> tuple:
+    """
+    (bboxes, kpss) d'une image à partir de ses sorties du détecteur :
+    même décodage et même NMS que RetinaFace.forward / detect (max_num=0)
+    """
+    from insightface.model_zoo.retinaface import distance2bbox, distance2kps
+
+    width, height = input_size
+    fmc = det_model.fmc
+    scores_list, bboxes_list, kpss_list = [], [], []
+    for idx, stride in enumerate(det_model._feat_stride_fpn):
+        scores = outputs[idx]
+        anchor_centers = _anchor_centers(det_model, height // stride, width // stride, stride)
+        pos_inds = np.where(scores >= det_model.det_thresh)[0]
+        bboxes = distance2bbox(anchor_centers, outputs[idx + fmc] * stride)
+        scores_list.append(scores[pos_inds])
+        bboxes_list.append(bboxes[pos_inds])
+        if det_model.use_kps:
+            kpss = distance2kps(anchor_centers, outputs[idx + fmc * 2] * stride)
+            kpss_list.append(kpss.reshape((kpss.shape[0], -1, 2))[pos_inds])
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    bboxes = np.vstack(bboxes_list) / det_scale
+    pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)[order, :]
+    keep = det_model.nms(pre_det)
+    kpss = (np.vstack(kpss_list) / det_scale)[order, :, :][keep, :, :] if det_model.use_kps else None
+    return pre_det[keep, :], kpss
+
+
+def detect_frames(det_model: Any, frames: List[Frame], profile: str = 'target') -> List[tuple]:
+    """
+    Détection de plusieurs frames en un appel ONNX si le détecteur accepte
+    un batch, sinon frame par frame. Retourne (bboxes, kpss) par frame,
+    comme RetinaFace.detect.
+    """
+    if not supports_batch_detection(det_model):
+        return [det_model.detect(frame, max_num=0, metric='default') for frame in frames]
+
+    start = time.perf_counter()
+    input_size = det_model.input_size
+    letterboxed = [letterbox(frame, input_size) for frame in frames]
+    blob = cv2.dnn.blobFromImages(
+        [det_image for det_image, _ in letterboxed], 1.0 / det_model.input_std, input_size,
+        (det_model.input_mean,) * 3, swapRB=True
+    )
+    outputs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+    detections = [
+        decode_detections(det_model, [output[index] for output in outputs], input_size, det_scale)
+        for index, (_, det_scale) in enumerate(letterboxed)
+    ]
+    elapsed = time.perf_counter() - start
+    with TIMINGS_LOCK:
+        timing = ANALYSER_TIMINGS.setdefault(profile, {}).setdefault('detection', [0, 0.0])
+        timing[0] += len(frames)
+        timing[1] += elapsed
+    return detections
+
+
+def detect_batch(frames: List[Frame]) -> List[tuple]:
+    """Lot du micro-batcher de détection : frames de plusieurs sessions, profil 'target'"""
+    return detect_frames(get_face_analyser('target').det_model, frames)
+
+
+def analyse_faces(frame: Frame, profile: str = 'target') -> List[Face]:
+    """
+    FaceAnalysis.get ; pour le profil 'target', la détection passe par le
+    micro-batcher partagé par les sessions quand il est activé.
+    """
+    from core.batching import get_batcher
+
+    analyser = get_face_analyser(profile)
+    batcher = get_batcher('detection', detect_batch) if profile == 'target' else None
+    if batcher is not None:
+        bboxes, kpss = batcher.submit(frame)
+    elif supports_batch_detection(analyser.det_model):
+        # Sorties [N, ancres, C] : RetinaFace.detect ne sait pas les décoder
+        bboxes, kpss = detect_frames(analyser.det_model, [frame], profile)[0]
+    else:
+        return analyser.get(frame)
+
+    faces = []
+    for index in range(bboxes.shape[0]):
+        face = Face(
+            bbox=bboxes[index, 0:4],
+            kps=kpss[index] if kpss is not None else None,
+            det_score=bboxes[index, 4],
         )
-        FACE_ANALYSER.prepare(ctx_id=0, det_size=(640, 640))
-    return FACE_ANALYSER
+        for taskname, model in analyser.models.items():
+            if taskname != 'detection':
+                model.get(frame, face)
+        faces.append(face)
+    return faces
 
 
-def get_one_face(frame: Frame) -> Any:
+def get_one_face(frame: Frame, profile: str = 'target') -> Any:
     """Détecte et retourne un seul visage dans la frame"""
     if frame is None:
         return None
     try:
-        faces = get_face_analyser().get(frame)
+        with STAGE_SECONDS.labels("detection").time():
+            faces = analyse_faces(frame, profile)
         if faces:
             return min(faces, key=lambda x: x.bbox[0])
     except (ValueError, Exception):
@@ -35,16 +301,80 @@ def get_one_face(frame: Frame) -> Any:
     return None
 
 
-def get_many_faces(frame: Frame) -> Any:
+def get_many_faces(frame: Frame, profile: str = 'target') -> Any:
     """Détecte et retourne tous les visages dans la frame"""
     if frame is None:
         return None
     try:
-        return get_face_analyser().get(frame)
+        with STAGE_SECONDS.labels("detection").time():
+            return analyse_faces(frame, profile)
     except (IndexError, Exception):
         return None
 
 
+def create_face_tracker() -> FaceTracker:
+    """Nouveau tracker avec les réglages courants (un par flux suivi)"""
+    return FaceTracker(
+        detect_interval=core.globals.detect_interval,
+        max_drift=core.globals.tracker_max_drift
+    )
+
+
+def get_face_tracker() -> FaceTracker:
+    global FACE_TRACKER
+
+    if FACE_TRACKER is None:
+        FACE_TRACKER = create_face_tracker()
+    return FACE_TRACKER
+
+
+def reset_face_tracker() -> None:
+    """Force une détection complète sur la prochaine frame"""
+    if FACE_TRACKER is not None:
+        FACE_TRACKER.reset()
+
+
+def get_tracked_faces(frame: Frame, tracker: Optional[FaceTracker] = None) -> List[Face]:
+    """Visages de la frame : détection sur les frames clés, suivi entre deux"""
+    if frame is None:
+        return []
+    tracker = tracker or get_face_tracker()
+    try:
+        with STAGE_SECONDS.labels("tracking").time():
+            return tracker.update(frame, get_many_faces)
+    except Exception:
+        tracker.reset()
+        return get_many_faces(frame) or []
+
+
+def get_target_faces(
+    frame: Frame,
+    many_faces: Optional[bool] = None,
+    face_tracking: Optional[bool] = None,
+    tracker: Optional[FaceTracker] = None,
+) -> List[Face]:
+    """
+    Visages à traiter selon les options (suivi, tous les visages ou le plus
+    à gauche). Options à None : valeurs de core.globals ; `tracker` : celui
+    du flux (défaut : le tracker global).
+    """
+    if many_faces is None:
+        many_faces = core.globals.many_faces
+    if face_tracking is None:
+        face_tracking = core.globals.face_tracking
+    if face_tracking:
+        target_faces = get_tracked_faces(frame, tracker)
+        if target_faces and not many_faces:
+            target_faces = [min(target_faces, key=lambda x: x.bbox[0])]
+    elif many_faces:
+        target_faces = [f for f in get_many_faces(frame) or [] if f]
+    else:
+        target_face = get_one_face(frame)
+        target_faces = [target_face] if target_face else []
+    FACES_PER_FRAME.observe(len(target_faces))
+    return target_faces
+
+
 def extract_face_from_image(image_path: str) -> Any:
     """Extrait le visage d'une image source"""
     if not os.path.exists(image_path):
@@ -54,6 +384,6 @@ def extract_face_from_image(image_path: str) -> Any:
         frame = cv2.imread(image_path)
         if frame is None:
             return None
-        return get_one_face(frame)
+        return get_one_face(frame, profile='source')
     except Exception:
         return None
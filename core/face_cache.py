@@ -0,0 +1,135 @@
+"""
+DeepFake MIA - Cache des visages sources
+Analyse des images de la galerie une seule fois, persistée sur disque
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.typing import Face
+
+CACHE_VERSION = 1
+FACE_FIELDS = [
+    'bbox', 'kps', 'det_score', 'landmark_2d_106', 'landmark_3d_68',
+    'pose', 'embedding', 'gender', 'age',
+]
+
+
+class FaceGalleryCache:
+    """
+    Cache des visages sources, indexé par hash du contenu de l'image et nom
+    du modèle d'analyse. Une image modifiée change de clé : l'ancienne
+    entrée est simplement ignorée et le visage est ré-analysé.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._memory: Dict[str, Tuple[Tuple[float, int], Face]] = {}
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, image_path: str) -> Optional[Face]:
+        """Visage de l'image : mémoire, puis disque, puis analyse complète"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime, stat.st_size)
+
+        entry = self._memory.get(image_path)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+
+        with self._lock:
+            entry = self._memory.get(image_path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+            with open(image_path, 'rb') as f:
+                content = f.read()
+            cache_path = self._cache_path(content)
+
+            face = self._load(cache_path)
+            if face is None:
+                self.misses += 1
+                face = self._analyse(content)
+                if face is None:
+                    return None
+                self._save(cache_path, face)
+            else:
+                self.hits += 1
+
+            self._memory[image_path] = (signature, face)
+            return face
+
+    def warm(self, image_paths: List[str]) -> threading.Thread:
+        """Analyse la galerie en arrière-plan"""
+        def run():
+            for image_path in image_paths:
+                try:
+                    if self.get(image_path) is None:
+                        logging.warning(f"Aucun visage détecté dans: {image_path}")
+                except Exception as e:
+                    logging.warning(f"Erreur cache visage {image_path}: {e}")
+            logging.info(f"Cache visages prêt ({len(self._memory)}/{len(image_paths)})")
+
+        self._warm_thread = threading.Thread(target=run, name="face-cache-warmup", daemon=True)
+        self._warm_thread.start()
+        return self._warm_thread
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "warming": self._warm_thread is not None and self._warm_thread.is_alive(),
+        }
+
+    def _cache_path(self, content: bytes) -> str:
+        digest = hashlib.sha1(content).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}_{self.model_name}_v{CACHE_VERSION}.npz")
+
+    def _analyse(self, content: bytes) -> Optional[Face]:
+        from core.face_analyser import get_one_face
+
+        frame = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        return get_one_face(frame, profile='source')
+
+    def _load(self, cache_path: str) -> Optional[Face]:
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                return Face(d={name: _unpack(data[name]) for name in data.files})
+        except Exception as e:
+            logging.warning(f"Entrée de cache illisible, ré-analyse: {cache_path} ({e})")
+            return None
+
+    def _save(self, cache_path: str, face: Face) -> None:
+        fields = {name: np.asarray(face[name]) for name in FACE_FIELDS if face.get(name) is not None}
+        temp_path = cache_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(f, **fields)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Impossible d'écrire le cache visage: {e}")
+
+
+def _unpack(value: np.ndarray) -> Any:
+    # Les scalaires (det_score, gender, age) sont stockés en tableaux 0-d
+    return value.item() if value.ndim == 0 else value
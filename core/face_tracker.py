@@ -0,0 +1,143 @@
+"""
+DeepFake MIA - Suivi de visage
+Détection complète sur les frames clés, flux optique entre deux
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from core.typing import Face, Frame
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+class FaceTracker:
+    """
+    Suit les visages détectés (kps + 106 landmarks) par flux optique de
+    Lucas-Kanade. Une nouvelle détection est forcée toutes les
+    `detect_interval` frames, ou dès que le suivi décroche : trop de points
+    perdus, ou erreur aller-retour supérieure à `max_drift` pixels.
+    """
+
+    def __init__(self, detect_interval: int = 5, max_drift: float = 2.0, min_tracked_ratio: float = 0.6):
+        self.detect_interval = max(1, detect_interval)
+        self.max_drift = max_drift
+        self.min_tracked_ratio = min_tracked_ratio
+        self.keyframes = 0
+        self.tracked_frames = 0
+        self.lost = 0
+        self._faces: List[Face] = []
+        self._prev_gray: Optional[np.ndarray] = None
+        self._frames_since_detect = 0
+
+    def reset(self) -> None:
+        """Oublie les visages suivis : la prochaine frame sera une frame clé"""
+        self._faces = []
+        self._prev_gray = None
+        self._frames_since_detect = 0
+
+    def update(self, frame: Frame, detect: Callable[[Frame], Any]) -> List[Face]:
+        """Retourne les visages de la frame, détectés ou suivis"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = None
+
+        if not self._needs_detection(gray):
+            faces = self._track(gray)
+            if faces is None:
+                self.lost += 1
+
+        if faces is None:
+            faces = list(detect(frame) or [])
+            self._frames_since_detect = 0
+            self.keyframes += 1
+        else:
+            self._frames_since_detect += 1
+            self.tracked_frames += 1
+
+        self._faces = faces
+        self._prev_gray = gray
+        return faces
+
+    def _needs_detection(self, gray: np.ndarray) -> bool:
+        return (
+            not self._faces
+            or self._prev_gray is None
+            or self._prev_gray.shape != gray.shape
+            or self._frames_since_detect >= self.detect_interval - 1
+        )
+
+    def _track(self, gray: np.ndarray) -> Optional[List[Face]]:
+        points = [_face_points(face) for face in self._faces]
+        if any(p is None for p in points):
+            return None
+
+        prev_pts = np.concatenate(points).reshape(-1, 1, 2).astype(np.float32)
+        next_pts, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, prev_pts, None, **LK_PARAMS)
+        if next_pts is None:
+            return None
+        back_pts, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, next_pts, None, **LK_PARAMS)
+
+        # Erreur aller-retour : détecte la dérive du suivi
+        fb_error = np.linalg.norm(prev_pts - back_pts, axis=2).reshape(-1)
+        valid = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (fb_error < self.max_drift)
+
+        tracked = []
+        offset = 0
+        for face, face_points in zip(self._faces, points):
+            count = len(face_points)
+            face_valid = valid[offset:offset + count]
+            face_prev = prev_pts[offset:offset + count]
+            face_next = next_pts[offset:offset + count].reshape(-1, 2)
+            offset += count
+
+            if face_valid.mean() < self.min_tracked_ratio:
+                return None
+            matrix, _ = cv2.estimateAffinePartial2D(
+                face_prev[face_valid], face_next[face_valid].reshape(-1, 1, 2),
+                method=cv2.RANSAC, ransacReprojThreshold=self.max_drift
+            )
+            if matrix is None:
+                return None
+
+            # Les points perdus suivent le mouvement global du visage
+            if not face_valid.all():
+                face_next[~face_valid] = cv2.transform(face_prev[~face_valid], matrix).reshape(-1, 2)
+            tracked.append(_moved_face(face, face_next, matrix))
+        return tracked
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "detect_interval": self.detect_interval,
+            "keyframes": self.keyframes,
+            "tracked_frames": self.tracked_frames,
+            "lost": self.lost,
+        }
+
+
+def _face_points(face: Face) -> Optional[np.ndarray]:
+    """kps (5 points) suivis des 106 landmarks s'ils sont disponibles"""
+    if face.kps is None:
+        return None
+    if face.landmark_2d_106 is None:
+        return np.asarray(face.kps, dtype=np.float32)
+    return np.vstack([face.kps, face.landmark_2d_106]).astype(np.float32)
+
+
+def _moved_face(face: Face, points: np.ndarray, matrix: np.ndarray) -> Face:
+    """Copie du visage avec landmarks suivis et bbox transformée"""
+    moved = Face(d=dict(face))
+    moved.kps = points[:5].copy()
+    if face.landmark_2d_106 is not None:
+        moved.landmark_2d_106 = points[5:].copy()
+
+    x1, y1, x2, y2 = face.bbox[:4]
+    corners = np.array([[[x1, y1]], [[x2, y1]], [[x1, y2]], [[x2, y2]]], dtype=np.float32)
+    corners = cv2.transform(corners, matrix).reshape(-1, 2)
+    moved.bbox = np.concatenate([corners.min(axis=0), corners.max(axis=0)]).astype(np.float32)
+    return moved
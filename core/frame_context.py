@@ -0,0 +1,91 @@
+"""
+DeepFake MIA - Contexte de frame
+État partagé par la chaîne de processeurs pour une frame : visages
+détectés une seule fois, temps par processeur et buffers de travail
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from core.typing import Face, Frame
+
+SCRATCH_BUFFERS = threading.local()
+
+
+class FrameContext:
+    """
+    Une frame et tout ce qui a été calculé dessus.
+
+    Les processeurs lisent `faces` (détection paresseuse, une fois par
+    frame), puis déposent leur résultat avec `set_frame`. `options` porte
+    les options de la session qui a produit la frame (vide : valeurs de
+    core.globals). Un processeur qui
+    modifie la géométrie (redimensionnement, recadrage, miroir) le signale
+    avec `geometry_changed=True` : les visages sont alors invalidés et la
+    prochaine lecture de `faces` relance la détection.
+    """
+
+    def __init__(
+        self,
+        frame: Frame,
+        source_face: Any = None,
+        detect: Optional[Callable[[Frame], List[Face]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        self.frame = frame
+        self.source_face = source_face
+        self.options = options if options is not None else {}
+        self.timings: Dict[str, float] = {}
+        self.detections = 0
+        self._detect = detect
+        self._faces: Optional[List[Face]] = None
+
+    @property
+    def faces(self) -> List[Face]:
+        """Visages cibles de la frame, détectés au premier accès"""
+        if self._faces is None:
+            detect = self._detect
+            if detect is None:
+                from core.face_analyser import get_target_faces
+                detect = get_target_faces
+            with self.time('detection'):
+                self._faces = list(detect(self.frame) or [])
+            self.detections += 1
+        return self._faces
+
+    def set_faces(self, faces: List[Face]) -> None:
+        """Visages déjà connus (ex. suivis par un autre composant)"""
+        self._faces = list(faces)
+
+    def set_frame(self, frame: Frame, geometry_changed: bool = False) -> None:
+        """Remplace la frame courante après un processeur"""
+        self.frame = frame
+        if geometry_changed:
+            self._faces = None
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def get_scratch(name: str, shape: tuple, dtype: Any = np.uint8) -> np.ndarray:
+    """
+    Buffer de travail contigu réutilisé d'une frame à l'autre (un jeu par
+    thread). Le contenu n'est pas initialisé et reste valide jusqu'au
+    prochain appel avec le même nom dans le même thread.
+    """
+    buffers = SCRATCH_BUFFERS.__dict__.setdefault("buffers", {})
+    size = int(np.prod(shape))
+    buffer = buffers.get((name, np.dtype(dtype)))
+    if buffer is None or buffer.size < size:
+        buffer = np.empty(size, dtype=dtype)
+        buffers[(name, np.dtype(dtype))] = buffer
+    return buffer[:size].reshape(shape)
@@ -0,0 +1,89 @@
+"""
+DeepFake MIA - Anneau de frames en mémoire partagée
+Emplacements de taille fixe partagés entre le processus web et les
+workers d'inférence : seuls l'indice d'emplacement et les métadonnées
+passent par le canal de contrôle
+"""
+
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class FrameRing:
+    """
+    `slots` emplacements, chacun avec une zone d'entrée (frame BGR uint8 de
+    `slot_bytes` octets au plus) et une zone de sortie de même taille
+    (partie multipart JPEG écrite par le worker).
+
+    Le processus web crée l'anneau et attribue les emplacements
+    (`acquire` / `release`) ; un emplacement appartient au worker entre
+    l'envoi de la requête et sa réponse. Les workers s'y attachent par son
+    nom (`FrameRing.attach`).
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        self.slots = max(1, slots)
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes * 2)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self.name = self._memory.name
+        self._free = deque(range(self.slots))
+        self._condition = threading.Condition()
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_bytes: int) -> "FrameRing":
+        return cls(slots, slot_bytes, name=name)
+
+    def fits(self, shape: Tuple[int, ...]) -> bool:
+        return int(np.prod(shape)) <= self.slot_bytes
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Emplacement libre, ou None au timeout"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._free, timeout):
+                return None
+            return self._free.popleft()
+
+    def release(self, slot: int) -> None:
+        with self._condition:
+            self._free.append(slot)
+            self._condition.notify()
+
+    def frame(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """Vue sur la zone d'entrée de l'emplacement"""
+        offset = slot * self.slot_bytes * 2
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._memory.buf, offset=offset)
+
+    def output(self, slot: int) -> memoryview:
+        """Vue sur la zone de sortie de l'emplacement"""
+        offset = (slot * 2 + 1) * self.slot_bytes
+        return self._memory.buf[offset:offset + self.slot_bytes]
+
+    def in_use(self) -> int:
+        with self._condition:
+            return self.slots - len(self._free)
+
+    def close(self) -> None:
+        """Détache l'anneau ; le créateur le supprime aussi"""
+        try:
+            self._memory.close()
+        except BufferError:
+            # Une vue numpy est encore vivante : la mémoire sera libérée avec elle
+            pass
+        if self.owner:
+            self._memory.unlink()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "in_use": self.in_use(),
+            "slot_kib": self.slot_bytes // 1024,
+        }
@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 WORKFLOW_DIR = os.path.join(ROOT_DIR, "workflow")
@@ -30,6 +30,15 @@ live_resizable = True
 max_memory = 8
 execution_providers: List[str] = ['CUDAExecutionProvider', 'CPUExecutionProvider']
 execution_threads = 8
+execution_backend = "thread"  # "thread" ou "process" pour le traitement vidéo hors ligne
+execution_processes = 2
+video_streaming = False  # Vidéo hors ligne par pipes ffmpeg, sans frames PNG temporaires
+intra_op_threads = 0  # Plafond de threads intra-op par session (workers vidéo, 0 = aucun)
+# Réglages des sessions ONNX Runtime (voir ONNX_SESSION_CONFIG dans config.py)
+session_config: Dict[str, Any] = {}
+onnx_cache_dir: Optional[str] = None  # Graphes optimisés (None = pas de cache)
+quantization_config: Dict[str, Any] = {}  # Mode CPU INT8 (voir QUANTIZATION_CONFIG)
+batching_config: Dict[str, Any] = {}  # Micro-batching entre sessions (voir BATCHING_CONFIG)
 headless = None
 log_level = "error"
 fp_ui: Dict[str, bool] = {"face_enhancer": False}
@@ -41,6 +50,14 @@ show_mouth_mask_box = False
 mask_feather_ratio = 8
 mask_down_size = 0.50
 mask_size = 1
+# Profils d'analyse : modules insightface chargés et taille de détection
+analyser_profiles: Dict[str, Dict[str, Any]] = {
+    "target": {"allowed_modules": ["detection", "landmark_2d_106"], "det_size": (640, 640)},
+    "source": {"allowed_modules": ["detection", "landmark_2d_106", "recognition"], "det_size": (640, 640)},
+}
+face_tracking = False  # Détection sur frames clés + suivi par flux optique
+detect_interval = 5
+tracker_max_drift = 2.0
 
 # Face source pour le swap en temps réel
 source_face = None
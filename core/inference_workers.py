@@ -0,0 +1,461 @@
+"""
+DeepFake MIA - Workers d'inférence
+Processus séparés qui font tout le travail d'une frame live (miroir,
+détection, swap, masques, enhancer, encodage JPEG) hors du GIL du
+processus web. Les frames passent par un FrameRing en mémoire partagée ;
+le canal de contrôle (un Pipe par worker) ne transporte que des indices
+d'emplacement et des métadonnées.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.frame_ring import FrameRing
+from core.metrics import WORKER_RESTARTS
+
+
+class _Pending:
+    __slots__ = ("worker", "done", "length", "error")
+
+    def __init__(self, worker: int):
+        self.worker = worker
+        self.done = threading.Event()
+        self.length = 0
+        self.error: Optional[str] = None
+
+
+class WorkerHandle:
+    """Côté web : processus d'un worker, son canal et ses compteurs"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Any = None
+        self.conn: Any = None
+        self.ready = False
+        self.restarts = 0
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started_at = 0.0
+        self.down_since: Optional[float] = None
+        self.exitcode: Optional[int] = None
+        # Version du visage source déjà envoyée, par session
+        self.sources: Dict[str, int] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        process = self.process
+        return {
+            "pid": process.pid if process is not None else None,
+            "alive": process is not None and process.is_alive(),
+            "ready": self.ready,
+            "uptime_s": round(time.monotonic() - self.started_at, 1) if self.down_since is None else 0.0,
+            "restarts": self.restarts,
+            "last_exitcode": self.exitcode,
+            "processed": self.processed,
+            "errors": self.errors,
+            "avg_ms": round(self.busy / self.processed * 1000, 2) if self.processed else 0.0,
+        }
+
+
+class InferenceWorkerPool:
+    """
+    `workers` processus d'inférence supervisés. Une session est servie par
+    toujours le même worker (son tracker y vit). Un worker qui meurt est
+    relancé après `restart_delay` secondes ; un worker qui ne répond pas
+    dans `request_timeout` secondes est tué puis relancé. Les frames en
+    cours sur un worker perdu sont jetées (le pipeline passe à la suivante).
+
+    `settings` est transmis tel quel aux workers (voir configure_worker).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        ring_slots: int,
+        max_frame_size: tuple,
+        settings: Dict[str, Any],
+        request_timeout: float = 5.0,
+        restart_delay: float = 1.0,
+    ):
+        width, height = max_frame_size
+        self.ring = FrameRing(ring_slots, width * height * 3)
+        self.settings = settings
+        self.request_timeout = request_timeout
+        self.restart_delay = restart_delay
+        self._context = multiprocessing.get_context('spawn')
+        self._handles = [WorkerHandle(index) for index in range(max(1, workers))]
+        self._assignments: Dict[str, int] = {}
+        self._sources: Dict[str, tuple] = {}
+        self._pending: Dict[int, _Pending] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def start(self) -> None:
+        with self._lock:
+            for handle in self._handles:
+                self._spawn(handle)
+        for name, target in (("responses", self._read_responses), ("supervisor", self._supervise)):
+            thread = threading.Thread(target=target, name=f"inference-workers-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Attend que chaque worker ait chargé et préchauffé ses modèles"""
+        with self._ready:
+            return self._ready.wait_for(lambda: all(h.ready for h in self._handles), timeout)
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """Vrai si la frame tient dans un emplacement de l'anneau"""
+        return frame.dtype == np.uint8 and self.ring.fits(frame.shape)
+
+    def process(
+        self, session_id: str, frame: np.ndarray, meta: Dict[str, Any], source_face: Any = None
+    ) -> Optional[bytes]:
+        """
+        Traite la frame sur le worker de la session et retourne la partie
+        multipart JPEG, ou None (worker en démarrage, perdu ou en erreur).
+        """
+        handle = self._handles[self._assign(session_id)]
+        if not handle.ready:
+            return None
+        slot = self.ring.acquire(self.request_timeout)
+        if slot is None:
+            return None
+        request_id = None
+        try:
+            np.copyto(self.ring.frame(slot, frame.shape), frame)
+            with self._lock:
+                if not handle.ready or handle.conn is None:
+                    return None
+                self._sequence += 1
+                request_id = self._sequence
+                pending = self._pending[request_id] = _Pending(handle.index)
+                try:
+                    self._send_source(handle, session_id, source_face)
+                    handle.conn.send(('frame', request_id, slot, frame.shape, session_id, meta))
+                except (OSError, ValueError) as e:
+                    # Worker mort entre-temps : le superviseur le relance
+                    logging.warning(f"Worker d'inférence {handle.index} injoignable: {e}")
+                    return None
+            if not pending.done.wait(self.request_timeout):
+                logging.error(f"Worker d'inférence {handle.index} sans réponse, redémarrage")
+                self._kill(handle)
+                return None
+            if pending.error is not None:
+                logging.error(f"Erreur worker d'inférence {handle.index}: {pending.error}")
+                return None
+            return bytes(self.ring.output(slot)[:pending.length])
+        finally:
+            if request_id is not None:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+            self.ring.release(slot)
+
+    def close(self) -> None:
+        """Arrête les workers et supprime l'anneau"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            handles = list(self._handles)
+            for handle in handles:
+                try:
+                    handle.conn.send(None)
+                except (OSError, ValueError, AttributeError):
+                    pass
+        for handle in handles:
+            if handle.process is not None:
+                handle.process.join(timeout=2)
+                if handle.process.is_alive():
+                    handle.process.terminate()
+                    handle.process.join(timeout=1)
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self.ring.close()
+
+    def _assign(self, session_id: str) -> int:
+        """Worker de la session : le moins chargé en sessions à la première frame"""
+        with self._lock:
+            index = self._assignments.get(session_id)
+            if index is None:
+                counts = [0] * len(self._handles)
+                for assigned in self._assignments.values():
+                    counts[assigned] += 1
+                index = self._assignments[session_id] = counts.index(min(counts))
+            return index
+
+    def _send_source(self, handle: WorkerHandle, session_id: str, source_face: Any) -> None:
+        # Appelé sous self._lock. Le visage source ne passe qu'à son changement
+        # (dict simple : les Face d'insightface ne se sérialisent pas)
+        current, version = self._sources.get(session_id, (None, 0))
+        if current is not source_face:
+            version += 1
+            self._sources[session_id] = (source_face, version)
+        if handle.sources.get(session_id) != version:
+            face = dict(source_face) if source_face is not None else None
+            handle.conn.send(('source', session_id, face))
+            handle.sources[session_id] = version
+
+    def _spawn(self, handle: WorkerHandle) -> None:
+        # Appelé sous self._lock
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main,
+            args=(handle.index, self.ring.name, self.ring.slots, self.ring.slot_bytes, self.settings, child_conn),
+            name=f"inference-worker-{handle.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        handle.process = process
+        handle.conn = parent_conn
+        handle.ready = False
+        handle.sources = {}
+        handle.started_at = time.monotonic()
+        handle.down_since = None
+        logging.info(f"Worker d'inférence {handle.index} démarré (pid {process.pid})")
+
+    def _kill(self, handle: WorkerHandle) -> None:
+        """Tue un worker bloqué ; le superviseur le relance"""
+        process = handle.process
+        with self._lock:
+            handle.ready = False
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+                process.join(timeout=1)
+
+    def _fail_pending(self, handle: WorkerHandle, error: str) -> None:
+        # Appelé sous self._lock
+        for pending in self._pending.values():
+            if pending.worker == handle.index and not pending.done.is_set():
+                pending.error = error
+                pending.done.set()
+
+    def _supervise(self) -> None:
+        while not self._closed:
+            time.sleep(0.2)
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                for handle in self._handles:
+                    process = handle.process
+                    if process is None or process.is_alive():
+                        continue
+                    if handle.down_since is None:
+                        handle.down_since = now
+                        handle.exitcode = process.exitcode
+                        handle.ready = False
+                        self._fail_pending(handle, f"worker arrêté (code {process.exitcode})")
+                        logging.error(
+                            f"Worker d'inférence {handle.index} arrêté (code {process.exitcode}), "
+                            f"redémarrage dans {self.restart_delay:.1f} s"
+                        )
+                    if now - handle.down_since >= self.restart_delay:
+                        handle.restarts += 1
+                        WORKER_RESTARTS.labels(str(handle.index)).inc()
+                        self._spawn(handle)
+
+    def _read_responses(self) -> None:
+        while not self._closed:
+            with self._lock:
+                connections = {handle.conn: handle for handle in self._handles if handle.conn is not None}
+            try:
+                readable = wait_connections(list(connections), timeout=0.5)
+            except OSError:
+                continue
+            for conn in readable:
+                handle = connections[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # Worker mort : ses requêtes échouent tout de suite, le
+                    # superviseur le relance avec un nouveau canal
+                    with self._lock:
+                        if handle.conn is conn:
+                            handle.conn = None
+                            handle.ready = False
+                            self._fail_pending(handle, "canal du worker fermé")
+                    conn.close()
+                    continue
+                self._on_message(handle, message)
+
+    def _on_message(self, handle: WorkerHandle, message: tuple) -> None:
+        kind = message[0]
+        with self._lock:
+            if kind == 'ready':
+                handle.ready = True
+                self._ready.notify_all()
+                logging.info(f"Worker d'inférence {handle.index} prêt ({message[1]:.1f} s)")
+            elif kind == 'done':
+                _, request_id, length, elapsed, error = message
+                if error is None:
+                    handle.processed += 1
+                    handle.busy += elapsed
+                else:
+                    handle.errors += 1
+                pending = self._pending.get(request_id)
+                if pending is not None:
+                    pending.length = length
+                    pending.error = error
+                    pending.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = {str(handle.index): handle.snapshot() for handle in self._handles}
+            assignments = dict(self._assignments)
+            pending = len(self._pending)
+        return {"workers": workers, "sessions": assignments, "pending": pending, "ring": self.ring.get_stats()}
+
+
+# ============================================================
+# Côté worker
+# ============================================================
+
+def configure_worker(settings: Dict[str, Any]) -> None:
+    """Réglages du processus web repris par le worker (voir app.get_worker_pool)"""
+    import core.globals
+
+    core.globals.execution_providers = settings["execution_providers"]
+    core.globals.intra_op_threads = settings["intra_op_threads"]
+    core.globals.session_config = settings["session_config"]
+    core.globals.onnx_cache_dir = settings["onnx_cache_dir"]
+    core.globals.quantization_config = settings["quantization_config"]
+    core.globals.analyser_profiles = settings["analyser_profiles"]
+    core.globals.detect_interval = settings["detect_interval"]
+
+
+def warm_worker(settings: Dict[str, Any]) -> None:
+    """Chargement et inférence à vide des modèles du flux live"""
+    from core.warmup import warm_analyser, warm_face_enhancer, warm_face_swapper
+
+    steps = [
+        ("analyser_target", lambda: warm_analyser('target', settings["frame_size"], settings["det_sizes"])),
+        ("face_swapper", warm_face_swapper),
+    ]
+    if settings["warm_enhancer"]:
+        steps.append(("face_enhancer", warm_face_enhancer))
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            logging.error(f"Préchauffage {name} impossible: {e}")
+
+
+def render_frame(session: Any, frame: np.ndarray, meta: Dict[str, Any], encoder: Any) -> Optional[bytes]:
+    """
+    Travail d'une frame live, comme process_live_frame puis encode_frame
+    dans app.py : réduction, miroir, chaîne de processeurs, FPS, JPEG
+    """
+    import cv2
+    from core.processors.frame.core import run_frame_processors
+    import core.processors.frame.face_enhancer as face_enhancer
+    import core.processors.frame.face_swapper as face_swapper
+
+    scale = meta.get("scale", 1.0)
+    if scale < 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    frame = cv2.flip(frame, 1)
+
+    if session.source_face is not None:
+        try:
+            frame_processors = [face_swapper]
+            if meta.get("enhance", True) and session.options.get("face_enhancer", False) and face_enhancer.is_available():
+                frame_processors.append(face_enhancer)
+            frame = run_frame_processors(
+                session.source_face, frame, frame_processors, detect=session.detect, options=session.options
+            ).frame
+        except Exception as e:
+            logging.error(f"Erreur lors du traitement: {e}")
+
+    if meta.get("fps") is not None:
+        cv2.putText(frame, f"FPS: {meta['fps']}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return encoder.encode_chunk(frame, meta.get("jpeg_quality", 80))
+
+
+def apply_quality(sessions: Dict[str, Any], meta: Dict[str, Any], applied: Dict[str, Any]) -> None:
+    """Taille de détection et intervalle du niveau de qualité courant, s'ils ont changé"""
+    import core.globals
+    from core.face_analyser import set_detection_size
+
+    det_size = meta.get("det_size")
+    if det_size is not None and applied.get("det_size") != det_size:
+        set_detection_size(det_size)
+        applied["det_size"] = det_size
+    interval = meta.get("detect_interval")
+    if interval is not None and applied.get("detect_interval") != interval:
+        core.globals.detect_interval = interval
+        for session in sessions.values():
+            session.set_detect_interval(interval)
+        applied["detect_interval"] = interval
+
+
+def worker_main(index: int, ring_name: str, ring_slots: int, slot_bytes: int, settings: Dict[str, Any], conn: Any) -> None:
+    """Boucle d'un worker : requêtes du processus web jusqu'au message None"""
+    from core.jpeg_encoder import JpegEncoder
+    from core.sessions import ClientSession
+    from core.typing import Face
+
+    logging.basicConfig(level=settings.get("log_level", logging.INFO))
+    start = time.perf_counter()
+    configure_worker(settings)
+    ring = FrameRing.attach(ring_name, ring_slots, slot_bytes)
+    encoder = JpegEncoder(settings["jpeg_backend"])
+    warm_worker(settings)
+    conn.send(('ready', time.perf_counter() - start))
+
+    # État des sessions servies : visage source, options et tracker du flux
+    sessions: Dict[str, ClientSession] = {}
+    applied: Dict[str, Any] = {}
+
+    def get_session(session_id: str) -> ClientSession:
+        if session_id not in sessions:
+            sessions[session_id] = ClientSession(session_id, None, {})
+        return sessions[session_id]
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            if message[0] == 'source':
+                _, session_id, face = message
+                session = get_session(session_id)
+                session.source_face = Face(d=face) if face is not None else None
+                session.reset_tracker()
+                continue
+
+            _, request_id, slot, shape, session_id, meta = message
+            session = get_session(session_id)
+            request_start = time.perf_counter()
+            try:
+                session.options = meta["options"]
+                apply_quality(sessions, meta, applied)
+                chunk = render_frame(session, ring.frame(slot, shape), meta, encoder)
+                if chunk is None:
+                    raise ValueError("encodage JPEG impossible")
+                if len(chunk) > ring.slot_bytes:
+                    raise ValueError(f"frame encodée trop grande ({len(chunk)} octets)")
+                ring.output(slot)[:len(chunk)] = chunk
+                conn.send(('done', request_id, len(chunk), time.perf_counter() - request_start, None))
+            except Exception as e:
+                conn.send(('done', request_id, 0, time.perf_counter() - request_start, str(e)))
+    finally:
+        ring.close()
+        logging.info(f"Worker d'inférence {index} arrêté (pid {os.getpid()})")
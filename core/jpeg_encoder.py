@@ -0,0 +1,97 @@
+"""
+DeepFake MIA - Encodage JPEG
+Frame BGR -> partie multipart prête à envoyer, encodée une seule fois
+pour tous les clients
+"""
+
+import logging
+import struct
+import threading
+from typing import Any, Dict, Optional
+
+import cv2
+
+# libjpeg-turbo via PyTurboJPEG (optionnel), sinon OpenCV
+TURBOJPEG_AVAILABLE = False
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    pass
+
+MULTIPART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MULTIPART_TRAILER = b'\r\n'
+# Message WebSocket : séquence (uint32), horodatage de capture (float64, s), puis le JPEG
+WS_HEADER = struct.Struct('<Id')
+
+
+class JpegEncoder:
+    """
+    Encodeur partagé par les threads d'encodage du pipeline.
+
+    `encode_chunk` produit directement la partie multipart (en-tête + JPEG
+    + fin de ligne) en une seule copie : le tampon de l'encodeur est joint
+    tel quel, sans passer par `tobytes()` ni par une concaténation par
+    client. Le résultat est immuable, donc partageable entre clients
+    pendant leurs envois.
+    """
+
+    def __init__(self, backend: str = "auto"):
+        self.backend = self._resolve_backend(backend)
+        self._turbo = TurboJPEG() if self.backend == "turbojpeg" else None
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.bytes_out = 0
+
+    @staticmethod
+    def _resolve_backend(backend: str) -> str:
+        if backend not in ("auto", "turbojpeg", "opencv"):
+            raise ValueError(f"Backend JPEG inconnu: {backend}")
+        if backend == "opencv":
+            return "opencv"
+        if TURBOJPEG_AVAILABLE:
+            try:
+                TurboJPEG()
+                return "turbojpeg"
+            except (OSError, RuntimeError) as e:
+                # Module Python présent mais libturbojpeg introuvable
+                logging.warning(f"libjpeg-turbo indisponible, repli sur OpenCV: {e}")
+        if backend == "turbojpeg":
+            logging.warning("PyTurboJPEG non installé, repli sur OpenCV")
+        return "opencv"
+
+    def encode(self, frame: Any, quality: int = 80) -> Optional[Any]:
+        """JPEG brut (objet compatible buffer : bytes ou ndarray uint8)"""
+        if self._turbo is not None:
+            return self._turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer if ret else None
+
+    def encode_chunk(self, frame: Any, quality: int = 80) -> Optional[bytes]:
+        """Partie multipart/x-mixed-replace complète pour cette frame"""
+        jpeg = self.encode(frame, quality)
+        if jpeg is None:
+            return None
+        chunk = b''.join((MULTIPART_HEADER, jpeg, MULTIPART_TRAILER))
+        with self._lock:
+            self.encoded += 1
+            self.bytes_out += len(chunk)
+        return chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "encoded": self.encoded,
+                "avg_kib": round(self.bytes_out / self.encoded / 1024, 1) if self.encoded else 0.0,
+            }
+
+
+def jpeg_payload(chunk: bytes) -> memoryview:
+    """Vue sans copie sur le JPEG contenu dans une partie multipart"""
+    return memoryview(chunk)[len(MULTIPART_HEADER):len(chunk) - len(MULTIPART_TRAILER)]
+
+
+def websocket_message(sequence: int, captured_at: float, chunk: bytes) -> bytes:
+    """Message binaire WebSocket à partir d'une partie multipart déjà encodée"""
+    return b''.join((WS_HEADER.pack(sequence & 0xFFFFFFFF, captured_at), jpeg_payload(chunk)))
@@ -0,0 +1,177 @@
+"""
+DeepFake MIA - Métriques
+Histogrammes, compteurs et jauges au format texte Prometheus (/api/metrics)
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+FACE_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12)
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {child.value}"]
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = 'le="%s"' % ('+Inf' if bound == float('inf') else repr(float(bound)))
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {total}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    'deepfake_stage_seconds', "Durée des étages de traitement d'une frame", ('stage',)
+)
+FACES_PER_FRAME = Histogram(
+    'deepfake_faces_per_frame', "Visages traités par frame", buckets=FACE_COUNT_BUCKETS
+)
+DROPPED_FRAMES = Counter(
+    'deepfake_dropped_frames_total', "Frames jetées (la plus récente gagne)", ('queue',)
+)
+QUEUE_DEPTH = Gauge(
+    'deepfake_queue_depth', "Frames en attente entre deux étages", ('queue',)
+)
+STREAM_CLIENTS = Gauge(
+    'deepfake_stream_clients', "Clients connectés au flux vidéo (toutes sessions)"
+)
+SESSION_FPS = Gauge(
+    'deepfake_session_fps', "Frames traitées par seconde, par session (borne)", ('session',)
+)
+BATCH_SIZE = Histogram(
+    'deepfake_batch_size', "Requêtes regroupées par appel ONNX (micro-batching entre sessions)", ('model',),
+    buckets=BATCH_SIZE_BUCKETS
+)
+BATCH_WAIT_SECONDS = Histogram(
+    'deepfake_batch_wait_seconds', "Attente d'une requête avant le départ de son lot", ('model',)
+)
+WORKER_RESTARTS = Counter(
+    'deepfake_worker_restarts_total', "Redémarrages des workers d'inférence (crash ou blocage)", ('worker',)
+)
+MODEL_LOAD_SECONDS = Gauge(
+    'deepfake_model_load_seconds', "Durée du dernier chargement de chaque modèle", ('model',)
+)
+
+
+def render() -> str:
+    """Exposition texte Prometheus de toutes les métriques"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,219 @@
+"""
+DeepFake MIA - Sessions ONNX Runtime
+Fabrique centrale des sessions : threads, niveau d'optimisation, mode
+d'exécution et arènes mémoire selon core.globals.session_config (réglages
+globaux + surcharges par modèle), et cache des graphes optimisés
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import onnxruntime
+
+import core.globals
+
+DEFAULT_SESSION_SETTINGS: Dict[str, Any] = {
+    "INTRA_OP_THREADS": 0,
+    "INTER_OP_THREADS": 1,
+    "GRAPH_OPTIMIZATION": "all",
+    "EXECUTION_MODE": "sequential",
+    "ALLOW_SPINNING": True,
+    "CPU_MEM_ARENA": True,
+    "MEM_PATTERN": True,
+    "GPU_ARENA_EXTEND_STRATEGY": "kNextPowerOfTwo",
+    "GPU_MEM_LIMIT_GB": 0,
+    "CACHE_OPTIMIZED": True,
+}
+
+OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+HASHES_FILE = "hashes.json"
+HASHES_LOCK = threading.Lock()
+
+
+def get_model_settings(name: Optional[str] = None) -> Dict[str, Any]:
+    """Réglages effectifs d'un modèle : défauts < config globale < surcharge du modèle"""
+    config = core.globals.session_config or {}
+    settings = dict(DEFAULT_SESSION_SETTINGS)
+    settings.update({key: value for key, value in config.items() if key in DEFAULT_SESSION_SETTINGS})
+    if name is not None:
+        settings.update((config.get("MODELS") or {}).get(name) or {})
+    return settings
+
+
+def get_intra_op_threads(settings: Dict[str, Any]) -> int:
+    """
+    Threads intra-op : réglage explicite, sinon execution_threads (au plus
+    un par cœur logique) ; plafonnés par la part de chaque worker en
+    traitement vidéo multi-processus (core.globals.intra_op_threads,
+    0 = pas de plafond)
+    """
+    threads = settings["INTRA_OP_THREADS"] or min(core.globals.execution_threads, os.cpu_count() or 1)
+    if core.globals.intra_op_threads > 0:
+        threads = min(threads, core.globals.intra_op_threads) if threads else core.globals.intra_op_threads
+    return threads
+
+
+def get_session_options(name: Optional[str] = None) -> onnxruntime.SessionOptions:
+    """Options de session du modèle (0 thread = défaut ORT)"""
+    settings = get_model_settings(name)
+    options = onnxruntime.SessionOptions()
+    threads = get_intra_op_threads(settings)
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    if settings["INTER_OP_THREADS"] > 0:
+        options.inter_op_num_threads = settings["INTER_OP_THREADS"]
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[settings["GRAPH_OPTIMIZATION"]]
+    options.execution_mode = EXECUTION_MODES[settings["EXECUTION_MODE"]]
+    options.enable_cpu_mem_arena = settings["CPU_MEM_ARENA"]
+    options.enable_mem_pattern = settings["MEM_PATTERN"]
+    if not settings["ALLOW_SPINNING"]:
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        options.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return options
+
+
+def get_providers(name: Optional[str] = None) -> List[Any]:
+    """Providers de core.globals, avec les options d'arène mémoire pour CUDA"""
+    settings = get_model_settings(name)
+    providers: List[Any] = []
+    for provider in core.globals.execution_providers:
+        if provider == 'CUDAExecutionProvider':
+            options = {"arena_extend_strategy": settings["GPU_ARENA_EXTEND_STRATEGY"]}
+            if settings["GPU_MEM_LIMIT_GB"]:
+                options["gpu_mem_limit"] = str(int(settings["GPU_MEM_LIMIT_GB"] * 1024 ** 3))
+            providers.append((provider, options))
+        else:
+            providers.append(provider)
+    return providers
+
+
+def get_session_kwargs(name: Optional[str] = None) -> Dict[str, Any]:
+    """Arguments pour onnxruntime.InferenceSession (sans cache de graphe)"""
+    return {
+        "providers": get_providers(name),
+        "sess_options": get_session_options(name),
+    }
+
+
+def get_model_hash(model_path: str) -> str:
+    """
+    SHA-1 du fichier modèle, mémorisé dans le cache par (chemin, taille,
+    date de modification) pour ne pas relire plusieurs centaines de Mo à
+    chaque démarrage
+    """
+    stat = os.stat(model_path)
+    key = f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    cache_dir = core.globals.onnx_cache_dir
+    hashes_path = os.path.join(cache_dir, HASHES_FILE) if cache_dir else None
+
+    with HASHES_LOCK:
+        hashes: Dict[str, str] = {}
+        if hashes_path and os.path.exists(hashes_path):
+            try:
+                with open(hashes_path, 'r') as f:
+                    hashes = json.load(f)
+            except (OSError, ValueError):
+                hashes = {}
+        if key in hashes:
+            return hashes[key]
+
+        digest = hashlib.sha1()
+        with open(model_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        hashes[key] = digest.hexdigest()
+        if hashes_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{hashes_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(hashes, f, indent=1)
+            os.replace(temp_path, hashes_path)
+        return hashes[key]
+
+
+def get_optimized_model_path(model_path: str, name: Optional[str] = None) -> Optional[str]:
+    """
+    Chemin du graphe optimisé dans le cache. La clé couvre tout ce dont
+    dépend le graphe sérialisé : contenu du modèle, version d'ORT, niveau
+    d'optimisation, providers et architecture (le niveau "all" produit des
+    noeuds spécifiques au matériel ; le cache ne se copie pas d'une machine
+    à l'autre).
+    """
+    settings = get_model_settings(name)
+    cache_dir = core.globals.onnx_cache_dir
+    if not cache_dir or not settings["CACHE_OPTIMIZED"] or settings["GRAPH_OPTIMIZATION"] == "disable":
+        return None
+    providers = "-".join(
+        (provider[0] if isinstance(provider, tuple) else provider).replace("ExecutionProvider", "").lower()
+        for provider in core.globals.execution_providers
+    )
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    digest = get_model_hash(model_path)[:16]
+    filename = (
+        f"{stem}_{digest}_ort{onnxruntime.__version__}_{settings['GRAPH_OPTIMIZATION']}"
+        f"_{providers}_{platform.machine().lower()}.onnx"
+    )
+    return os.path.join(cache_dir, filename)
+
+
+def create_session(model_path: str, name: Optional[str] = None, quantize: bool = True) -> onnxruntime.InferenceSession:
+    """
+    Crée la session d'un modèle. Si le cache est actif, le premier
+    chargement sérialise le graphe optimisé ; les suivants le chargent
+    directement, sans repasser par l'optimisation. En mode CPU INT8, la
+    variante quantifiée validée du modèle est chargée à sa place, sauf si
+    `quantize` est faux.
+    """
+    if quantize and core.globals.quantization_config.get("ENABLED"):
+        from core.quantization import get_active_quantized_model
+        model_path = get_active_quantized_model(model_path, name) or model_path
+
+    kwargs = get_session_kwargs(name)
+    try:
+        optimized_path = get_optimized_model_path(model_path, name)
+    except OSError as e:
+        logging.warning(f"Cache ONNX indisponible pour {model_path}: {e}")
+        optimized_path = None
+    if optimized_path is None:
+        return onnxruntime.InferenceSession(model_path, **kwargs)
+
+    if os.path.exists(optimized_path):
+        options = kwargs["sess_options"]
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return onnxruntime.InferenceSession(optimized_path, **kwargs)
+        except Exception as e:
+            # Fichier tronqué ou incompatible : on le reconstruit
+            logging.warning(f"Graphe optimisé invalide, reconstruction ({optimized_path}): {e}")
+            os.remove(optimized_path)
+            kwargs = get_session_kwargs(name)
+
+    start = time.perf_counter()
+    temp_path = f"{optimized_path}.{os.getpid()}.tmp"
+    options = kwargs["sess_options"]
+    options.optimized_model_filepath = temp_path
+    os.makedirs(os.path.dirname(optimized_path), exist_ok=True)
+    session = onnxruntime.InferenceSession(model_path, **kwargs)
+    if os.path.exists(temp_path):
+        os.replace(temp_path, optimized_path)
+        logging.info(
+            f"Graphe optimisé mis en cache: {os.path.basename(optimized_path)} "
+            f"({time.perf_counter() - start:.2f} s)"
+        )
+    return session
@@ -0,0 +1,258 @@
+"""
+DeepFake MIA - Pipeline temps réel
+Étages capture → inférence → encodage reliés par des files bornées
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from core.metrics import DROPPED_FRAMES
+from core.video_capture import VideoCapturer
+
+
+@dataclass
+class FramePacket:
+    """Frame qui circule entre les étages du pipeline"""
+    index: int
+    captured_at: float
+    frame: Any = None
+    data: Optional[bytes] = None
+
+
+class LatestFrameQueue:
+    """File bornée : la frame la plus récente gagne, les plus anciennes sont jetées"""
+
+    def __init__(self, maxsize: int = 1, name: str = "queue"):
+        self._items: deque = deque(maxlen=max(1, maxsize))
+        self._condition = threading.Condition()
+        self._closed = False
+        self._dropped_metric = DROPPED_FRAMES.labels(name)
+        self.dropped = 0
+
+    def put(self, item: Any) -> None:
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                self._dropped_metric.inc()
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Retourne l'élément le plus ancien encore en file, ou None (timeout / fermeture)"""
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._items.clear()
+            self._condition.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class StageStats:
+    """Compteurs d'un étage : frames traitées, latence, FPS"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+        self.fps = 0
+        self._lock = threading.Lock()
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+
+    def record(self, elapsed: float) -> None:
+        with self._lock:
+            self.processed += 1
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self._window_count += 1
+            now = time.perf_counter()
+            if now - self._window_start >= 1.0:
+                self.fps = self._window_count
+                self._window_count = 0
+                self._window_start = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.total_time / self.processed if self.processed else 0.0
+            return {
+                "processed": self.processed,
+                "errors": self.errors,
+                "fps": self.fps,
+                "avg_ms": round(avg * 1000, 2),
+                "last_ms": round(self.last_time * 1000, 2),
+            }
+
+
+class FramePipeline:
+    """
+    Pipeline capture → inférence → encodage.
+
+    La capture est assurée par le thread du VideoCapturer ; l'inférence
+    tourne dans son propre thread et l'encodage dans `encode_workers`
+    threads. Les files entre étages ne gardent que les frames les plus
+    récentes : le débit est limité par l'étage le plus lent et la latence
+    ne s'accumule pas. Avec plusieurs encodeurs, un paquet terminé après un
+    paquet plus récent est jeté pour que la sortie reste dans l'ordre.
+
+    Si `sink` est fourni, les paquets encodés lui sont passés (ex. un
+    FrameBroadcaster) au lieu d'être déposés dans `output_queue`.
+    """
+
+    def __init__(
+        self,
+        capturer: VideoCapturer,
+        process: Callable[[Any], Any],
+        encode: Callable[[Any], Optional[bytes]],
+        queue_size: int = 1,
+        sink: Optional[Callable[[FramePacket], None]] = None,
+        encode_workers: int = 1,
+    ):
+        self.capturer = capturer
+        self._process = process
+        self._encode = encode
+        self._sink = sink
+        self._queue_size = queue_size
+        self._encode_workers = max(1, encode_workers)
+        self._threads = []
+        self._frame_index = 0
+        self._last_output = 0
+        self._output_lock = threading.Lock()
+        self._late_metric = DROPPED_FRAMES.labels("encode_late")
+        self.late = 0
+        self._skipped_metric = DROPPED_FRAMES.labels("inference")
+        self.skipped = 0
+        self.is_running = False
+        self.capture_queue = LatestFrameQueue(queue_size, "capture")
+        self.encode_queue = LatestFrameQueue(queue_size, "encode")
+        self.output_queue = LatestFrameQueue(queue_size, "output")
+        self.stats = {
+            "capture": StageStats("capture"),
+            "inference": StageStats("inference"),
+            "encode": StageStats("encode"),
+        }
+        self._last_capture = time.perf_counter()
+
+    def start(self, width: int = 640, height: int = 480, fps: int = 30) -> bool:
+        """Démarre la capture puis les threads d'inférence et d'encodage"""
+        if self.is_running:
+            return True
+        self.capturer.set_frame_callback(self._on_frame)
+        if not self.capturer.start(width, height, fps):
+            return False
+
+        self.is_running = True
+        workers = [("inference", self._inference_loop)]
+        workers += [(f"encode-{i}", self._encode_loop) for i in range(self._encode_workers)]
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return True
+
+    def stop(self) -> None:
+        """Arrête les étages et libère la caméra"""
+        self.is_running = False
+        self.capturer.set_frame_callback(None)
+        for queue in (self.capture_queue, self.encode_queue, self.output_queue):
+            queue.close()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        self.capturer.release()
+
+    def read(self, timeout: Optional[float] = None) -> Optional[FramePacket]:
+        """Retourne le dernier paquet encodé disponible"""
+        return self.output_queue.get(timeout)
+
+    def _on_frame(self, frame: Any) -> None:
+        # Appelé depuis le thread de capture du VideoCapturer
+        now = time.perf_counter()
+        self.stats["capture"].record(now - self._last_capture)
+        self._last_capture = now
+        self._frame_index += 1
+        self.capture_queue.put(FramePacket(index=self._frame_index, captured_at=time.time(), frame=frame))
+
+    def _inference_loop(self) -> None:
+        stats = self.stats["inference"]
+        while self.is_running:
+            packet = self.capture_queue.get(timeout=0.5)
+            if packet is None:
+                continue
+            start = time.perf_counter()
+            try:
+                packet.frame = self._process(packet.frame)
+            except Exception as e:
+                stats.errors += 1
+                logging.error(f"Erreur étage inférence: {e}")
+                continue
+            stats.record(time.perf_counter() - start)
+            if packet.frame is None:
+                # Frame abandonnée par l'étage (ex. worker d'inférence indisponible)
+                self.skipped += 1
+                self._skipped_metric.inc()
+                continue
+            self.encode_queue.put(packet)
+
+    def _encode_loop(self) -> None:
+        stats = self.stats["encode"]
+        while self.is_running:
+            packet = self.encode_queue.get(timeout=0.5)
+            if packet is None:
+                continue
+            start = time.perf_counter()
+            try:
+                packet.data = self._encode(packet.frame)
+            except Exception as e:
+                stats.errors += 1
+                logging.error(f"Erreur étage encodage: {e}")
+                continue
+            if packet.data is None:
+                stats.errors += 1
+                continue
+            stats.record(time.perf_counter() - start)
+            packet.frame = None
+            with self._output_lock:
+                if packet.index <= self._last_output:
+                    self.late += 1
+                    self._late_metric.inc()
+                    continue
+                self._last_output = packet.index
+                if self._sink is not None:
+                    self._sink(packet)
+                else:
+                    self.output_queue.put(packet)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs par étage et frames jetées par file"""
+        return {
+            "running": self.is_running,
+            "stages": {name: stage.snapshot() for name, stage in self.stats.items()},
+            "dropped": {
+                "capture": self.capture_queue.dropped,
+                "encode": self.encode_queue.dropped,
+                "output": self.output_queue.dropped,
+                "encode_late": self.late,
+                "inference": self.skipped,
+            },
+            "encode_workers": self._encode_workers,
+            "queue_depth": {
+                "capture": len(self.capture_queue),
+                "encode": len(self.encode_queue),
+                "output": len(self.output_queue),
+            },
+        }
@@ -1,11 +1,21 @@
 import sys
 import importlib
-from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
 from types import ModuleType
-from typing import Any, List, Callable
+from typing import Any, Callable, Dict, List, Optional
 from tqdm import tqdm
 
 import core.globals
+from core.frame_context import FrameContext
+from core.utilities import (
+    clean_temp, create_temp, create_video, detect_fps, extract_frames, get_temp_frame_paths,
+    move_temp, restore_audio, stream_process_video
+)
 
 FRAME_PROCESSORS_MODULES: List[ModuleType] = []
 FRAME_PROCESSORS_INTERFACE = [
@@ -15,6 +25,17 @@ FRAME_PROCESSORS_INTERFACE = [
     'process_image',
     'process_video'
 ]
+CHUNKS_PER_WORKER = 4
+WORKER_PROGRESS = None
+# Globals recopiés dans les workers du backend processus (spawn : core.globals y repart des défauts)
+WORKER_OPTIONS = [
+    'execution_providers', 'session_config', 'onnx_cache_dir', 'quantization_config',
+    'batching_config', 'analyser_profiles', 'source_path', 'target_path', 'output_path',
+    'frame_processors', 'keep_fps', 'keep_audio', 'keep_frames', 'many_faces',
+    'color_correction', 'video_encoder', 'video_quality', 'max_memory', 'log_level',
+    'mouth_mask', 'show_mouth_mask_box', 'mask_feather_ratio', 'mask_down_size', 'mask_size',
+    'face_tracking', 'detect_interval', 'tracker_max_drift',
+]
 
 
 def load_frame_processor_module(frame_processor: str) -> Any:
@@ -37,7 +58,35 @@ def get_frame_processors_modules(frame_processors: List[str]) -> List[ModuleType
     return FRAME_PROCESSORS_MODULES
 
 
+def run_frame_processors(
+    source_face: Any,
+    frame: Any,
+    frame_processors: List[ModuleType],
+    detect: Optional[Callable[[Any], List[Any]]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> FrameContext:
+    """
+    Applique les processeurs dans l'ordre sur un contexte partagé : la
+    détection n'a lieu qu'une fois par frame. Un processeur sans
+    `process_context` est appelé via `process_frame` et considéré comme
+    pouvant modifier la géométrie (visages invalidés).
+    `detect` et `options` sont ceux de la session (défaut : core.globals).
+    """
+    context = FrameContext(frame, source_face, detect=detect, options=options)
+    for frame_processor in frame_processors:
+        if hasattr(frame_processor, 'process_context'):
+            frame_processor.process_context(context)
+        else:
+            with context.time(frame_processor.__name__):
+                frame = frame_processor.process_frame(source_face, context.frame)
+            context.set_frame(frame, geometry_changed=True)
+    return context
+
+
 def multi_process_frame(source_path: str, temp_frame_paths: List[str], process_frames: Callable[[str, List[str], Any], None], progress: Any = None) -> None:
+    if core.globals.execution_backend == 'process':
+        multi_process_frame_pool(source_path, temp_frame_paths, process_frames, progress)
+        return
     with ThreadPoolExecutor(max_workers=core.globals.execution_threads) as executor:
         futures = []
         for path in temp_frame_paths:
@@ -47,9 +96,130 @@ def multi_process_frame(source_path: str, temp_frame_paths: List[str], process_f
             future.result()
 
 
+class QueueProgress:
+    """Avancement d'un worker, remonté au processus principal par une queue"""
+
+    def __init__(self, progress_queue: Any):
+        self.progress_queue = progress_queue
+
+    def update(self, n: int = 1) -> None:
+        self.progress_queue.put(n)
+
+    def set_postfix(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+def get_worker_options() -> Dict[str, Any]:
+    """Instantané des options de core.globals à transmettre aux workers"""
+    return {name: getattr(core.globals, name) for name in WORKER_OPTIONS}
+
+
+def init_worker(options: Dict[str, Any], intra_op_threads: int, progress_queue: Any) -> None:
+    """
+    Initialisation d'un worker : mêmes options que le processus principal
+    (réglages ONNX, cache de graphes, masques, suivi...), chacun charge ses
+    propres sessions ONNX au premier chunk
+    """
+    global WORKER_PROGRESS
+
+    for name, value in options.items():
+        setattr(core.globals, name, value)
+    core.globals.intra_op_threads = intra_op_threads
+    WORKER_PROGRESS = QueueProgress(progress_queue)
+
+
+def process_chunk(process_frames: Callable[[str, List[str], Any], None], source_path: str, frame_paths: List[str]) -> int:
+    process_frames(source_path, frame_paths, WORKER_PROGRESS)
+    return len(frame_paths)
+
+
+def multi_process_frame_pool(source_path: str, temp_frame_paths: List[str], process_frames: Callable[[str, List[str], Any], None], progress: Any = None) -> None:
+    """
+    Backend multi-processus : plages contiguës de frames par worker, threads
+    intra-op répartis entre workers, avancement agrégé dans la barre tqdm.
+    """
+    frame_paths = sorted(temp_frame_paths)
+    if not frame_paths:
+        return
+    workers = max(1, min(core.globals.execution_processes, len(frame_paths)))
+    intra_op_threads = max(1, core.globals.execution_threads // workers)
+    chunk_size = max(1, math.ceil(len(frame_paths) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [frame_paths[i:i + chunk_size] for i in range(0, len(frame_paths), chunk_size)]
+
+    # spawn : les runtimes CUDA / ONNX ne supportent pas fork
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(get_worker_options(), intra_op_threads, progress_queue)
+    ) as executor:
+        futures = [executor.submit(process_chunk, process_frames, source_path, chunk) for chunk in chunks]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.1)
+            drain_progress(progress_queue, progress)
+    # Les workers sont arrêtés : leurs derniers messages d'avancement sont arrivés
+    drain_progress(progress_queue, progress)
+    # Résultats dans l'ordre des plages : la première erreur est remontée
+    for future in futures:
+        future.result()
+
+
+def drain_progress(progress_queue: Any, progress: Any) -> None:
+    while True:
+        try:
+            count = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        if progress is not None:
+            progress.update(count)
+
+
 def process_video(source_path: str, frame_paths: list[str], process_frames: Callable[[str, List[str], Any], None]) -> None:
     progress_bar_format = '{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]'
     total = len(frame_paths)
     with tqdm(total=total, desc='Processing', unit='frame', dynamic_ncols=True, bar_format=progress_bar_format) as progress:
-        progress.set_postfix({'execution_providers': core.globals.execution_providers, 'execution_threads': core.globals.execution_threads, 'max_memory': core.globals.max_memory})
+        progress.set_postfix({'execution_providers': core.globals.execution_providers, 'execution_backend': core.globals.execution_backend, 'execution_threads': core.globals.execution_threads, 'max_memory': core.globals.max_memory})
         multi_process_frame(source_path, frame_paths, process_frames, progress)
+
+
+def process_video_stream(source_face: Any, target_path: str, output_path: str, frame_processors: List[ModuleType]) -> bool:
+    """Applique les processeurs à une vidéo via les pipes ffmpeg (sans frames PNG temporaires)"""
+    def process(frame: Any) -> Any:
+        return run_frame_processors(source_face, frame, frame_processors).frame
+
+    return stream_process_video(target_path, output_path, process)
+
+
+def process_video_file(source_path: str, target_path: str, output_path: str, frame_processors: List[str]) -> bool:
+    """
+    Traitement hors ligne d'une vidéo. Avec core.globals.video_streaming,
+    les frames passent par des pipes ffmpeg (process_video_stream) ; si le
+    flux échoue, repli sur l'extraction en PNG : extract_frames, traitement
+    par chaque processeur (backend de core.globals.execution_backend),
+    create_video puis restore_audio.
+    """
+    modules = get_frame_processors_modules(frame_processors)
+    if core.globals.video_streaming:
+        import cv2
+        from core.face_analyser import get_one_face
+
+        source_face = get_one_face(cv2.imread(source_path), profile='source')
+        if process_video_stream(source_face, target_path, output_path, modules):
+            return True
+        logging.warning(f"Traitement en flux impossible, repli sur les frames PNG: {target_path}")
+
+    create_temp(target_path)
+    extract_frames(target_path)
+    temp_frame_paths = get_temp_frame_paths(target_path)
+    for frame_processor in modules:
+        frame_processor.process_video(source_path, temp_frame_paths)
+    create_video(target_path, detect_fps(target_path) if core.globals.keep_fps else 30.0)
+    if core.globals.keep_audio:
+        restore_audio(target_path, output_path)
+    else:
+        move_temp(target_path, output_path)
+    clean_temp(target_path)
+    return os.path.isfile(output_path)
@@ -1,25 +1,37 @@
-from typing import Any, List
+from typing import Any, List, Optional
 import cv2
+import numpy as np
 import threading
+import time
 import os
 import logging
+import platform
+from importlib.util import find_spec
 
 import core.globals
-from core.face_analyser import get_one_face
+from core.frame_context import FrameContext
 from core.typing import Frame, Face
+from core.metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS
+from core.onnx_session import create_session
 
-# Tenter d'importer gfpgan (peut échouer avec certaines versions de torchvision)
-GFPGAN_AVAILABLE = False
-try:
-    import gfpgan
-    import platform
-    import torch
-    GFPGAN_AVAILABLE = True
-except ImportError as e:
-    logging.warning(f"GFPGAN non disponible: {e}")
+# gfpgan / torch ne sont importés qu'au chargement du modèle (plusieurs
+# secondes à froid) ; l'import peut encore échouer avec certaines versions
+# de torchvision, le modèle est alors marqué en échec
+def _is_installed(name: str) -> bool:
+    # origin None : simple dossier (ex. gfpgan/weights téléchargés dans le
+    # répertoire courant), pas le paquet installé
+    spec = find_spec(name)
+    return spec is not None and spec.origin is not None
+
+
+GFPGAN_AVAILABLE = _is_installed("gfpgan") and _is_installed("torch")
+if not GFPGAN_AVAILABLE:
+    logging.warning("GFPGAN non disponible: gfpgan ou torch non installé")
 
 FACE_ENHANCER = None
 FACE_ENHANCER_FAILED = False
+ONNX_ENHANCER = None
+ONNX_ENHANCER_FAILED = False
 THREAD_SEMAPHORE = threading.Semaphore()
 THREAD_LOCK = threading.Lock()
 NAME = "DLC.FACE-ENHANCER"
@@ -29,6 +41,18 @@ models_dir = os.path.join(
     os.path.dirname(os.path.dirname(os.path.dirname(abs_dir))), "models"
 )
 
+# Gabarit FFHQ 512x512 de GFPGAN (yeux, nez, coins de la bouche), même
+# ordre que les 5 kps insightface
+CROP_SIZE = 512
+FFHQ_TEMPLATE = np.array([
+    [192.98138, 239.94708],
+    [318.90277, 240.1936],
+    [256.63416, 314.01935],
+    [201.26117, 371.41043],
+    [313.08905, 371.15118],
+], dtype=np.float32)
+GFPGAN_WEIGHT = 0.5
+
 
 def get_face_enhancer() -> Any:
     global FACE_ENHANCER, FACE_ENHANCER_FAILED
@@ -46,6 +70,9 @@ def get_face_enhancer() -> Any:
                     FACE_ENHANCER_FAILED = True
                     return None
                 
+                start = time.perf_counter()
+                import gfpgan
+                import torch
                 match platform.system():
                     case "Darwin":  # Mac OS
                         if torch.backends.mps.is_available():
@@ -55,6 +82,7 @@ def get_face_enhancer() -> Any:
                             FACE_ENHANCER = gfpgan.GFPGANer(model_path=model_path, upscale=1)
                     case _:  # Other OS
                         FACE_ENHANCER = gfpgan.GFPGANer(model_path=model_path, upscale=1)
+                MODEL_LOAD_SECONDS.labels("face_enhancer").set(time.perf_counter() - start)
                         
                 logging.info("GFPGAN Face Enhancer chargé avec succès")
             except Exception as e:
@@ -65,37 +93,149 @@ def get_face_enhancer() -> Any:
     return FACE_ENHANCER
 
 
+def get_onnx_enhancer() -> Any:
+    """GFPGAN exporté en ONNX (models/GFPGANv1.4.onnx), si présent"""
+    global ONNX_ENHANCER, ONNX_ENHANCER_FAILED
+
+    if ONNX_ENHANCER_FAILED:
+        return None
+
+    with THREAD_LOCK:
+        if ONNX_ENHANCER is None:
+            model_path = os.path.join(models_dir, "GFPGANv1.4.onnx")
+            if not os.path.exists(model_path):
+                ONNX_ENHANCER_FAILED = True
+                return None
+            try:
+                start = time.perf_counter()
+                ONNX_ENHANCER = create_session(model_path, "face_enhancer")
+                MODEL_LOAD_SECONDS.labels("face_enhancer_onnx").set(time.perf_counter() - start)
+                logging.info("GFPGAN ONNX chargé avec succès")
+            except Exception as e:
+                logging.warning(f"Impossible de charger GFPGAN ONNX: {e}")
+                ONNX_ENHANCER_FAILED = True
+                return None
+
+    return ONNX_ENHANCER
+
+
+def align_crop(temp_frame: Frame, face: Face) -> tuple:
+    """Recadrage 512x512 aligné sur le gabarit FFHQ à partir des kps du visage"""
+    matrix = cv2.estimateAffinePartial2D(face.kps.astype(np.float32), FFHQ_TEMPLATE, method=cv2.LMEDS)[0]
+    crop = cv2.warpAffine(
+        temp_frame, matrix, (CROP_SIZE, CROP_SIZE),
+        borderMode=cv2.BORDER_CONSTANT, borderValue=(135, 133, 132)
+    )
+    return crop, matrix
+
+
+def restore_crops(crops: List[np.ndarray]) -> Optional[List[np.ndarray]]:
+    """
+    Restauration GFPGAN d'un lot de recadrages BGR 512x512.
+    ONNX si le modèle exporté est présent, sinon le réseau PyTorch de GFPGANer.
+    """
+    # BGR uint8 -> RGB [-1, 1], NCHW
+    batch = cv2.dnn.blobFromImages(crops, 1.0 / 127.5, (CROP_SIZE, CROP_SIZE), (127.5, 127.5, 127.5), swapRB=True)
+
+    session = get_onnx_enhancer()
+    if session is not None:
+        model_input = session.get_inputs()[0]
+        if isinstance(model_input.shape[0], int) and model_input.shape[0] == 1:
+            # Modèle exporté avec un batch fixe : un visage par appel
+            outputs = [session.run(None, {model_input.name: batch[i:i + 1]})[0] for i in range(len(batch))]
+            output = np.concatenate(outputs)
+        else:
+            output = session.run(None, {model_input.name: batch})[0]
+    else:
+        enhancer = get_face_enhancer()
+        if enhancer is None:
+            return None
+        import torch
+        with torch.no_grad():
+            tensor = torch.from_numpy(batch).to(enhancer.device)
+            output = enhancer.gfpgan(tensor, return_rgb=False, weight=GFPGAN_WEIGHT)[0].float().cpu().numpy()
+
+    # [-1, 1] -> [0, 255] en place, puis RGB NCHW -> BGR HWC uint8
+    output *= 127.5
+    output += 128.0  # +0.5 pour arrondir à la conversion
+    np.clip(output, 0, 255, out=output)
+    return [cv2.cvtColor(image.astype(np.uint8).transpose(1, 2, 0), cv2.COLOR_RGB2BGR) for image in output]
+
+
+def enhance_faces(temp_frame: Frame, target_faces: List[Face]) -> Frame:
+    """
+    Restaure les visages déjà détectés par le swap : recadrages alignés
+    512x512 passés en un lot, puis recollés dans la ROI de chaque visage.
+    Évite la détection plein cadre de get_one_face() et celle de GFPGANer.
+    """
+    from core.processors.frame.face_swapper import paste_back
+
+    faces = [face for face in target_faces if face is not None and face.get('kps') is not None]
+    if not faces or not is_available():
+        return temp_frame
+
+    try:
+        with THREAD_SEMAPHORE, STAGE_SECONDS.labels("enhancer").time():
+            aligned = [align_crop(temp_frame, face) for face in faces]
+            restored = restore_crops([crop for crop, _ in aligned])
+            if restored is None:
+                return temp_frame
+            temp_frame = temp_frame.copy()
+            for (crop, matrix), restored_crop in zip(aligned, restored):
+                paste_back(temp_frame, restored_crop, crop.shape[:2], matrix)
+    except Exception as e:
+        logging.debug(f"Erreur lors de l'enhancement par recadrage: {e}")
+    return temp_frame
+
+
 def enhance_face(temp_frame: Frame) -> Frame:
     enhancer = get_face_enhancer()
     if enhancer is None:
         return temp_frame
     
     try:
-        with THREAD_SEMAPHORE:
+        with THREAD_SEMAPHORE, STAGE_SECONDS.labels("enhancer").time():
             _, _, temp_frame = enhancer.enhance(temp_frame, paste_back=True)
     except Exception as e:
         logging.debug(f"Erreur lors de l'enhancement: {e}")
     return temp_frame
 
 
-def process_frame(source_face: Face, temp_frame: Frame) -> Frame:
+def process_context(context: FrameContext) -> None:
+    """Restaure les visages du contexte, sans nouvelle détection s'ils sont déjà connus"""
     if not is_available():
-        return temp_frame
-    target_face = get_one_face(temp_frame)
-    if target_face:
-        temp_frame = enhance_face(temp_frame)
-    return temp_frame
+        return
+    target_faces = context.faces
+    if target_faces:
+        with context.time(NAME):
+            context.set_frame(enhance_faces(context.frame, target_faces))
+
+
+def process_frame(source_face: Face, temp_frame: Frame) -> Frame:
+    context = FrameContext(temp_frame, source_face)
+    process_context(context)
+    return context.frame
 
 
 def process_frame_v2(temp_frame: Frame) -> Frame:
-    if not is_available():
-        return temp_frame
-    target_face = get_one_face(temp_frame)
-    if target_face:
-        temp_frame = enhance_face(temp_frame)
-    return temp_frame
+    return process_frame(None, temp_frame)
+
+
+def process_frames(source_path: str, temp_frame_paths: List[str], progress: Any = None) -> None:
+    """Restaure des frames sur disque (réécrites en place), comme face_swapper.process_frames"""
+    for temp_frame_path in temp_frame_paths:
+        temp_frame = cv2.imread(temp_frame_path)
+        if temp_frame is not None:
+            cv2.imwrite(temp_frame_path, process_frame(None, temp_frame))
+        if progress is not None:
+            progress.update(1)
+
+
+def process_video(source_path: str, temp_frame_paths: List[str]) -> None:
+    from core.processors.frame.core import process_video as process_video_frames
+    process_video_frames(source_path, temp_frame_paths, process_frames)
 
 
 def is_available() -> bool:
-    """Vérifie si le Face Enhancer est disponible"""
-    return GFPGAN_AVAILABLE and not FACE_ENHANCER_FAILED
+    """Vérifie si le Face Enhancer est disponible (GFPGAN PyTorch ou ONNX)"""
+    return (GFPGAN_AVAILABLE and not FACE_ENHANCER_FAILED) or get_onnx_enhancer() is not None
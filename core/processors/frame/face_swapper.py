@@ -1,16 +1,29 @@
-from typing import Any, List
+from typing import Any, List, Optional
 import cv2
-import insightface
+from insightface.model_zoo.inswapper import INSwapper
+from insightface.utils import face_align
 import threading
+import time
 import numpy as np
 import core.globals
+from core.onnx_session import create_session
+from core.metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS
+from core.face_analyser import get_target_faces
+from core.frame_context import FrameContext, get_scratch
 import logging
 import os
 
 FACE_SWAPPER = None
+SOURCE_FACE: tuple = (None, None)  # (chemin, visage) de la source des traitements hors ligne
 THREAD_LOCK = threading.Lock()
 NAME = "DLC.FACE-SWAPPER"
 
+LOWER_LIP_ORDER = [
+    65, 66, 62, 70, 69, 18, 19, 20, 21, 22, 23, 24, 0, 8, 7, 6, 5, 4, 3, 2, 65,
+]
+TOPLIP_INDICES = [20, 0, 1, 2, 3, 4, 5]
+CHIN_INDICES = [11, 12, 13, 14, 15, 16]
+
 abs_dir = os.path.dirname(os.path.abspath(__file__))
 models_dir = os.path.join(
     os.path.dirname(os.path.dirname(os.path.dirname(abs_dir))), "models"
@@ -28,9 +41,11 @@ def get_face_swapper() -> Any:
                 logging.error(f"❌ Model not found: {model_path}")
                 return None
             try:
-                FACE_SWAPPER = insightface.model_zoo.get_model(
-                    model_path, providers=core.globals.execution_providers
-                )
+                start = time.perf_counter()
+                # Session créée par la fabrique (options, graphe optimisé en
+                # cache) ; le modèle garde le fichier d'origine pour l'emap
+                FACE_SWAPPER = INSwapper(model_file=model_path, session=create_session(model_path, "face_swapper"))
+                MODEL_LOAD_SECONDS.labels("face_swapper").set(time.perf_counter() - start)
                 logging.info(f"✅ Face swapper chargé avec succès")
             except Exception as e:
                 logging.error(f"❌ Erreur chargement face swapper: {e}")
@@ -38,8 +53,12 @@ def get_face_swapper() -> Any:
     return FACE_SWAPPER
 
 
-def swap_face(source_face: Any, target_face: Any, temp_frame: np.ndarray) -> np.ndarray:
-    """Effectue le swap de visage entre source et target"""
+def swap_face(
+    source_face: Any, target_face: Any, temp_frame: np.ndarray, mouth_mask: Optional[bool] = None
+) -> np.ndarray:
+    """Effectue le swap de visage entre source et target (mouth_mask None : core.globals)"""
+    if mouth_mask is None:
+        mouth_mask = core.globals.mouth_mask
     face_swapper = get_face_swapper()
     if face_swapper is None:
         logging.warning("Face swapper non disponible, retour frame originale")
@@ -48,24 +67,26 @@ def swap_face(source_face: Any, target_face: Any, temp_frame: np.ndarray) -> np.
     try:
         logging.debug(f"Swap en cours - Frame shape: {temp_frame.shape}")
         # Apply the face swap
-        swapped_frame = face_swapper.get(
-            temp_frame, target_face, source_face, paste_back=True
-        )
+        with STAGE_SECONDS.labels("swap").time():
+            swapped_frame = face_swapper.get(
+                temp_frame, target_face, source_face, paste_back=True
+            )
         logging.debug(f"Swap effectué - Result shape: {swapped_frame.shape}")
 
-        if core.globals.mouth_mask:
-            # Create a mask for the target face
-            face_mask = create_face_mask(target_face, temp_frame)
+        if mouth_mask:
+            with STAGE_SECONDS.labels("mouth_mask").time():
+                # Create a mask for the target face
+                face_mask = create_face_mask(target_face, temp_frame)
 
-            # Create the mouth mask
-            mouth_mask, mouth_cutout, mouth_box, lower_lip_polygon = (
-                create_lower_mouth_mask(target_face, temp_frame)
-            )
+                # Create the mouth mask
+                _, mouth_cutout, mouth_box, lower_lip_polygon = (
+                    create_lower_mouth_mask(target_face, temp_frame)
+                )
 
-            # Apply the mouth area
-            swapped_frame = apply_mouth_area(
-                swapped_frame, mouth_cutout, mouth_box, face_mask, lower_lip_polygon
-            )
+                # Apply the mouth area
+                swapped_frame = apply_mouth_area(
+                    swapped_frame, mouth_cutout, mouth_box, face_mask, lower_lip_polygon
+                )
 
         return swapped_frame
     except Exception as e:
@@ -73,58 +94,271 @@ def swap_face(source_face: Any, target_face: Any, temp_frame: np.ndarray) -> np.
         return temp_frame
 
 
+def supports_batch(face_swapper: Any) -> bool:
+    """Vrai si le modèle accepte une dimension de batch dynamique"""
+    batch_dim = face_swapper.session.get_inputs()[0].shape[0]
+    return not isinstance(batch_dim, int)
+
+
+def get_source_latent(face_swapper: Any, source_face: Any) -> np.ndarray:
+    """Projection de l'embedding source dans l'espace latent du swapper"""
+    latent = source_face.normed_embedding.reshape((1, -1))
+    latent = np.dot(latent, face_swapper.emap)
+    latent /= np.linalg.norm(latent)
+    return latent.astype(np.float32)
+
+
+def run_swapper(face_swapper: Any, blob: np.ndarray, latent: np.ndarray) -> np.ndarray:
+    """Inférence du swapper ; une ligne à la fois si le modèle a un batch fixe"""
+    if len(blob) > 1 and not supports_batch(face_swapper):
+        return np.concatenate([
+            run_swapper(face_swapper, blob[i:i + 1], latent[i:i + 1]) for i in range(len(blob))
+        ])
+    return face_swapper.session.run(
+        face_swapper.output_names,
+        {face_swapper.input_names[0]: blob, face_swapper.input_names[1]: latent}
+    )[0]
+
+
+def swap_batch(requests: List[tuple]) -> List[np.ndarray]:
+    """
+    Swap d'un lot de requêtes (blob [n,3,128,128], latents [n,512]) venant
+    de plusieurs sessions : concaténées en un appel ONNX, sorties
+    redécoupées par requête.
+    """
+    face_swapper = get_face_swapper()
+    if len(requests) == 1:
+        return [run_swapper(face_swapper, *requests[0])]
+    pred = run_swapper(
+        face_swapper,
+        np.concatenate([blob for blob, _ in requests]),
+        np.concatenate([latent for _, latent in requests]),
+    )
+    return np.split(pred, np.cumsum([len(blob) for blob, _ in requests])[:-1])
+
+
+def get_swap_batcher() -> Any:
+    """Micro-batcher du swapper partagé par les sessions (None si désactivé)"""
+    from core.batching import get_batcher
+    return get_batcher("face_swapper", swap_batch)
+
+
+def swap_faces(
+    source_face: Any, target_faces: List[Any], temp_frame: np.ndarray, mouth_mask: Optional[bool] = None
+) -> np.ndarray:
+    """
+    Swap de plusieurs visages en une seule inférence [N,3,128,128]. Avec le
+    micro-batching, les visages de la frame rejoignent ceux des autres
+    sessions dans le même appel. Repli sur swap_face() visage par visage si
+    le modèle a un batch fixe et que le micro-batching est désactivé.
+    """
+    if mouth_mask is None:
+        mouth_mask = core.globals.mouth_mask
+    face_swapper = get_face_swapper()
+    batcher = get_swap_batcher() if face_swapper is not None else None
+    if not target_faces or face_swapper is None or (
+        batcher is None and (len(target_faces) < 2 or not supports_batch(face_swapper))
+    ):
+        for target_face in target_faces:
+            temp_frame = swap_face(source_face, target_face, temp_frame, mouth_mask)
+        return temp_frame
+
+    try:
+        swap_start = time.perf_counter()
+        input_size = face_swapper.input_size[0]
+        aligned = [face_align.norm_crop2(temp_frame, face.kps, input_size) for face in target_faces]
+        crops = [crop for crop, _ in aligned]
+        blob = cv2.dnn.blobFromImages(
+            crops, 1.0 / face_swapper.input_std, face_swapper.input_size,
+            (face_swapper.input_mean,) * 3, swapRB=True
+        )
+        latent = np.repeat(get_source_latent(face_swapper, source_face), len(crops), axis=0)
+        if batcher is not None:
+            pred = batcher.submit((blob, latent))
+        else:
+            pred = run_swapper(face_swapper, blob, latent)
+        fakes = np.clip(255 * pred.transpose((0, 2, 3, 1)), 0, 255).astype(np.uint8)[..., ::-1]
+
+        # Composition de tous les visages en une passe, chacun dans sa ROI
+        swapped_frame = temp_frame.copy()
+        for (crop, matrix), fake in zip(aligned, fakes):
+            paste_back(swapped_frame, fake, crop.shape[:2], matrix)
+        STAGE_SECONDS.labels("swap").observe(time.perf_counter() - swap_start)
+
+        if mouth_mask:
+            with STAGE_SECONDS.labels("mouth_mask").time():
+                for target_face in target_faces:
+                    face_mask = create_face_mask(target_face, temp_frame)
+                    _, mouth_cutout, mouth_box, lower_lip_polygon = (
+                        create_lower_mouth_mask(target_face, temp_frame)
+                    )
+                    swapped_frame = apply_mouth_area(
+                        swapped_frame, mouth_cutout, mouth_box, face_mask, lower_lip_polygon
+                    )
+        return swapped_frame
+    except Exception as e:
+        logging.error(f"Erreur lors du swap batché: {e}")
+        return temp_frame
+
+
+def paste_back(frame: np.ndarray, bgr_fake: np.ndarray, crop_shape: tuple, matrix: np.ndarray) -> None:
+    """
+    Recolle un visage swappé dans la frame, en place. Même masque que
+    INSwapper.get(paste_back=True) (érosion + flou), mais calculé dans la
+    ROI du visage plutôt que sur toute la frame.
+    """
+    crop_h, crop_w = crop_shape
+    inverse = cv2.invertAffineTransform(matrix)
+    corners = np.array([[[0, 0]], [[crop_w, 0]], [[0, crop_h]], [[crop_w, crop_h]]], dtype=np.float32)
+    corners = cv2.transform(corners, inverse).reshape(-1, 2)
+    (min_x, min_y), (max_x, max_y) = corners.min(axis=0), corners.max(axis=0)
+
+    # Marge suffisante pour que l'érosion et le flou se comportent comme en pleine frame
+    mask_size = int(np.sqrt(max(max_x - min_x, 1) * max(max_y - min_y, 1)))
+    margin = max(mask_size // 10, 10) + 2 * max(mask_size // 20, 5) + 2
+    x1 = max(0, int(min_x) - margin)
+    y1 = max(0, int(min_y) - margin)
+    x2 = min(frame.shape[1], int(np.ceil(max_x)) + margin)
+    y2 = min(frame.shape[0], int(np.ceil(max_y)) + margin)
+    if x2 <= x1 or y2 <= y1:
+        return
+
+    inverse[:, 2] -= (x1, y1)
+    roi_size = (x2 - x1, y2 - y1)
+    roi_shape = (y2 - y1, x2 - x1)
+    fake_roi = cv2.warpAffine(
+        bgr_fake, inverse, roi_size, dst=get_scratch("paste_fake", roi_shape + bgr_fake.shape[2:]), borderValue=0.0
+    )
+    white = get_scratch("paste_white", (crop_h, crop_w))
+    white.fill(255)
+    img_mask = cv2.warpAffine(white, inverse, roi_size, dst=get_scratch("paste_mask", roi_shape), borderValue=0)
+    # Les bords interpolés (<= 20) disparaissent de toute façon à l'érosion
+    cv2.threshold(img_mask, 20, 255, cv2.THRESH_BINARY, dst=img_mask)
+
+    _, _, mask_w, mask_h = cv2.boundingRect(img_mask)
+    if mask_w == 0:
+        return
+    mask_size = int(np.sqrt((mask_h - 1) * (mask_w - 1)))
+    k = max(mask_size // 10, 10)
+    cv2.erode(img_mask, np.ones((k, k), np.uint8), dst=img_mask, iterations=1)
+    # Flou en float32 : le flou 8 bits d'OpenCV est plus lent sur ces noyaux
+    blurred = get_scratch("paste_blurred", roi_shape, np.float32)
+    np.copyto(blurred, img_mask)
+    k = max(mask_size // 20, 5)
+    cv2.GaussianBlur(blurred, (2 * k + 1, 2 * k + 1), 0, dst=blurred)
+    cv2.convertScaleAbs(blurred, dst=img_mask)
+
+    blend_roi(frame[y1:y2, x1:x2], fake_roi, img_mask)
+
+
+def blend_roi(roi: np.ndarray, src: np.ndarray, alpha: np.ndarray) -> None:
+    """
+    Mélange alpha en place : roi = src * a + roi * (1 - a), avec `alpha`
+    uint8 (255 = src) d'un seul canal. Calcul en virgule fixe uint16 dans
+    des buffers réutilisés : aucune allocation ni passage en flottant.
+    Noyau commun à tous les mélanges masqués du module.
+    """
+    shape = roi.shape
+    if roi.ndim == 3:
+        alpha = alpha[:, :, np.newaxis]
+    weight = get_scratch("blend_weight", alpha.shape, np.uint16)
+    acc = get_scratch("blend_acc", shape, np.uint16)
+    tmp = get_scratch("blend_tmp", shape, np.uint16)
+
+    # src * a + roi * (255 - a) <= 255 * 255 : tient sur 16 bits
+    np.multiply(src, alpha, out=acc, dtype=np.uint16)
+    np.subtract(255, alpha, out=weight, dtype=np.uint16)
+    np.multiply(roi, weight, out=tmp, dtype=np.uint16)
+    acc += tmp
+    # Division arrondie par 255 : (x + 128 + ((x + 128) >> 8)) >> 8, exacte sur [0, 255 * 255]
+    acc += 128
+    np.right_shift(acc, 8, out=tmp)
+    acc += tmp
+    acc >>= 8
+    np.copyto(roi, acc, casting='unsafe')
+
+
+def process_context(context: FrameContext) -> None:
+    """Swap des visages du contexte (les pixels changent, pas la géométrie)"""
+    if context.source_face is None:
+        return
+    target_faces = context.faces
+    if target_faces:
+        with context.time(NAME):
+            mouth_mask = context.options.get("mouth_mask", core.globals.mouth_mask)
+            context.set_frame(swap_faces(context.source_face, target_faces, context.frame, mouth_mask))
+
+
 def process_frame(source_face: Any, temp_frame: np.ndarray) -> np.ndarray:
     """Traite une frame avec face swap"""
-    from core.face_analyser import get_one_face, get_many_faces
-    
-    if source_face is None:
-        return temp_frame
+    context = FrameContext(temp_frame, source_face)
+    process_context(context)
+    return context.frame
 
-    if core.globals.many_faces:
-        many_faces = get_many_faces(temp_frame)
-        if many_faces:
-            for target_face in many_faces:
-                if target_face:
-                    temp_frame = swap_face(source_face, target_face, temp_frame)
-    else:
-        target_face = get_one_face(temp_frame)
-        if target_face:
-            temp_frame = swap_face(source_face, target_face, temp_frame)
-    
-    return temp_frame
+
+def get_source_face(source_path: str) -> Any:
+    """Visage de l'image source, analysé une fois par chemin (par processus)"""
+    global SOURCE_FACE
+    from core.face_analyser import get_one_face
+
+    with THREAD_LOCK:
+        path, face = SOURCE_FACE
+        if path != source_path:
+            face = get_one_face(cv2.imread(source_path), profile='source')
+            if face is None:
+                logging.warning(f"Aucun visage dans l'image source: {source_path}")
+            SOURCE_FACE = (source_path, face)
+    return face
+
+
+def process_frames(source_path: str, temp_frame_paths: List[str], progress: Any = None) -> None:
+    """
+    Traite des frames sur disque (réécrites en place). Fonction de module :
+    elle est transmise aux workers du backend processus.
+    """
+    source_face = get_source_face(source_path)
+    for temp_frame_path in temp_frame_paths:
+        temp_frame = cv2.imread(temp_frame_path)
+        if temp_frame is None:
+            logging.error(f"Frame illisible: {temp_frame_path}")
+        else:
+            cv2.imwrite(temp_frame_path, process_frame(source_face, temp_frame))
+        if progress is not None:
+            progress.update(1)
+
+
+def process_video(source_path: str, temp_frame_paths: List[str]) -> None:
+    """Traite les frames extraites d'une vidéo (backend de core.globals.execution_backend)"""
+    from core.processors.frame.core import process_video as process_video_frames
+    process_video_frames(source_path, temp_frame_paths, process_frames)
 
 
 def create_lower_mouth_mask(face: Any, frame: np.ndarray) -> tuple:
-    """Crée un masque pour la bouche inférieure"""
-    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+    """
+    Crée un masque pour la bouche inférieure.
+    Le masque retourné est local à `mouth_box` (x1, y1, x2, y2).
+    """
+    mask = None
     mouth_cutout = None
     lower_lip_polygon = None
     min_x, min_y, max_x, max_y = 0, 0, 1, 1
     
     landmarks = face.landmark_2d_106
     if landmarks is not None:
-        lower_lip_order = [
-            65, 66, 62, 70, 69, 18, 19, 20, 21, 22, 23, 24, 0, 8, 7, 6, 5, 4, 3, 2, 65,
-        ]
-        lower_lip_landmarks = landmarks[lower_lip_order].astype(np.float32)
+        lower_lip_landmarks = landmarks[LOWER_LIP_ORDER].astype(np.float32)
 
         center = np.mean(lower_lip_landmarks, axis=0)
         expansion_factor = 1 + core.globals.mask_down_size
         expanded_landmarks = (lower_lip_landmarks - center) * expansion_factor + center
 
-        toplip_indices = [20, 0, 1, 2, 3, 4, 5]
-        toplip_extension = core.globals.mask_size * 0.5
-        for idx in toplip_indices:
-            direction = expanded_landmarks[idx] - center
-            direction = direction / np.linalg.norm(direction)
-            expanded_landmarks[idx] += direction * toplip_extension
+        direction = expanded_landmarks[TOPLIP_INDICES] - center
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        expanded_landmarks[TOPLIP_INDICES] += direction * (core.globals.mask_size * 0.5)
 
-        chin_indices = [11, 12, 13, 14, 15, 16]
         chin_extension = 2 * 0.2
-        for idx in chin_indices:
-            expanded_landmarks[idx][1] += (
-                expanded_landmarks[idx][1] - center[1]
-            ) * chin_extension
+        expanded_landmarks[CHIN_INDICES, 1] += (
+            expanded_landmarks[CHIN_INDICES, 1] - center[1]
+        ) * chin_extension
 
         expanded_landmarks = expanded_landmarks.astype(np.int32)
 
@@ -143,10 +377,11 @@ def create_lower_mouth_mask(face: Any, frame: np.ndarray) -> tuple:
             if (max_y - min_y) <= 1:
                 max_y = min_y + 1
 
-        mask_roi = np.zeros((max_y - min_y, max_x - min_x), dtype=np.uint8)
-        cv2.fillPoly(mask_roi, [expanded_landmarks - [min_x, min_y]], 255)
-        mask_roi = cv2.GaussianBlur(mask_roi, (15, 15), 5)
-        mask[min_y:max_y, min_x:max_x] = mask_roi
+        roi_shape = (max_y - min_y, max_x - min_x)
+        polygon_roi = get_scratch("mouth_polygon", roi_shape)
+        polygon_roi.fill(0)
+        cv2.fillPoly(polygon_roi, [expanded_landmarks - [min_x, min_y]], 255)
+        mask = cv2.GaussianBlur(polygon_roi, (15, 15), 5, dst=get_scratch("mouth_mask", roi_shape))
         mouth_cutout = frame[min_y:max_y, min_x:max_x].copy()
         lower_lip_polygon = expanded_landmarks
 
@@ -157,10 +392,10 @@ def apply_mouth_area(
     frame: np.ndarray,
     mouth_cutout: np.ndarray,
     mouth_box: tuple,
-    face_mask: np.ndarray,
+    face_mask: tuple,
     mouth_polygon: np.ndarray,
 ) -> np.ndarray:
-    """Applique le masque de bouche"""
+    """Applique le masque de bouche (`face_mask` : (masque, box) de create_face_mask)"""
     min_x, min_y, max_x, max_y = mouth_box
     box_width = max_x - min_x
     box_height = max_y - min_y
@@ -175,17 +410,17 @@ def apply_mouth_area(
         return frame
 
     try:
-        resized_mouth_cutout = cv2.resize(mouth_cutout, (box_width, box_height))
         roi = frame[min_y:max_y, min_x:max_x]
+        roi_shape = roi.shape[:2]
+        if mouth_cutout.shape[:2] != roi_shape:
+            mouth_cutout = cv2.resize(mouth_cutout, (roi_shape[1], roi_shape[0]))
 
-        if roi.shape != resized_mouth_cutout.shape:
-            resized_mouth_cutout = cv2.resize(
-                resized_mouth_cutout, (roi.shape[1], roi.shape[0])
-            )
-
-        color_corrected_mouth = apply_color_transfer(resized_mouth_cutout, roi)
+        color_corrected_mouth = apply_color_transfer(
+            mouth_cutout, roi, dst=get_scratch("mouth_area_color", roi.shape)
+        )
 
-        polygon_mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+        polygon_mask = get_scratch("mouth_area_polygon", roi_shape)
+        polygon_mask.fill(0)
         adjusted_polygon = mouth_polygon - [min_x, min_y]
         cv2.fillPoly(polygon_mask, [adjusted_polygon], 255)
 
@@ -194,99 +429,127 @@ def apply_mouth_area(
             box_width // core.globals.mask_feather_ratio,
             box_height // core.globals.mask_feather_ratio,
         )
-        feathered_mask = cv2.GaussianBlur(
-            polygon_mask.astype(float), (0, 0), feather_amount
+        feathered_mask = get_scratch("mouth_area_feathered", roi_shape, np.float32)
+        np.copyto(feathered_mask, polygon_mask)
+        cv2.GaussianBlur(feathered_mask, (0, 0), feather_amount, dst=feathered_mask)
+        peak = cv2.minMaxLoc(feathered_mask)[1]
+        if peak <= 0:
+            return frame
+        alpha = cv2.convertScaleAbs(
+            feathered_mask, dst=get_scratch("mouth_area_alpha", roi_shape), alpha=255 / peak
         )
-        feathered_mask = feathered_mask / feathered_mask.max()
-
-        face_mask_roi = face_mask[min_y:max_y, min_x:max_x]
-        combined_mask = feathered_mask * (face_mask_roi / 255.0)
 
-        combined_mask = combined_mask[:, :, np.newaxis]
-        blended = (
-            color_corrected_mouth * combined_mask + roi * (1 - combined_mask)
-        ).astype(np.uint8)
-
-        face_mask_3channel = (
-            np.repeat(face_mask_roi[:, :, np.newaxis], 3, axis=2) / 255.0
+        # Bouche mélangée au visage (plume * visage), puis visage mélangé à
+        # la frame : un seul mélange de poids plume * visage²
+        face_mask_roi = crop_mask(face_mask, (min_x, min_y, min_x + roi_shape[1], min_y + roi_shape[0]))
+        weight = cv2.multiply(
+            face_mask_roi, face_mask_roi, dst=get_scratch("mouth_area_weight", roi_shape), scale=1 / 255
         )
-        final_blend = blended * face_mask_3channel + roi * (1 - face_mask_3channel)
+        cv2.multiply(alpha, weight, dst=alpha, scale=1 / 255)
 
-        frame[min_y:max_y, min_x:max_x] = final_blend.astype(np.uint8)
+        blend_roi(roi, color_corrected_mouth, alpha)
     except Exception as e:
         logging.debug(f"Erreur lors de l'application du masque de bouche: {e}")
 
     return frame
 
 
-def create_face_mask(face: Any, frame: np.ndarray) -> np.ndarray:
-    """Crée un masque pour le visage"""
-    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+def crop_mask(mask_roi: tuple, box: tuple) -> np.ndarray:
+    """Extrait la zone `box` d'un masque local (masque, box), à zéro hors du masque"""
+    mask, (mask_x1, mask_y1, mask_x2, mask_y2) = mask_roi
+    x1, y1, x2, y2 = box
+    out = get_scratch("crop_mask", (y2 - y1, x2 - x1))
+    out.fill(0)
+    ix1, iy1 = max(x1, mask_x1), max(y1, mask_y1)
+    ix2, iy2 = min(x2, mask_x2), min(y2, mask_y2)
+    if ix2 > ix1 and iy2 > iy1:
+        out[iy1 - y1:iy2 - y1, ix1 - x1:ix2 - x1] = mask[iy1 - mask_y1:iy2 - mask_y1, ix1 - mask_x1:ix2 - mask_x1]
+    return out
+
+
+def create_face_mask(face: Any, frame: np.ndarray) -> tuple:
+    """
+    Crée un masque pour le visage, limité à sa bounding box.
+    Retourne (masque, (x1, y1, x2, y2)), ou None sans landmarks.
+    """
     landmarks = face.landmark_2d_106
-    if landmarks is not None:
-        landmarks = landmarks.astype(np.int32)
-
-        right_side_face = landmarks[0:16]
-        left_side_face = landmarks[17:32]
-        right_eye_brow = landmarks[43:51]
-        left_eye_brow = landmarks[97:105]
-
-        right_eyebrow_top = np.min(right_eye_brow[:, 1])
-        left_eyebrow_top = np.min(left_eye_brow[:, 1])
-        eyebrow_top = min(right_eyebrow_top, left_eyebrow_top)
-
-        face_top = np.min([right_side_face[0, 1], left_side_face[-1, 1]])
-        forehead_height = face_top - eyebrow_top
-        extended_forehead_height = int(forehead_height * 5.0)
-
-        forehead_left = right_side_face[0].copy()
-        forehead_right = left_side_face[-1].copy()
-        forehead_left[1] -= extended_forehead_height
-        forehead_right[1] -= extended_forehead_height
-
-        face_outline = np.vstack(
-            [
-                [forehead_left],
-                right_side_face,
-                left_side_face[::-1],
-                [forehead_right],
-            ]
-        )
-
-        padding = int(
-            np.linalg.norm(right_side_face[0] - left_side_face[-1]) * 0.05
-        )
-
-        hull = cv2.convexHull(face_outline)
-        hull_padded = []
-        for point in hull:
-            x, y = point[0]
-            center = np.mean(face_outline, axis=0)
-            direction = np.array([x, y]) - center
-            direction = direction / np.linalg.norm(direction)
-            padded_point = np.array([x, y]) + direction * padding
-            hull_padded.append(padded_point)
-
-        hull_padded = np.array(hull_padded, dtype=np.int32)
-        cv2.fillConvexPoly(mask, hull_padded, 255)
-        mask = cv2.GaussianBlur(mask, (5, 5), 3)
-
-    return mask
-
-
-def apply_color_transfer(source: np.ndarray, target: np.ndarray) -> np.ndarray:
-    """Applique le transfert de couleur de target vers source"""
-    source = cv2.cvtColor(source, cv2.COLOR_BGR2LAB).astype("float32")
-    target = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype("float32")
-
-    source_mean, source_std = cv2.meanStdDev(source)
-    target_mean, target_std = cv2.meanStdDev(target)
-
-    source_mean = source_mean.reshape(1, 1, 3)
-    source_std = source_std.reshape(1, 1, 3)
-    target_mean = target_mean.reshape(1, 1, 3)
-    target_std = target_std.reshape(1, 1, 3)
-
-    source = (source - source_mean) * (target_std / source_std) + target_mean
-
-    return cv2.cvtColor(np.clip(source, 0, 255).astype("uint8"), cv2.COLOR_LAB2BGR)
+    if landmarks is None:
+        return None
+
+    landmarks = landmarks.astype(np.int32)
+
+    right_side_face = landmarks[0:16]
+    left_side_face = landmarks[17:32]
+    right_eye_brow = landmarks[43:51]
+    left_eye_brow = landmarks[97:105]
+
+    right_eyebrow_top = np.min(right_eye_brow[:, 1])
+    left_eyebrow_top = np.min(left_eye_brow[:, 1])
+    eyebrow_top = min(right_eyebrow_top, left_eyebrow_top)
+
+    face_top = np.min([right_side_face[0, 1], left_side_face[-1, 1]])
+    forehead_height = face_top - eyebrow_top
+    extended_forehead_height = int(forehead_height * 5.0)
+
+    forehead_left = right_side_face[0].copy()
+    forehead_right = left_side_face[-1].copy()
+    forehead_left[1] -= extended_forehead_height
+    forehead_right[1] -= extended_forehead_height
+
+    face_outline = np.vstack(
+        [
+            [forehead_left],
+            right_side_face,
+            left_side_face[::-1],
+            [forehead_right],
+        ]
+    )
+
+    padding = int(
+        np.linalg.norm(right_side_face[0] - left_side_face[-1]) * 0.05
+    )
+
+    # Agrandit l'enveloppe convexe depuis le centre du contour
+    hull = cv2.convexHull(face_outline).reshape(-1, 2)
+    direction = hull - np.mean(face_outline, axis=0)
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    hull_padded = (hull + direction * padding).astype(np.int32)
+
+    # ROI = enveloppe + marge du flou, bornée à la frame
+    margin = 3
+    min_x, min_y = np.maximum(hull_padded.min(axis=0) - margin, 0)
+    max_x = min(frame.shape[1], hull_padded[:, 0].max() + margin + 1)
+    max_y = min(frame.shape[0], hull_padded[:, 1].max() + margin + 1)
+    if max_x <= min_x or max_y <= min_y:
+        return None
+
+    roi_shape = (max_y - min_y, max_x - min_x)
+    polygon_roi = get_scratch("face_polygon", roi_shape)
+    polygon_roi.fill(0)
+    cv2.fillConvexPoly(polygon_roi, hull_padded - [min_x, min_y], 255)
+    mask = cv2.GaussianBlur(polygon_roi, (5, 5), 3, dst=get_scratch("face_mask", roi_shape))
+
+    return mask, (int(min_x), int(min_y), int(max_x), int(max_y))
+
+
+def apply_color_transfer(source: np.ndarray, target: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Applique le transfert de couleur de target vers source (moyenne et
+    écart-type de chaque canal LAB). Les statistiques sont calculées en une
+    passe sur le LAB 8 bits et la transformation affine de chaque canal est
+    appliquée par table de correspondance, sans image flottante.
+    """
+    source_lab = cv2.cvtColor(source, cv2.COLOR_BGR2LAB, dst=get_scratch("color_transfer_source", source.shape))
+    target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB, dst=get_scratch("color_transfer_target", target.shape))
+
+    source_mean, source_std = cv2.meanStdDev(source_lab)
+    target_mean, target_std = cv2.meanStdDev(target_lab)
+
+    # Canal uniforme (écart-type nul) : simple décalage de la moyenne
+    scale = np.divide(target_std, source_std, out=np.ones_like(target_std), where=source_std > 0)
+    values = np.arange(256, dtype=np.float64)[:, np.newaxis]
+    lut = (values - source_mean.T) * scale.T + target_mean.T
+    lut = np.clip(lut, 0, 255).astype(np.uint8).reshape(256, 1, 3)
+
+    cv2.LUT(source_lab, lut, dst=source_lab)
+    return cv2.cvtColor(source_lab, cv2.COLOR_LAB2BGR, dst=dst)
@@ -0,0 +1,126 @@
+"""
+DeepFake MIA - Qualité adaptative
+Ajuste les réglages du flux live pour tenir un FPS cible
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class QualityController:
+    """
+    Échelle de niveaux de qualité (0 = meilleur) parcourue selon le temps
+    mesuré par frame (moyenne glissante du plus lent des étages inférence /
+    encodage, qui fixe le débit du pipeline).
+
+    Hystérésis :
+    - on descend d'un niveau quand la moyenne dépasse le budget
+      × `downgrade_ratio` pendant `downgrade_frames` frames ;
+    - on remonte quand elle reste sous le budget × `upgrade_ratio` pendant
+      `upgrade_frames` frames ;
+    - après chaque changement, `cooldown_frames` frames sans décision ;
+    - si une remontée est suivie d'une redescente avant la fin de
+      `upgrade_frames`, le délai de remontée double (plafonné à 8×) ;
+      une remontée tenue longtemps le divise de nouveau par deux.
+    """
+
+    def __init__(
+        self,
+        levels: List[Dict[str, Any]],
+        target_fps: float = 20,
+        downgrade_ratio: float = 1.1,
+        upgrade_ratio: float = 0.7,
+        downgrade_frames: int = 10,
+        upgrade_frames: int = 60,
+        cooldown_frames: int = 30,
+        smoothing: float = 0.1,
+        initial_level: int = 0,
+    ):
+        if not levels:
+            raise ValueError("Au moins un niveau de qualité est requis")
+        self.levels = levels
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.downgrade_ratio = downgrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.downgrade_frames = downgrade_frames
+        self.upgrade_frames = upgrade_frames
+        self.cooldown_frames = cooldown_frames
+        self.smoothing = smoothing
+        self.level = min(max(0, initial_level), len(levels) - 1)
+        self.settings = dict(levels[self.level])
+        self.frame_time: Optional[float] = None
+        self.changes = 0
+        self._lock = threading.Lock()
+        self._over = 0
+        self._under = 0
+        self._cooldown = 0
+        self._upgrade_backoff = 1
+        self._since_upgrade: Optional[int] = None
+        self._frame_count = 0
+
+    def observe(self, frame_seconds: float) -> bool:
+        """Enregistre le temps d'une frame ; retourne True si le niveau a changé"""
+        with self._lock:
+            self._frame_count += 1
+            if self.frame_time is None:
+                self.frame_time = frame_seconds
+            else:
+                self.frame_time += self.smoothing * (frame_seconds - self.frame_time)
+            if self._since_upgrade is not None:
+                self._since_upgrade += 1
+                # Remontée tenue assez longtemps : le délai se réduit
+                if self._since_upgrade >= 4 * self.upgrade_frames * self._upgrade_backoff:
+                    self._upgrade_backoff = max(1, self._upgrade_backoff // 2)
+                    self._since_upgrade = None
+
+            if self._cooldown > 0:
+                self._cooldown -= 1
+                return False
+
+            if self.frame_time > self.budget * self.downgrade_ratio:
+                self._over += 1
+                self._under = 0
+            elif self.frame_time < self.budget * self.upgrade_ratio:
+                self._under += 1
+                self._over = 0
+            else:
+                self._over = self._under = 0
+
+            if self._over >= self.downgrade_frames and self.level < len(self.levels) - 1:
+                # Remontée ratée : on attendra plus longtemps la prochaine fois
+                if self._since_upgrade is not None and self._since_upgrade < self.upgrade_frames * self._upgrade_backoff:
+                    self._upgrade_backoff = min(self._upgrade_backoff * 2, 8)
+                self._since_upgrade = None
+                return self._set_level(self.level + 1)
+
+            if self._under >= self.upgrade_frames * self._upgrade_backoff and self.level > 0:
+                self._since_upgrade = 0
+                return self._set_level(self.level - 1)
+            return False
+
+    def should_enhance(self) -> bool:
+        """L'enhancer tourne une frame sur `enhancer_every` (0 = jamais)"""
+        every = self.settings.get("enhancer_every", 1)
+        return every > 0 and self._frame_count % every == 0
+
+    def _set_level(self, level: int) -> bool:
+        self.level = level
+        self.settings = dict(self.levels[level])
+        self.changes += 1
+        self._over = self._under = 0
+        self._cooldown = self.cooldown_frames
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "target_fps": self.target_fps,
+                "level": self.level,
+                "levels": len(self.levels),
+                "settings": dict(self.settings),
+                "frame_ms": round(self.frame_time * 1000, 2) if self.frame_time is not None else None,
+                "budget_ms": round(self.budget * 1000, 2),
+                "changes": self.changes,
+                "upgrade_backoff": self._upgrade_backoff,
+            }
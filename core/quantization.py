@@ -0,0 +1,445 @@
+"""
+DeepFake MIA - Mode CPU INT8
+Variantes INT8 du détecteur et du swapper (quantification statique QDQ,
+calibrée sur des images locales), validation contre les modèles de
+référence et activation conditionnée aux seuils de QUANTIZATION_CONFIG
+
+Usage :
+    python -m core.quantization build [--calibration DIR] [--images DIR]
+    python -m core.quantization validate [--images DIR]
+
+`build` produit les modèles INT8 puis les valide ; `validate` rejoue la
+validation des modèles existants (nouveau jeu d'images, nouveaux seuils).
+Chaque modèle INT8 est accompagné d'un rapport JSON : à l'exécution, il
+n'est chargé que si ce rapport correspond au modèle de référence actuel
+et respecte les seuils configurés.
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import core.globals
+from core.onnx_session import create_session, get_model_hash
+
+QUANTIZED_SUFFIX = '.int8.onnx'
+REPORT_SUFFIX = '.int8.json'
+IMAGE_EXTENSIONS = ('*.png', '*.jpg', '*.jpeg', '*.bmp')
+IOU_THRESHOLD = 0.5
+
+# Modèle quantifiable -> (métrique du rapport, seuil de QUANTIZATION_CONFIG)
+THRESHOLDS = {
+    "detection": ("detection_recall", "MIN_DETECTION_RECALL"),
+    "face_swapper": ("identity_similarity", "MIN_IDENTITY_SIMILARITY"),
+}
+REFUSED_MODELS: Dict[str, str] = {}
+
+
+def get_quantized_paths(model_path: str) -> Tuple[str, str]:
+    """Fichiers INT8 et rapport de validation associés à un modèle de référence"""
+    directory = core.globals.quantization_config["DIR"]
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(directory, stem + QUANTIZED_SUFFIX), os.path.join(directory, stem + REPORT_SUFFIX)
+
+
+def check_report(report: Dict[str, Any], model_path: str, quantized_path: str, config: Dict[str, Any]) -> Optional[str]:
+    """Raison du refus d'un modèle INT8, ou None s'il peut être activé"""
+    if report.get("reference_hash") != get_model_hash(model_path):
+        return "le modèle de référence a changé depuis la validation"
+    if report.get("quantized_hash") != get_model_hash(quantized_path):
+        return "le modèle INT8 a changé depuis la validation"
+    if report.get("faces", 0) < config["MIN_VALIDATION_FACES"]:
+        return f"validé sur {report.get('faces', 0)} visages (minimum {config['MIN_VALIDATION_FACES']})"
+    metric, threshold = THRESHOLDS[report["model"]]
+    value = report.get("metrics", {}).get(metric)
+    if value is None or value < config[threshold]:
+        return f"{metric} = {value} sous le seuil {config[threshold]}"
+    return None
+
+
+def get_active_quantized_model(model_path: str, name: Optional[str]) -> Optional[str]:
+    """
+    Variante INT8 à charger à la place de `model_path`, si le mode est
+    actif (CPU uniquement), le modèle quantifiable et sa validation
+    conforme aux seuils actuels
+    """
+    config = core.globals.quantization_config
+    if not config or not config.get("ENABLED") or name not in config["MODELS"] or name not in THRESHOLDS:
+        return None
+    if 'CUDAExecutionProvider' in core.globals.execution_providers:
+        return None
+
+    quantized_path, report_path = get_quantized_paths(model_path)
+    if not os.path.exists(quantized_path) or not os.path.exists(report_path):
+        reason = "modèle INT8 absent (python -m core.quantization build)"
+    else:
+        try:
+            with open(report_path, 'r') as f:
+                reason = check_report(json.load(f), model_path, quantized_path, config)
+        except (OSError, ValueError, KeyError) as e:
+            reason = f"rapport de validation illisible: {e}"
+    if reason is not None:
+        if REFUSED_MODELS.get(name) != reason:
+            logging.warning(f"Modèle INT8 '{name}' non activé : {reason}")
+            REFUSED_MODELS[name] = reason
+        return None
+    logging.info(f"Modèle INT8 '{name}' activé: {quantized_path}")
+    return quantized_path
+
+
+# ============================================================
+# Production des modèles INT8
+# ============================================================
+
+class RecordingSession:
+    """Session qui conserve les entrées vues (calibration sur le prétraitement réel)"""
+
+    def __init__(self, session: Any, limit: int):
+        self._session = session
+        self._limit = limit
+        self.feeds: List[Dict[str, np.ndarray]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def run(self, output_names: Any, feeds: Dict[str, np.ndarray], *args: Any, **kwargs: Any) -> Any:
+        if len(self.feeds) < self._limit:
+            self.feeds.append({key: np.array(value, copy=True) for key, value in feeds.items()})
+        return self._session.run(output_names, feeds, *args, **kwargs)
+
+
+def float16_to_float32(model: Any) -> Any:
+    """Convertit un modèle fp16 (inswapper_128_fp16) en fp32 pour la quantification"""
+    from onnx import TensorProto, numpy_helper
+
+    def convert_tensor(tensor: Any) -> None:
+        if tensor.data_type == TensorProto.FLOAT16:
+            tensor.CopyFrom(numpy_helper.from_array(numpy_helper.to_array(tensor).astype(np.float32), tensor.name))
+
+    graph = model.graph
+    for initializer in graph.initializer:
+        convert_tensor(initializer)
+    for node in graph.node:
+        for attribute in node.attribute:
+            if node.op_type == 'Cast' and attribute.name == 'to' and attribute.i == TensorProto.FLOAT16:
+                attribute.i = TensorProto.FLOAT
+            if attribute.HasField('t'):
+                convert_tensor(attribute.t)
+    for value in list(graph.input) + list(graph.output) + list(graph.value_info):
+        if value.type.tensor_type.elem_type == TensorProto.FLOAT16:
+            value.type.tensor_type.elem_type = TensorProto.FLOAT
+    return model
+
+
+def quantize_model(model_path: str, output_path: str, feeds: List[Dict[str, np.ndarray]], config: Dict[str, Any]) -> None:
+    """Quantification statique QDQ (poids INT8 par canal, activations UINT8)"""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class FeedsReader(CalibrationDataReader):
+        def __init__(self):
+            self._feeds = iter(feeds)
+
+        def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+            return next(self._feeds, None)
+
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile,
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'float32.onnx')
+        onnx.save(float16_to_float32(onnx.load(model_path)), source_path)
+        prepared_path = os.path.join(work_dir, 'prepared.onnx')
+        try:
+            # Graphes convolutifs : l'inférence de formes ONNX suffit
+            quant_pre_process(source_path, prepared_path, skip_symbolic_shape=True)
+        except Exception as e:
+            logging.warning(f"Pré-traitement de quantification ignoré ({e})")
+            prepared_path = source_path
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        quantize_static(
+            prepared_path,
+            output_path,
+            FeedsReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=config["PER_CHANNEL"],
+            reduce_range=config["REDUCE_RANGE"],
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=methods[config["CALIBRATION_METHOD"]],
+        )
+
+
+def list_images(directory: str) -> List[str]:
+    paths: List[str] = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def load_images(directory: str) -> List[np.ndarray]:
+    images = [cv2.imread(path) for path in list_images(directory)]
+    return [image for image in images if image is not None]
+
+
+def main_faces(faces_per_image: List[List[Any]]) -> List[Any]:
+    """Visage principal de chaque image (None si aucun)"""
+    return [max(faces, key=lambda face: face.det_score) if faces else None for faces in faces_per_image]
+
+
+def iter_swap_pairs(images: List[np.ndarray], faces_per_image: List[List[Any]], targets_per_image: List[List[Any]]) -> Iterable[Tuple[np.ndarray, Any, Any]]:
+    """(image, visage cible, visage principal d'une autre image comme source)"""
+    sources = main_faces(faces_per_image)
+    candidates = [i for i, source in enumerate(sources) if source is not None]
+    if len(candidates) < 2:
+        return
+    for i, image in enumerate(images):
+        source_index = min((j for j in candidates if j > i), default=candidates[0])
+        if source_index == i:
+            source_index = candidates[1]
+        for target in targets_per_image[i]:
+            yield image, target, sources[source_index]
+
+
+def collect_calibration(images: List[np.ndarray], analyser: Any, swapper: Any, limit: int) -> Dict[str, List[Dict[str, np.ndarray]]]:
+    """Entrées réelles du détecteur et du swapper sur les images de calibration"""
+    det_recorder = RecordingSession(analyser.det_model.session, limit)
+    analyser.det_model.session = det_recorder
+    try:
+        faces_per_image = [analyser.get(image) for image in images]
+    finally:
+        analyser.det_model.session = det_recorder._session
+
+    swap_recorder = RecordingSession(swapper.session, limit)
+    swapper.session = swap_recorder
+    try:
+        for image, target_face, source_face in iter_swap_pairs(images, faces_per_image, faces_per_image):
+            swapper.get(image, target_face, source_face, paste_back=False)
+    finally:
+        swapper.session = swap_recorder._session
+    return {"detection": det_recorder.feeds, "face_swapper": swap_recorder.feeds}
+
+
+# ============================================================
+# Validation
+# ============================================================
+
+def box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (box[2] - box[0]) * (box[3] - box[1]) + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(areas - intersection, 1e-6)
+
+
+def detection_recall(reference: List[np.ndarray], candidate: List[np.ndarray]) -> Tuple[float, float, int]:
+    """
+    Part des visages de référence retrouvés (IoU >= 0.5, appariement glouton
+    par image), IoU moyen des visages retrouvés, nombre de visages
+    """
+    found, total, ious = 0, 0, []
+    for reference_boxes, candidate_boxes in zip(reference, candidate):
+        available = np.ones(len(candidate_boxes), dtype=bool)
+        for box in reference_boxes:
+            total += 1
+            if not available.any():
+                continue
+            overlaps = np.where(available, box_iou(box, candidate_boxes[:, :4]), 0.0)
+            best = int(np.argmax(overlaps))
+            if overlaps[best] >= IOU_THRESHOLD:
+                available[best] = False
+                found += 1
+                ious.append(float(overlaps[best]))
+    return (found / total if total else 0.0), (float(np.mean(ious)) if ious else 0.0), total
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+
+
+def timed_mean(func: Any, calls: List[Tuple[Any, ...]]) -> Tuple[List[Any], float]:
+    results, elapsed = [], 0.0
+    for args in calls:
+        start = time.perf_counter()
+        results.append(func(*args))
+        elapsed += time.perf_counter() - start
+    return results, (elapsed / len(calls) * 1000 if calls else 0.0)
+
+
+def validate_detection(images: List[np.ndarray], reference: Any, quantized: Any, det_size: Tuple[int, int]) -> Dict[str, Any]:
+    calls = [(image, det_size) for image in images]
+    reference_results, reference_ms = timed_mean(lambda image, size: reference.detect(image, input_size=size)[0], calls)
+    quantized_results, quantized_ms = timed_mean(lambda image, size: quantized.detect(image, input_size=size)[0], calls)
+    recall, mean_iou, faces = detection_recall(reference_results, quantized_results)
+    return {
+        "faces": faces,
+        "metrics": {"detection_recall": round(recall, 4), "mean_iou": round(mean_iou, 4)},
+        "timings_ms": {"reference": round(reference_ms, 2), "quantized": round(quantized_ms, 2)},
+    }
+
+
+def validate_swapper(pairs: List[Tuple[np.ndarray, Any, Any]], reference: Any, quantized: Any, recognizer: Any) -> Dict[str, Any]:
+    """
+    Similarité d'identité (ArcFace de référence) entre le visage échangé par
+    le swapper INT8 et celui du swapper de référence, au même endroit
+    """
+    from core.typing import Face
+
+    calls = [(image, target, source) for image, target, source in pairs]
+    reference_frames, reference_ms = timed_mean(lambda *args: reference.get(*args, paste_back=True), calls)
+    quantized_frames, quantized_ms = timed_mean(lambda *args: quantized.get(*args, paste_back=True), calls)
+
+    identity, source_reference, source_quantized = [], [], []
+    for (_, target, source), reference_frame, quantized_frame in zip(pairs, reference_frames, quantized_frames):
+        reference_embedding = recognizer.get(reference_frame, Face(d=dict(target)))
+        quantized_embedding = recognizer.get(quantized_frame, Face(d=dict(target)))
+        identity.append(cosine(quantized_embedding, reference_embedding))
+        source_reference.append(cosine(reference_embedding, source.embedding))
+        source_quantized.append(cosine(quantized_embedding, source.embedding))
+    return {
+        "faces": len(pairs),
+        "metrics": {
+            "identity_similarity": round(float(np.mean(identity)), 4) if identity else 0.0,
+            "identity_similarity_min": round(float(np.min(identity)), 4) if identity else 0.0,
+            "source_similarity_reference": round(float(np.mean(source_reference)), 4) if identity else 0.0,
+            "source_similarity_quantized": round(float(np.mean(source_quantized)), 4) if identity else 0.0,
+        },
+        "timings_ms": {"reference": round(reference_ms, 2), "quantized": round(quantized_ms, 2)},
+    }
+
+
+# ============================================================
+# Outil en ligne de commande
+# ============================================================
+
+def load_reference_models(det_size: Tuple[int, int]) -> Tuple[Any, Any, str, str]:
+    """Analyseur (détection + reconnaissance) et swapper de référence, sans INT8"""
+    from core.face_analyser import create_analyser
+    from core.processors.frame.face_swapper import get_face_swapper
+
+    analyser = create_analyser(["detection", "recognition"], quantize=False)
+    analyser.prepare(ctx_id=0, det_size=det_size)
+    swapper = get_face_swapper()
+    if swapper is None:
+        raise RuntimeError("Swapper de référence introuvable (models/inswapper_128_fp16.onnx)")
+    return analyser, swapper, analyser.det_model.model_file, swapper.model_file
+
+
+def load_quantized_model(name: str, reference_path: str, det_size: Tuple[int, int]) -> Any:
+    """Modèle insightface sur la session INT8 (le fichier de référence reste lu pour ses constantes)"""
+    from insightface.model_zoo.inswapper import INSwapper
+    from insightface.model_zoo.retinaface import RetinaFace
+
+    quantized_path, _ = get_quantized_paths(reference_path)
+    session = create_session(quantized_path, None)
+    if name == "detection":
+        model = RetinaFace(model_file=reference_path, session=session)
+        model.prepare(ctx_id=0, input_size=det_size, det_thresh=0.5)
+        return model
+    return INSwapper(model_file=reference_path, session=session)
+
+
+def write_report(name: str, reference_path: str, result: Dict[str, Any], images: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    import onnxruntime
+
+    quantized_path, report_path = get_quantized_paths(reference_path)
+    metric, threshold = THRESHOLDS[name]
+    report = dict(
+        result,
+        model=name,
+        reference=reference_path,
+        reference_hash=get_model_hash(reference_path),
+        quantized_hash=get_model_hash(quantized_path),
+        onnxruntime=onnxruntime.__version__,
+        created=datetime.datetime.now().isoformat(timespec='seconds'),
+        images=images,
+        thresholds={threshold: config[threshold], "MIN_VALIDATION_FACES": config["MIN_VALIDATION_FACES"]},
+    )
+    report["passed"] = check_report(report, reference_path, quantized_path, config) is None
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def validate_all(images: List[np.ndarray], analyser: Any, swapper: Any, paths: Dict[str, str], det_size: Tuple[int, int], config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    reports = []
+    for name in config["MODELS"]:
+        if not os.path.exists(get_quantized_paths(paths[name])[0]):
+            logging.warning(f"Pas de modèle INT8 pour '{name}'")
+            continue
+        quantized = load_quantized_model(name, paths[name], det_size)
+        if name == "detection":
+            result = validate_detection(images, analyser.det_model, quantized, det_size)
+        else:
+            faces_per_image = [analyser.get(image) for image in images]
+            pairs = list(iter_swap_pairs(images, faces_per_image, faces_per_image))
+            result = validate_swapper(pairs, swapper, quantized, analyser.models['recognition'])
+        reports.append(write_report(name, paths[name], result, len(images), config))
+    return reports
+
+
+def main() -> None:
+    from config import (
+        ANALYSER_PROFILES, EXECUTION_THREADS, ONNX_CACHE_DIR, ONNX_SESSION_CONFIG, QUANTIZATION_CONFIG
+    )
+
+    parser = argparse.ArgumentParser(description="Modèles INT8 pour l'inférence CPU")
+    parser.add_argument('command', choices=['build', 'validate'])
+    parser.add_argument('--calibration', default=QUANTIZATION_CONFIG["CALIBRATION_DIR"], help="Images de calibration")
+    parser.add_argument('--images', default=QUANTIZATION_CONFIG["VALIDATION_DIR"], help="Images de validation")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Référence fp32/fp16 sur CPU : l'INT8 n'est jamais substitué ici
+    config = dict(QUANTIZATION_CONFIG)
+    core.globals.execution_providers = ['CPUExecutionProvider']
+    core.globals.execution_threads = EXECUTION_THREADS
+    core.globals.session_config = ONNX_SESSION_CONFIG
+    core.globals.onnx_cache_dir = ONNX_CACHE_DIR
+    core.globals.quantization_config = dict(config, ENABLED=False)
+
+    det_size = tuple(ANALYSER_PROFILES["target"]["det_size"])
+    analyser, swapper, det_path, swapper_path = load_reference_models(det_size)
+    paths = {"detection": det_path, "face_swapper": swapper_path}
+
+    if args.command == 'build':
+        calibration_images = load_images(args.calibration)
+        if not calibration_images:
+            raise SystemExit(f"Aucune image de calibration dans {args.calibration}")
+        feeds = collect_calibration(calibration_images, analyser, swapper, config["CALIBRATION_SAMPLES"])
+        for name in config["MODELS"]:
+            if not feeds[name]:
+                logging.warning(f"Aucune entrée de calibration pour '{name}'")
+                continue
+            start = time.perf_counter()
+            quantize_model(paths[name], get_quantized_paths(paths[name])[0], feeds[name], config)
+            logging.info(f"'{name}' quantifié ({len(feeds[name])} entrées, {time.perf_counter() - start:.1f} s)")
+
+    images = load_images(args.images)
+    if not images:
+        raise SystemExit(f"Aucune image de validation dans {args.images}")
+    for report in validate_all(images, analyser, swapper, paths, det_size, config):
+        status = "OK" if report["passed"] else "REFUSÉ"
+        print(f"{report['model']:<14} {status:<7} faces={report['faces']:<5} "
+              f"metrics={report['metrics']} timings_ms={report['timings_ms']}")
+
+
+if __name__ == '__main__':
+    main()
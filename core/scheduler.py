@@ -0,0 +1,151 @@
+"""
+DeepFake MIA - Ordonnancement de l'inférence
+Partage équitable du temps d'inférence entre les sessions (bornes) qui
+utilisent les mêmes modèles
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.pipeline import StageStats
+
+
+class SessionShare:
+    """Compteurs d'une session dans l'ordonnanceur"""
+
+    def __init__(self, session_id: str, weight: float = 1.0):
+        self.session_id = session_id
+        self.weight = weight
+        self.vtime = 0.0
+        self.running = 0
+        self.waiting = 0
+        self.busy = 0.0
+        self.waited = 0.0
+        self.last_seen = 0.0
+        self.stats = StageStats(session_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = self.stats.snapshot()
+        return {
+            "weight": self.weight,
+            "frames": stats["processed"],
+            "fps": stats["fps"],
+            "avg_ms": stats["avg_ms"],
+            "avg_wait_ms": round(self.waited / stats["processed"] * 1000, 2) if stats["processed"] else 0.0,
+            "busy_seconds": round(self.busy, 2),
+            "active": bool(self.running or self.waiting),
+        }
+
+
+class FairScheduler:
+    """
+    Au plus `slots` inférences à la fois, toutes sessions confondues. Quand
+    un créneau se libère, il revient à la session en attente qui a consommé
+    le moins de temps d'inférence (temps virtuel = temps consommé / poids) :
+    une session aux frames coûteuses (plusieurs visages, enhancer) n'affame
+    pas les autres, chacune obtient la même part de temps.
+
+    Une session qui arrive ou revient d'une pause (plus de `idle_seconds`
+    sans demander de créneau) repart au plus petit temps virtuel des
+    sessions actives : le temps qu'elle n'a pas consommé pendant son absence
+    ne lui donne pas de priorité.
+    """
+
+    def __init__(self, slots: int = 1, idle_seconds: float = 0.5):
+        self.slots = max(1, slots)
+        self.idle_seconds = idle_seconds
+        self._condition = threading.Condition()
+        self._sessions: Dict[str, SessionShare] = {}
+        self._queue: List[tuple] = []
+        self._sequence = 0
+        self._busy = 0
+
+    def register(self, session_id: str, weight: float = 1.0) -> None:
+        with self._condition:
+            share = self._sessions.get(session_id)
+            if share is None:
+                self._sessions[session_id] = SessionShare(session_id, weight)
+            else:
+                share.weight = weight
+
+    def acquire(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """Attend un créneau ; False au timeout"""
+        start = time.perf_counter()
+        with self._condition:
+            share = self._sessions.get(session_id)
+            if share is None:
+                share = self._sessions[session_id] = SessionShare(session_id)
+            idle = not share.running and not share.waiting
+            if idle and start - share.last_seen > self.idle_seconds:
+                share.vtime = max(share.vtime, self._min_active_vtime(share.vtime))
+            self._sequence += 1
+            ticket = (session_id, self._sequence)
+            self._queue.append(ticket)
+            share.waiting += 1
+            try:
+                granted = self._condition.wait_for(lambda: self._is_next(ticket), timeout)
+            finally:
+                self._queue.remove(ticket)
+                share.waiting -= 1
+            if not granted:
+                self._condition.notify_all()
+                return False
+            self._busy += 1
+            share.running += 1
+            share.waited += time.perf_counter() - start
+            if self._busy < self.slots and self._queue:
+                # Créneau encore libre : le suivant dans la file doit se réveiller
+                self._condition.notify_all()
+            return True
+
+    def release(self, session_id: str, elapsed: float) -> None:
+        """Rend le créneau et impute `elapsed` secondes d'inférence à la session"""
+        with self._condition:
+            self._busy -= 1
+            share = self._sessions.get(session_id)
+            if share is not None:
+                share.last_seen = time.perf_counter()
+                share.running -= 1
+                share.busy += elapsed
+                share.vtime += elapsed / max(share.weight, 1e-6)
+                share.stats.record(elapsed)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str) -> Iterator[None]:
+        """Exécute le bloc pendant le tour de la session"""
+        self.acquire(session_id)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(session_id, time.perf_counter() - start)
+
+    def _is_next(self, ticket: tuple) -> bool:
+        if self._busy >= self.slots:
+            return False
+        # Plus petit temps virtuel, puis ordre d'arrivée
+        best = min(self._queue, key=lambda t: (self._vtime(t[0]), t[1]))
+        return best == ticket
+
+    def _vtime(self, session_id: str) -> float:
+        share = self._sessions.get(session_id)
+        return share.vtime if share is not None else 0.0
+
+    def _min_active_vtime(self, default: float) -> float:
+        active = [s.vtime for s in self._sessions.values() if s.running or s.waiting]
+        return min(active) if active else default
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            shares = list(self._sessions.values())
+            busy, waiting = self._busy, len(self._queue)
+        total = sum(share.busy for share in shares)
+        sessions = {}
+        for share in shares:
+            entry = share.snapshot()
+            entry["share"] = round(share.busy / total, 3) if total else 0.0
+            sessions[share.session_id] = entry
+        return {"slots": self.slots, "busy": busy, "waiting": waiting, "sessions": sessions}
@@ -0,0 +1,108 @@
+"""
+DeepFake MIA - Sessions
+Une session par borne : entrée vidéo, joueur, visage source, options,
+pipeline et tracker propres ; les modèles chargés restent partagés
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from core.typing import Face, Frame
+
+
+class ClientSession:
+    """État d'une borne. Le pipeline et le hub de diffusion sont créés par app.py."""
+
+    def __init__(self, session_id: str, video_input: Union[int, str], options: Dict[str, Any]):
+        self.session_id = session_id
+        self.video_input = video_input
+        self.options = dict(options)
+        self.selected_player: Optional[str] = None
+        self.source_face: Optional[Face] = None
+        self.is_running = False
+        self.pipeline: Any = None
+        self.broadcaster: Any = None
+        self.lock = threading.Lock()
+        self.created_at = time.time()
+        self._tracker: Any = None
+
+    @property
+    def tracker(self) -> Any:
+        """Tracker du flux de la session (créé au premier suivi)"""
+        if self._tracker is None:
+            from core.face_analyser import create_face_tracker
+            self._tracker = create_face_tracker()
+        return self._tracker
+
+    def reset_tracker(self) -> None:
+        if self._tracker is not None:
+            self._tracker.reset()
+
+    def set_detect_interval(self, interval: int) -> None:
+        """Intervalle de détection du tracker existant (un nouveau le lit dans core.globals)"""
+        if self._tracker is not None:
+            self._tracker.detect_interval = max(1, interval)
+
+    def detect(self, frame: Frame) -> List[Face]:
+        """Visages cibles de la frame selon les options de la session"""
+        from core.face_analyser import get_target_faces
+
+        face_tracking = self.options.get("face_tracking", False)
+        return get_target_faces(
+            frame,
+            many_faces=self.options.get("many_faces", False),
+            face_tracking=face_tracking,
+            tracker=self.tracker if face_tracking else None,
+        )
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "session": self.session_id,
+            "selected_player": self.selected_player,
+            "is_running": self.is_running,
+            "options": self.options,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.get_state(), input=self.video_input, face_loaded=self.source_face is not None)
+        pipeline = self.pipeline
+        stats["fps"] = pipeline.stats["inference"].fps if pipeline is not None else 0
+        stats["clients"] = self.broadcaster.client_count if self.broadcaster is not None else 0
+        return stats
+
+
+class SessionManager:
+    """
+    Sessions déclarées dans la configuration (id -> entrée vidéo), créées à
+    la première requête. Un id inconnu est refusé : les entrées vidéo ne
+    viennent jamais du client.
+    """
+
+    def __init__(self, inputs: Dict[str, Union[int, str]], default_options: Dict[str, Any], default_id: str):
+        self.inputs = dict(inputs)
+        self.default_options = default_options
+        self.default_id = default_id
+        self._sessions: Dict[str, ClientSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> Optional[ClientSession]:
+        """Session `session_id` (défaut si vide), ou None si elle n'est pas déclarée"""
+        session_id = session_id or self.default_id
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None and session_id in self.inputs:
+                session = ClientSession(session_id, self.inputs[session_id], self.default_options)
+                self._sessions[session_id] = session
+            return session
+
+    def sessions(self) -> List[ClientSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "declared": list(self.inputs),
+            "default": self.default_id,
+            "sessions": {session.session_id: session.get_stats() for session in self.sessions()},
+        }
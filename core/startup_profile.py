@@ -0,0 +1,162 @@
+"""
+DeepFake MIA - Profil de démarrage
+Temps écoulé à chaque étape du démarrage (imports, modules IA, serveur,
+préchauffage) et, sur demande, temps d'import par paquet pour repérer les
+dépendances lourdes
+
+Usage (rapport complet sans lancer le serveur) :
+    python -m core.startup_profile
+"""
+
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Enveloppe un loader pour mesurer la création et l'exécution du module"""
+
+    def __init__(self, loader: Any, profile: "StartupProfile"):
+        self._loader = loader
+        self._profile = profile
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: Any) -> Any:
+        # Les extensions natives (cv2, onnxruntime...) s'initialisent ici
+        return self._profile._timed_import(spec.name, self._loader.create_module, spec, count=False)
+
+    def exec_module(self, module: Any) -> None:
+        try:
+            self._profile._timed_import(module.__name__, self._loader.exec_module, module)
+        finally:
+            # Le module garde son vrai loader (pkg_resources, importlib.resources)
+            module.__loader__ = self._loader
+            if module.__spec__ is not None:
+                module.__spec__.loader = self._loader
+
+
+class _ImportFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profile: "StartupProfile"):
+        self._profile = profile
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self._profile)
+        return spec
+
+
+class StartupProfile:
+    """
+    Chronologie du démarrage : `mark(name)` enregistre le temps écoulé
+    depuis l'import de ce module (le tout début de app.py) et la durée
+    depuis l'étape précédente.
+
+    `profile_imports()` installe un finder en tête de sys.meta_path qui
+    attribue à chaque paquet de premier niveau son temps d'import propre
+    (sous-imports d'autres paquets déduits), par thread.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: List[Dict[str, Any]] = []
+        self._imports: Dict[str, List[float]] = {}
+        self._stacks = threading.local()
+        self._finder: Optional[_ImportFinder] = None
+
+    def mark(self, name: str) -> float:
+        now = time.perf_counter() - self.origin
+        with self._lock:
+            previous = self._phases[-1]["at"] if self._phases else 0.0
+            self._phases.append({"name": name, "at": round(now, 3), "seconds": round(now - previous, 3)})
+        return now
+
+    def profile_imports(self) -> None:
+        if self._finder is None:
+            self._finder = _ImportFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def stop_profiling_imports(self) -> None:
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def _timed_import(self, name: str, func: Any, arg: Any, count: bool = True) -> Any:
+        stack = self._stacks.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(arg)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            package = name.partition('.')[0]
+            with self._lock:
+                entry = self._imports.setdefault(package, [0, 0.0])
+                entry[0] += count
+                entry[1] += elapsed - children
+
+    def get_report(self, top: int = 15) -> Dict[str, Any]:
+        with self._lock:
+            phases = [dict(phase) for phase in self._phases]
+            imports = sorted(self._imports.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "phases": phases,
+            "imports": [
+                {"package": package, "modules": count, "seconds": round(seconds, 3)}
+                for package, (count, seconds) in imports[:top]
+            ],
+            "imports_profiled": self._finder is not None or bool(imports),
+        }
+
+    def format_report(self, top: int = 15) -> str:
+        report = self.get_report(top)
+        lines = ["Profil de démarrage", "  Étapes (écoulé / durée) :"]
+        for phase in report["phases"]:
+            lines.append(f"    {phase['name']:<24} {phase['at']:>8.3f} s  {phase['seconds']:>8.3f} s")
+        if report["imports"]:
+            lines.append("  Imports par paquet (temps propre) :")
+            for entry in report["imports"]:
+                lines.append(f"    {entry['package']:<24} {entry['seconds']:>8.3f} s  ({entry['modules']} modules)")
+        return "\n".join(lines)
+
+    def log_report(self, top: int = 15) -> None:
+        logging.info(self.format_report(top))
+
+
+STARTUP_PROFILE = StartupProfile()
+
+
+def main() -> None:
+    """Démarrage complet (imports, modules IA, préchauffage) sans serveur"""
+    # Instance du module importé (et non de __main__), partagée avec app.py
+    from core.startup_profile import STARTUP_PROFILE as profile
+
+    profile.profile_imports()
+    import app
+    profile.mark("imports")
+    app.init_ai_modules()
+    profile.mark("modules IA")
+    if app.WARMUP_CONFIG["ENABLED"]:
+        app.start_warmup().wait()
+    profile.stop_profiling_imports()
+    print(profile.format_report(top=25))
+
+
+if __name__ == '__main__':
+    main()
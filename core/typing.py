@@ -1,7 +1,17 @@
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from insightface.app.common import Face
 import numpy
 
-Face = Face
+if TYPE_CHECKING:
+    from insightface.app.common import Face
+
 Frame = numpy.ndarray[Any, Any]
+
+
+def __getattr__(name):
+    # Face (insightface) est résolu au premier accès : importer Frame ne
+    # charge pas insightface
+    if name == 'Face':
+        from insightface.app.common import Face
+        return Face
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
 import glob
+import json
 import mimetypes
 import os
 import platform
@@ -7,8 +8,9 @@ import ssl
 import subprocess
 import urllib
 from pathlib import Path
-from typing import List, Any
+from typing import List, Any, Callable, Optional, Tuple
 from tqdm import tqdm
+import numpy
 
 import core.globals
 
@@ -121,6 +123,175 @@ def restore_audio(target_path: str, output_path: str) -> None:
         move_temp(target_path, output_path)
 
 
+def get_video_rotation(stream: dict) -> int:
+    """Rotation d'affichage d'un flux ffprobe (matrice d'affichage, ou tag `rotate` des anciens ffmpeg)"""
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(float(side_data["rotation"]))
+    return int(stream.get("tags", {}).get("rotate", 0))
+
+
+def get_video_resolution(target_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Taille des frames telles que ffmpeg les décode : la rotation est
+    appliquée au décodage (autorotate), largeur et hauteur sont donc
+    échangées pour une vidéo tournée d'un quart de tour.
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_streams",
+        "-of",
+        "json",
+        target_path,
+    ]
+    try:
+        stream = json.loads(subprocess.check_output(command).decode())["streams"][0]
+        width, height = int(stream["width"]), int(stream["height"])
+        if get_video_rotation(stream) % 180:
+            width, height = height, width
+        return width, height
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError, KeyError, IndexError):
+        return None
+
+
+def get_video_frame_count(target_path: str) -> int:
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=nb_frames",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        target_path,
+    ]
+    try:
+        return int(subprocess.check_output(command).decode().strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return 0
+
+
+def open_frame_reader(target_path: str) -> subprocess.Popen:
+    """Décode la vidéo en frames bgr24 brutes sur stdout, rotation appliquée (voir get_video_resolution)"""
+    commands = [
+        "ffmpeg",
+        "-hide_banner",
+        "-hwaccel",
+        "auto",
+        "-loglevel",
+        core.globals.log_level,
+        "-i",
+        target_path,
+        "-map",
+        "0:v:0",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "bgr24",
+        "-",
+    ]
+    return subprocess.Popen(commands, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def open_frame_writer(target_path: str, output_path: str, width: int, height: int, fps: float) -> subprocess.Popen:
+    """Encode les frames bgr24 reçues sur stdin, avec l'audio de la source"""
+    commands = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        core.globals.log_level,
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "bgr24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+    ]
+    if core.globals.keep_audio:
+        commands.extend(["-i", target_path, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", "copy"])
+    commands.extend(
+        [
+            "-c:v",
+            core.globals.video_encoder,
+            "-crf",
+            str(core.globals.video_quality),
+            "-pix_fmt",
+            "yuv420p",
+            "-vf",
+            "colorspace=bt709:iall=bt601-6-625:fast=1",
+            "-y",
+            output_path,
+        ]
+    )
+    return subprocess.Popen(commands, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def stream_process_video(target_path: str, output_path: str, process_frame: Callable[[Any], Any]) -> bool:
+    """
+    Traite une vidéo sans dossier temporaire : ffmpeg décode vers un pipe,
+    chaque frame passe par `process_frame`, puis un second ffmpeg encode et
+    remuxe l'audio de la source en une seule passe.
+    """
+    resolution = get_video_resolution(target_path)
+    if resolution is None:
+        return False
+    width, height = resolution
+    fps = detect_fps(target_path) if core.globals.keep_fps else 30.0
+    frame_size = width * height * 3
+
+    try:
+        reader = open_frame_reader(target_path)
+        writer = open_frame_writer(target_path, output_path, width, height, fps)
+    except FileNotFoundError:
+        # ffmpeg n'est pas installé
+        return False
+
+    buffer = bytearray(frame_size)
+    view = memoryview(buffer)
+    frame = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape((height, width, 3))
+    progress_bar_format = "{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]"
+    try:
+        with tqdm(total=get_video_frame_count(target_path) or None, desc="Processing", unit="frame", dynamic_ncols=True, bar_format=progress_bar_format) as progress:
+            while _read_exact(reader.stdout, view):
+                result = process_frame(frame)
+                writer.stdin.write(memoryview(numpy.ascontiguousarray(result, dtype=numpy.uint8)).cast("B"))
+                progress.update(1)
+    except BrokenPipeError:
+        # L'encodeur s'est arrêté (erreur ffmpeg)
+        pass
+    finally:
+        reader.stdout.close()
+        reader.wait()
+        if writer.stdin:
+            try:
+                writer.stdin.close()
+            except BrokenPipeError:
+                pass
+        writer.wait()
+    return reader.returncode == 0 and writer.returncode == 0
+
+
+def _read_exact(stream: Any, view: memoryview) -> bool:
+    """Remplit `view` depuis le pipe ; False en fin de flux"""
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
 def get_temp_frame_paths(target_path: str) -> List[str]:
     temp_directory_path = get_temp_directory_path(target_path)
     return glob.glob((os.path.join(glob.escape(temp_directory_path), "*.png")))
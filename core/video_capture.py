@@ -1,8 +1,15 @@
 import cv2
 import numpy as np
-from typing import Optional, Tuple, Callable
+from typing import Optional, Tuple, Callable, Union
 import platform
 import threading
+import time
+
+from core.metrics import STAGE_SECONDS
+
+# Backoff after a failed read (camera unplugged, network stream dropped)
+READ_RETRY_MIN = 0.01
+READ_RETRY_MAX = 1.0
 
 # Only import Windows-specific library if on Windows
 if platform.system() == "Windows":
@@ -10,7 +17,8 @@ if platform.system() == "Windows":
 
 
 class VideoCapturer:
-    def __init__(self, device_index: int):
+    def __init__(self, device_index: Union[int, str]):
+        # Index de caméra, ou chemin / URL d'un flux lu par OpenCV
         self.device_index = device_index
         self.frame_callback = None
         self._current_frame = None
@@ -20,7 +28,7 @@ class VideoCapturer:
         self.cap = None
 
         # Initialize Windows-specific components if on Windows
-        if platform.system() == "Windows":
+        if platform.system() == "Windows" and isinstance(device_index, int):
             self.graph = FilterGraph()
             # Verify device exists
             devices = self.graph.get_input_devices()
@@ -32,7 +40,7 @@ class VideoCapturer:
     def start(self, width: int = 960, height: int = 540, fps: int = 60) -> bool:
         """Initialize and start video capture"""
         try:
-            if platform.system() == "Windows":
+            if platform.system() == "Windows" and isinstance(self.device_index, int):
                 # Windows-specific capture methods
                 capture_methods = [
                     (self.device_index, cv2.CAP_DSHOW),  # Try DirectShow first
@@ -78,10 +86,17 @@ class VideoCapturer:
         
     def _capture_loop(self) -> None:
         """Continuously capture frames in a background thread."""
+        capture_seconds = STAGE_SECONDS.labels("capture")
+        retry_delay = READ_RETRY_MIN
         while self.is_running and self.cap is not None:
+            start = time.perf_counter()
             ret, frame = self.cap.read()
             if not ret:
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, READ_RETRY_MAX)
                 continue
+            retry_delay = READ_RETRY_MIN
+            capture_seconds.observe(time.perf_counter() - start)
             self._current_frame = frame
             if self.frame_callback:
                 self.frame_callback(frame)
@@ -0,0 +1,148 @@
+"""
+DeepFake MIA - Préchauffage des modèles
+Chargement et inférence à vide en arrière-plan au démarrage, avec un état
+d'avancement consultable (/api/ready)
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class ModelWarmup:
+    """
+    Exécute des étapes de préchauffage dans un thread d'arrière-plan.
+
+    Une étape qui échoue est marquée "failed" sans bloquer les suivantes :
+    le modèle concerné sera chargé à la demande, comme avant. Une étape peut
+    retourner False pour se signaler "skipped" (modèle absent ou désactivé).
+    """
+
+    def __init__(
+        self,
+        steps: List[Tuple[str, Callable[[], Optional[bool]]]],
+        on_finished: Optional[Callable[[], None]] = None,
+    ):
+        self._steps = steps
+        self._on_finished = on_finished
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status = [{"name": name, "status": "pending", "seconds": None} for name, _ in steps]
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_ready
+
+    @property
+    def is_ready(self) -> bool:
+        return self.finished_at is not None
+
+    def _run(self) -> None:
+        for status, (name, step) in zip(self._status, self._steps):
+            with self._lock:
+                status["status"] = "running"
+            start = time.perf_counter()
+            error = None
+            try:
+                result = step()
+                state = "skipped" if result is False else "done"
+            except Exception as e:
+                logging.warning(f"Préchauffage '{name}' échoué: {e}")
+                state = "failed"
+                error = str(e)
+            with self._lock:
+                status["status"] = state
+                if error is not None:
+                    status["error"] = error
+                status["seconds"] = round(time.perf_counter() - start, 2)
+            logging.info(f"Préchauffage '{name}': {state} ({status['seconds']} s)")
+        self.finished_at = time.perf_counter()
+        if self._on_finished is not None:
+            self._on_finished()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = [dict(status) for status in self._status]
+        finished = sum(1 for status in steps if status["status"] not in ("pending", "running"))
+        current = next((status["name"] for status in steps if status["status"] == "running"), None)
+        elapsed = None
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.perf_counter()
+            elapsed = round(end - self.started_at, 2)
+        return {
+            "ready": self.is_ready,
+            "progress": round(finished / len(steps), 2) if steps else 1.0,
+            "current": current,
+            "elapsed": elapsed,
+            "steps": steps,
+        }
+
+
+def warm_session(session: Any) -> None:
+    """Inférence à vide sur une session ONNX Runtime (dimensions dynamiques = 1)"""
+    feeds = {}
+    for model_input in session.get_inputs():
+        shape = [dim if isinstance(dim, int) and dim > 0 else 1 for dim in model_input.shape]
+        dtype = np.float16 if 'float16' in model_input.type else np.float32
+        feeds[model_input.name] = np.zeros(shape, dtype=dtype)
+    session.run(None, feeds)
+
+
+def warm_analyser(profile: str, frame_size: Tuple[int, int], det_sizes: Iterable[int] = ()) -> None:
+    """
+    Charge l'analyseur du profil puis exécute la détection sur une frame de
+    la résolution de capture, pour la taille configurée et chaque taille
+    supplémentaire de `det_sizes` (niveaux de qualité adaptative), et une
+    inférence à vide pour les autres modules.
+    """
+    from core.face_analyser import get_face_analyser
+
+    analyser = get_face_analyser(profile)
+    width, height = frame_size
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    analyser.get(frame)
+
+    det_model = analyser.models.get('detection')
+    if det_model is not None and isinstance(det_model.session.get_inputs()[0].shape[2], str):
+        for size in sorted(set(det_sizes)):
+            det_model.detect(frame, input_size=(size, size))
+    for taskname, model in analyser.models.items():
+        if taskname != 'detection':
+            warm_session(model.session)
+
+
+def warm_face_swapper() -> bool:
+    from core.processors.frame.face_swapper import get_face_swapper
+
+    face_swapper = get_face_swapper()
+    if face_swapper is None:
+        return False
+    warm_session(face_swapper.session)
+    return True
+
+
+def warm_face_enhancer() -> bool:
+    """GFPGAN ONNX si présent, sinon le réseau PyTorch de GFPGANer"""
+    from core.processors.frame import face_enhancer
+
+    session = face_enhancer.get_onnx_enhancer()
+    if session is not None:
+        warm_session(session)
+        return True
+    if not face_enhancer.is_available():
+        return False
+    crop = np.zeros((face_enhancer.CROP_SIZE, face_enhancer.CROP_SIZE, 3), dtype=np.uint8)
+    return face_enhancer.restore_crops([crop]) is not None